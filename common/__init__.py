@@ -0,0 +1,25 @@
+"""
+Shared helpers used across the Python examples in this series.
+
+The part folders are standalone scripts rather than packages; `common` is
+installed into the environment (`pip install -e .` from the repository root,
+also done by `pip install -r requirements.txt`) so every example can import it.
+
+Submodules are imported lazily on first attribute access (PEP 562), so
+`import common` stays cheap and only pulls in what an example uses.
+"""
+import importlib
+
+_SUBMODULES = {"batch", "clients", "credentials", "idempotency", "import_benchmark", "lazy", "tool_executor", "tool_registry"}
+
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        module = importlib.import_module(f"{__name__}.{name}")
+        globals()[name] = module
+        return module
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | _SUBMODULES)
@@ -0,0 +1,187 @@
+"""
+Batch Run Helpers
+
+Shared by the headless batch runners (research prompts, document workflows):
+a JSONL reader, the resume checkpoint (the output file itself), the bounded
+worker pool that streams results to it, and a run report with latency
+percentiles and throughput.
+"""
+import asyncio
+import json
+import logging
+import math
+import os
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Iterable, Iterator, List, Optional, Sequence, Set, TextIO
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BatchReport:
+    unit: str = "items"
+    completed: int = 0
+    failed: int = 0
+    skipped: int = 0
+    wall_time: float = 0.0
+    latencies: List[float] = field(default_factory=list)
+
+    def percentile(self, p: float) -> float:
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        rank = max(0, math.ceil(p / 100 * len(ordered)) - 1)
+        return ordered[rank]
+
+    @property
+    def throughput(self) -> float:
+        """Items completed per minute."""
+        return (self.completed + self.failed) / self.wall_time * 60 if self.wall_time else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"Completed: {self.completed}, failed: {self.failed}, skipped (already done): {self.skipped}\n"
+            f"Wall time: {self.wall_time:.1f}s, throughput: {self.throughput:.1f} {self.unit}/min\n"
+            f"Latency p50: {self.percentile(50):.2f}s, p90: {self.percentile(90):.2f}s, "
+            f"p99: {self.percentile(99):.2f}s, max: {self.percentile(100):.2f}s"
+        )
+
+
+def read_jsonl(path: Path) -> Iterator[dict]:
+    """Yield records from a JSONL file, assigning line-number IDs where missing."""
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            record.setdefault("id", f"line-{line_no}")
+            yield record
+
+
+def completed_ids(output_path: Path) -> Set[str]:
+    """IDs that already succeeded in a previous run (the checkpoint)."""
+    done = set()
+    if not output_path.exists():
+        return done
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # torn last line from an interrupted run
+            if record.get("error") is None:
+                done.add(record["id"])
+    return done
+
+
+def open_for_append(output_path: Path) -> TextIO:
+    """
+    Open the results file for appending, first cutting off a torn last line
+    left by a crash. Otherwise the next record would be glued onto it and
+    both would be unreadable on resume.
+    """
+    if output_path.exists():
+        with open(output_path, "rb+") as f:
+            end = f.seek(0, os.SEEK_END)
+            position = end
+            while position > 0:
+                step = min(4096, position)
+                f.seek(position - step)
+                block = f.read(step)
+                newline = block.rfind(b"\n")
+                if newline != -1:
+                    position = position - step + newline + 1
+                    break
+                position -= step
+            if position != end:
+                logger.warning(f"Dropping a torn last line ({end - position} bytes) from {output_path}")
+                f.truncate(position)
+    return open(output_path, "a", encoding="utf-8")
+
+
+Handler = Callable[[dict], Awaitable[Any]]
+
+
+async def run_batch_jobs(
+    records: Iterable[dict],
+    output_path: Path,
+    make_handler: Callable[[], Handler],
+    concurrency: int = 8,
+    timeout: Optional[float] = 300,
+    unit: str = "items",
+    result_field: str = "result",
+    echo: Sequence[str] = ()
+) -> BatchReport:
+    """
+    Run every record not yet in output_path through a handler and append one
+    result line per record as it finishes.
+
+    make_handler() is called once per worker (so per-worker state such as a
+    workflow graph isn't shared) and again after a failure, in case the
+    failed run left that state unusable. Output lines carry the record's id,
+    the `echo` input fields, `result_field`, error, latency and a timestamp.
+    """
+    report = BatchReport(unit=unit)
+    done = completed_ids(output_path)
+
+    # Bounded queue gives backpressure: the reader never runs far ahead of the workers
+    queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+    start = time.perf_counter()
+
+    with open_for_append(output_path) as out:
+
+        def write_result(record: dict):
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+
+        async def worker():
+            handler = make_handler()
+            while True:
+                record = await queue.get()
+                if record is None:
+                    queue.task_done()
+                    return
+                started = time.perf_counter()
+                try:
+                    result, error = await asyncio.wait_for(handler(record), timeout), None
+                    report.completed += 1
+                except Exception as e:
+                    result, error = None, f"{type(e).__name__}: {e}"
+                    report.failed += 1
+                    logger.warning(f"{record['id']} failed: {error}")
+                    handler = make_handler()
+
+                latency = time.perf_counter() - started
+                report.latencies.append(latency)
+                write_result({
+                    "id": record["id"],
+                    **{name: record.get(name) for name in echo},
+                    result_field: result,
+                    "error": error,
+                    "latency_s": round(latency, 3),
+                    "completed_at": datetime.now().isoformat()
+                })
+                queue.task_done()
+
+        workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+
+        try:
+            for record in records:
+                if record["id"] in done:
+                    report.skipped += 1
+                    continue
+                await queue.put(record)
+
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        finally:
+            for task in workers:
+                task.cancel()
+
+    report.wall_time = time.perf_counter() - start
+    return report
@@ -0,0 +1,22 @@
+"""
+Deferred Client Construction
+
+One AzureOpenAIResponsesClient per process, built on first use. The Agent
+Framework and Azure SDK imports happen inside the factory, so modules that
+only define tools or agents can be imported without paying for them.
+"""
+import os
+
+from common.credentials import get_shared_credential
+from common.lazy import lazy_factory
+
+
+@lazy_factory
+def get_responses_client():
+    """Shared Azure OpenAI Responses client (uses the shared cached credential)."""
+    from agent_framework.azure import AzureOpenAIResponsesClient
+
+    return AzureOpenAIResponsesClient(
+        credential=get_shared_credential(),
+        endpoint=os.getenv("AZURE_OPENAI_ENDPOINT")
+    )
@@ -0,0 +1,217 @@
+"""
+Shared Credential and Token Cache
+
+One credential per process instead of a new AzureCliCredential() per client.
+AzureCliCredential shells out to `az` for every token, which costs hundreds of
+milliseconds; CachedTokenCredential keeps tokens until shortly before expiry,
+lets concurrent first requests share a single fetch, and refreshes tokens in a
+background thread before they expire so requests never wait on the CLI.
+
+Usage:
+    from common.credentials import get_shared_credential
+
+    client = AzureOpenAIResponsesClient(credential=get_shared_credential(), ...)
+"""
+import heapq
+import itertools
+import threading
+import time
+from collections import namedtuple
+from typing import Any, Dict, Hashable, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+try:
+    from azure.core.credentials import AccessToken
+except ImportError:  # allows FakeTokenSource-based testing without the Azure SDK
+    AccessToken = namedtuple("AccessToken", ["token", "expires_on"])
+
+# (scopes, tenant_id, sorted extra get_token options such as enable_cae)
+CacheKey = Tuple[Tuple[str, ...], Optional[str], Tuple[Tuple[str, Any], ...]]
+
+
+class FakeTokenSource:
+    """Local token source for tests: counts fetches and can simulate CLI latency."""
+
+    def __init__(self, lifetime: float = 3600, delay: float = 0.0):
+        self.lifetime = lifetime
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def get_token(self, *scopes: str, **kwargs) -> AccessToken:
+        if self.delay:
+            time.sleep(self.delay)
+        with self._lock:
+            self.calls += 1
+            n = self.calls
+        return AccessToken(f"fake-token-{n}", int(time.time() + self.lifetime))
+
+
+class CachedTokenCredential:
+    """
+    TokenCredential wrapper that caches tokens per (scopes, tenant, options).
+
+    - Tokens are reused until `refresh_margin` seconds before expiry
+    - A per-key lock makes concurrent callers share one fetch
+    - A background thread refreshes tokens proactively before they expire
+    """
+
+    def __init__(self, source, refresh_margin: float = 300, background_refresh: bool = True):
+        self.source = source
+        self.refresh_margin = refresh_margin
+        self.background_refresh = background_refresh
+
+        self._tokens: Dict[CacheKey, AccessToken] = {}
+        self._locks: Dict[CacheKey, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+        self._schedule: list = []  # heap of (refresh_at, seq, key, expires_on)
+        self._seq = itertools.count()
+        self._wakeup = threading.Condition()
+        self._closed = False
+        self._refresher: Optional[threading.Thread] = None
+
+    def get_token(self, *scopes: str, claims: Optional[str] = None, tenant_id: Optional[str] = None, **kwargs) -> AccessToken:
+        # Claims challenges (CAE) must always go to the source
+        if claims:
+            return self.source.get_token(*scopes, claims=claims, tenant_id=tenant_id, **kwargs)
+
+        try:
+            key: CacheKey = (tuple(scopes), tenant_id, tuple(sorted(kwargs.items())))
+            hash(key)
+        except TypeError:  # unhashable options can't be cached
+            return self.source.get_token(*scopes, tenant_id=tenant_id, **kwargs)
+        token = self._tokens.get(key)
+        if token is not None and not self._needs_refresh(token):
+            return token
+
+        with self._lock_for(key):
+            # Another caller may have fetched while we waited
+            token = self._tokens.get(key)
+            if token is not None and not self._needs_refresh(token):
+                return token
+            return self._fetch(key)
+
+    def prefetch(self, *scopes: str, tenant_id: Optional[str] = None) -> None:
+        """Warm the cache in the background (e.g. at process start)."""
+        threading.Thread(
+            target=self.get_token, args=scopes, kwargs={"tenant_id": tenant_id}, daemon=True
+        ).start()
+
+    def close(self) -> None:
+        with self._wakeup:
+            self._closed = True
+            self._wakeup.notify_all()
+        close = getattr(self.source, "close", None)
+        if close:
+            close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------
+
+    def _needs_refresh(self, token: AccessToken) -> bool:
+        return token.expires_on - time.time() <= self.refresh_margin
+
+    def _lock_for(self, key: CacheKey) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _fetch(self, key: CacheKey) -> AccessToken:
+        scopes, tenant_id, options = key
+        start = time.perf_counter()
+        token = self.source.get_token(*scopes, tenant_id=tenant_id, **dict(options))
+        logger.debug(f"Fetched token for {scopes} in {(time.perf_counter() - start) * 1000:.0f} ms")
+        self._tokens[key] = token
+        if self.background_refresh:
+            self._schedule_refresh(key, token)
+        return token
+
+    def _schedule_refresh(self, key: CacheKey, token: AccessToken) -> None:
+        # Refresh half a margin before callers would treat the token as stale
+        # (1.5 x margin before expiry), so a slow fetch lands before anyone waits
+        # on it; never sooner than a second from now (very short-lived tokens)
+        refresh_at = max(token.expires_on - self.refresh_margin * 1.5, time.time() + 1.0)
+        with self._wakeup:
+            heapq.heappush(self._schedule, (refresh_at, next(self._seq), key, token.expires_on))
+            if self._refresher is None:
+                self._refresher = threading.Thread(target=self._refresh_loop, name="token-refresher", daemon=True)
+                self._refresher.start()
+            self._wakeup.notify()
+
+    def _refresh_loop(self) -> None:
+        while True:
+            with self._wakeup:
+                while not self._closed:
+                    if self._schedule and self._schedule[0][0] <= time.time():
+                        break
+                    timeout = self._schedule[0][0] - time.time() if self._schedule else None
+                    self._wakeup.wait(timeout)
+                if self._closed:
+                    return
+                _, _, key, expires_on = heapq.heappop(self._schedule)
+
+            current = self._tokens.get(key)
+            if current is not None and current.expires_on != expires_on:
+                continue  # already refreshed (and rescheduled) by a caller
+            try:
+                with self._lock_for(key):
+                    self._fetch(key)
+            except Exception as e:
+                logger.warning(f"Background token refresh failed for {key[0]}: {e}")
+                with self._wakeup:
+                    heapq.heappush(self._schedule, (time.time() + 30, next(self._seq), key, expires_on))
+
+
+# Keyed by the wrapped source (None = the default AzureCliCredential)
+_shared: Dict[Optional[Hashable], CachedTokenCredential] = {}
+_shared_lock = threading.Lock()
+
+
+def get_shared_credential(source=None) -> CachedTokenCredential:
+    """Process-wide cached credential per source (wraps AzureCliCredential by default)."""
+    credential = _shared.get(source)
+    if credential is None:
+        with _shared_lock:
+            credential = _shared.get(source)
+            if credential is None:
+                wrapped = source
+                if wrapped is None:
+                    from azure.identity import AzureCliCredential
+                    wrapped = AzureCliCredential()
+                credential = _shared[source] = CachedTokenCredential(wrapped)
+    return credential
+
+
+if __name__ == "__main__":
+    from concurrent.futures import ThreadPoolExecutor
+
+    fake = FakeTokenSource(lifetime=3600, delay=0.3)  # ~CLI latency
+    credential = CachedTokenCredential(fake)
+    scope = "https://cognitiveservices.azure.com/.default"
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=20) as pool:
+        list(pool.map(lambda _: credential.get_token(scope), range(20)))
+    print(f"20 concurrent first requests: {time.perf_counter() - start:.2f}s, fetches: {fake.calls}")
+
+    start = time.perf_counter()
+    for _ in range(10_000):
+        credential.get_token(scope)
+    print(f"10,000 cached lookups: {(time.perf_counter() - start) * 1000:.1f} ms, fetches: {fake.calls}")
+
+    # Short-lived tokens are refreshed in the background before they expire
+    short = FakeTokenSource(lifetime=4.0)
+    refreshing = CachedTokenCredential(short, refresh_margin=1.0)
+    first = refreshing.get_token(scope)
+    time.sleep(2.0)
+    print(f"Background refresh: {first.token} -> {refreshing.get_token(scope).token}, fetches: {short.calls}")
+    refreshing.close()
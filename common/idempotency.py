@@ -0,0 +1,60 @@
+"""
+Idempotency Keys for Side-Effecting Tools
+
+A retried agent run replays its tool calls. If create_order gets a fresh key
+each time, the retry creates a duplicate order. Keys derived from an
+idempotency scope stay the same across retries:
+
+    with idempotency_scope() as scope:        # e.g. one ResilientAgent.run()
+        for attempt in range(retries):
+            scope.new_attempt()
+            await agent.run(...)              # tools call idempotency_key(...)
+
+Inside a scope, the n-th call with the same payload in an attempt gets the
+same key in every attempt. Two identical orders placed in one attempt still
+get different keys. Outside a scope every call gets a random key, which
+still makes the transport-level retries of that one call safe.
+"""
+import hashlib
+import json
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+
+class IdempotencyScope:
+    def __init__(self, scope_id: Optional[str] = None):
+        self.scope_id = scope_id or uuid.uuid4().hex
+        self._seen: Counter = Counter()
+
+    def new_attempt(self) -> None:
+        """Start numbering identical payloads from zero again."""
+        self._seen.clear()
+
+    def key_for(self, *parts) -> str:
+        payload = json.dumps(parts, sort_keys=True, default=str)
+        occurrence = self._seen[payload]
+        self._seen[payload] += 1
+        return hashlib.sha256(f"{self.scope_id}|{occurrence}|{payload}".encode()).hexdigest()[:32]
+
+
+_current_scope: ContextVar[Optional[IdempotencyScope]] = ContextVar("idempotency_scope", default=None)
+
+
+@contextmanager
+def idempotency_scope(scope_id: Optional[str] = None) -> Iterator[IdempotencyScope]:
+    """Make keys derived inside this block (including in tasks it starts) stable across retries."""
+    scope = IdempotencyScope(scope_id)
+    token = _current_scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _current_scope.reset(token)
+
+
+def idempotency_key(*parts) -> str:
+    """Key for a side effect described by `parts` (deterministic inside a scope)."""
+    scope = _current_scope.get()
+    return scope.key_for(*parts) if scope is not None else uuid.uuid4().hex
@@ -0,0 +1,146 @@
+"""
+Startup Import-Time Benchmark
+
+Measures the cumulative import cost of each example module with
+`python -X importtime` in a fresh interpreter, compares it with a recorded
+baseline, and exits non-zero when a module regresses beyond the tolerance.
+Timings are machine-specific, so the baseline is recorded locally with
+--update; checking a module that has no baseline entry fails.
+
+Usage (from the repository root):
+    python -m common.import_benchmark             # check against baseline
+    python -m common.import_benchmark --update    # record a new baseline
+    python -m common.import_benchmark --top 5     # also show heaviest imports
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+BASELINE_PATH = Path(__file__).with_name("import_baseline.json")
+
+# module name -> directory it is run from
+MODULES = {
+    "research_assistant": "part-03-python-agent",
+    "tool_cache": "part-03-python-agent",
+    "summarizer": "part-03-python-agent",
+    "basic_tools": "part-04-tools-function-calling/python",
+    "crm_integration": "part-04-tools-function-calling/python",
+    "human_in_loop": "part-05-multi-turn-conversations/python",
+    "redis_persistence": "part-05-multi-turn-conversations/python",
+    "document_workflow": "part-06-workflows/python",
+    "conditional_routing": "part-06-workflows/python",
+    "concurrent_orchestrator": "part-07-multi-agent-patterns",
+    "sequential_orchestrator": "part-07-multi-agent-patterns",
+    "handoff_orchestrator": "part-07-multi-agent-patterns",
+    "telemetry_config": "part-08-production-ready/python",
+    "resilient_agent": "part-08-production-ready/python",
+    "content_safety": "part-08-production-ready/python",
+    "after_af_agent": "part-10-migration-guide/agent_framework",
+}
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|\s(\s*)(\S+)")
+
+
+def measure(module: str, directory: str) -> Tuple[Optional[int], List[Tuple[int, str]], Optional[str]]:
+    """Return (cumulative µs, [(cumulative µs, top-level dependency)], error) for one module."""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(REPO_ROOT), env.get("PYTHONPATH")]))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT / directory,
+        env=env,
+        capture_output=True,
+        text=True
+    )
+    if proc.returncode != 0:
+        last_line = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "unknown error"
+        return None, [], last_line
+
+    total = None
+    dependencies = []
+    for line in proc.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        cumulative, indent, name = int(match.group(2)), len(match.group(3)), match.group(4)
+        if name == module:
+            total = cumulative
+        elif indent == 2:  # direct children of the top level
+            dependencies.append((cumulative, name))
+    return total, sorted(dependencies, reverse=True), None
+
+
+def run(modules: Dict[str, str], repeat: int) -> Dict[str, dict]:
+    results = {}
+    for module, directory in modules.items():
+        best, deps, error = None, [], None
+        # Best of N runs filters out scheduler and disk-cache noise
+        for _ in range(repeat):
+            total, run_deps, error = measure(module, directory)
+            if error:
+                break
+            if best is None or total < best:
+                best, deps = total, run_deps
+        results[module] = {"us": best, "deps": deps, "error": error}
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Track per-module import time")
+    parser.add_argument("--update", action="store_true", help="Write the current timings as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative regression (0.25 = 25%%)")
+    parser.add_argument("--slack-ms", type=float, default=10.0, help="Allowed absolute regression in ms")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per module (best is kept)")
+    parser.add_argument("--top", type=int, default=0, help="Show the N heaviest dependencies per module")
+    parser.add_argument("modules", nargs="*", help="Subset of modules to measure")
+    args = parser.parse_args()
+
+    unknown = [m for m in args.modules if m not in MODULES]
+    if unknown:
+        parser.error(f"unknown module(s): {', '.join(unknown)}")
+    modules = {m: MODULES[m] for m in args.modules} if args.modules else MODULES
+    results = run(modules, args.repeat)
+    baseline = json.loads(BASELINE_PATH.read_text()) if BASELINE_PATH.exists() else {}
+
+    failures = []
+    print(f"{'module':<26}{'import ms':>10}{'baseline':>10}  status")
+    for module, result in results.items():
+        if result["error"]:
+            failures.append(module)
+            print(f"{module:<26}{'-':>10}{'-':>10}  ERROR: {result['error']}")
+            continue
+
+        ms = result["us"] / 1000
+        base = baseline.get(module)
+        status = "recorded" if args.update else "NO BASELINE (run with --update)"
+        if base is None and not args.update:
+            failures.append(module)
+        elif base is not None and not args.update:
+            limit = base * (1 + args.tolerance) + args.slack_ms
+            status = "ok" if ms <= limit else f"REGRESSION (limit {limit:.1f} ms)"
+            if ms > limit:
+                failures.append(module)
+        print(f"{module:<26}{ms:>10.1f}{(f'{base:.1f}' if base is not None else '-'):>10}  {status}")
+        for cumulative, name in result["deps"][:args.top]:
+            print(f"    {name:<40}{cumulative / 1000:>8.1f} ms")
+
+    if args.update:
+        measured = {m: round(r["us"] / 1000, 1) for m, r in results.items() if not r["error"]}
+        BASELINE_PATH.write_text(json.dumps({**baseline, **measured}, indent=2, sort_keys=True) + "\n")
+        print(f"\nBaseline written to {BASELINE_PATH.relative_to(REPO_ROOT)}")
+        return 1 if failures else 0
+
+    if failures:
+        print(f"\n{len(failures)} module(s) failed: {', '.join(failures)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
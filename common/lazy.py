@@ -0,0 +1,46 @@
+"""
+Lazy Construction Helpers
+
+Defer expensive objects (clients, agents, workflows) until first use so that
+importing an example or tool module does no network, credential or SDK work.
+"""
+import functools
+import threading
+from typing import Callable, TypeVar
+
+T = TypeVar("T")
+
+_UNSET = object()
+
+
+def lazy_factory(build: Callable[[], T]) -> Callable[[], T]:
+    """
+    Turn a zero-argument builder into a thread-safe, build-once accessor.
+
+        @lazy_factory
+        def get_agent():
+            return get_responses_client().create_agent(...)
+
+    The first call builds the object; later calls return the same instance.
+    `get_agent.reset()` drops it (useful in tests).
+    """
+    lock = threading.Lock()
+    instance = _UNSET
+
+    @functools.wraps(build)
+    def accessor() -> T:
+        nonlocal instance
+        if instance is _UNSET:
+            with lock:
+                if instance is _UNSET:
+                    instance = build()
+        return instance
+
+    def reset() -> None:
+        nonlocal instance
+        with lock:
+            instance = _UNSET
+
+    accessor.reset = reset
+    accessor.is_built = lambda: instance is not _UNSET
+    return accessor
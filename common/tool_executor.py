@@ -0,0 +1,364 @@
+"""
+Parallel Tool Execution
+
+Runs the independent tool calls from one model response concurrently, so a
+multi-tool turn takes as long as its slowest tool instead of the sum:
+- Async tools run on the event loop
+- Sync tools run on a bounded thread pool, never on the loop thread
+- CPU-heavy tools can be sent to a process pool
+- Per-tool timeouts and concurrency caps, plus an overall cap per executor
+- Optional argument validation against a ToolRegistry's precompiled schemas
+
+Usage:
+    from common.tool_executor import ToolCall, ToolExecutor
+
+    executor = ToolExecutor([get_weather, search_documents, summarize_text])
+    executor.configure("summarize_text", mode="process", timeout=30)
+    results = await executor.run([
+        ToolCall("call_1", "get_weather", {"city": "Tokyo"}),
+        ToolCall("call_2", "get_weather", {"city": "London"}),
+        ToolCall("call_3", "search_documents", {"query": "agents"})
+    ])
+
+For tools the framework invokes itself, agent_tools() hands create_agent
+framework tools that call through the executor (same offload, timeouts and
+caps), and @offloaded applies the offload to a single sync function:
+
+    agent = client.create_agent(..., tools=executor.agent_tools())
+
+    @ai_function
+    @offloaded(timeout=30)
+    def summarize_text(...): ...
+
+Timeouts stop waiting, they do not stop the work: a timed-out sync tool keeps
+its pool worker until it returns, which is why the pools are bounded.
+"""
+import asyncio
+import contextlib
+import functools
+import importlib
+import inspect
+import json
+import os
+import time
+import weakref
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Literal, Optional, Union
+import logging
+
+from common.lazy import lazy_factory
+from common.tool_registry import ToolArgumentError, ToolRegistry, compile_tool
+
+logger = logging.getLogger(__name__)
+
+Mode = Literal["auto", "async", "inline", "thread", "process"]
+
+
+@lazy_factory
+def get_thread_pool() -> ThreadPoolExecutor:
+    """Shared pool for sync tools (bounded, created on first use)."""
+    workers = int(os.getenv("TOOL_THREAD_WORKERS", min(32, (os.cpu_count() or 1) + 4)))
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tool")
+
+
+@lazy_factory
+def get_process_pool() -> ProcessPoolExecutor:
+    """Shared pool for CPU-heavy tools (one worker per core by default)."""
+    workers = int(os.getenv("TOOL_PROCESS_WORKERS", os.cpu_count() or 1))
+    return ProcessPoolExecutor(max_workers=workers)
+
+
+def _raw_function(tool: Any) -> Callable:
+    """The plain Python function behind an ai_function / decorated tool."""
+    return inspect.unwrap(getattr(tool, "func", tool))
+
+
+def _invoke_by_reference(module_name: str, qualname: str, kwargs: dict) -> Any:
+    # Runs in a worker process: ai_function objects don't pickle, so the
+    # function is looked up by module path and unwrapped there
+    target = importlib.import_module(module_name)
+    for part in qualname.split("."):
+        target = getattr(target, part)
+    return _raw_function(target)(**kwargs)
+
+
+async def _run_sync(func: Callable, mode: str, args: tuple, kwargs: dict) -> Any:
+    if mode == "inline":
+        return func(*args, **kwargs)
+    loop = asyncio.get_running_loop()
+    if mode == "process":
+        if args:
+            raise TypeError("process-mode tools take keyword arguments only")
+        pool: Executor = get_process_pool()
+        return await loop.run_in_executor(pool, _invoke_by_reference, func.__module__, func.__qualname__, kwargs)
+    return await loop.run_in_executor(get_thread_pool(), functools.partial(func, *args, **kwargs))
+
+
+class _LoopLimiter:
+    """
+    Concurrency cap usable from any event loop. An asyncio.Semaphore binds to
+    the loop it is first used on, so one is created lazily per loop.
+    """
+
+    def __init__(self, max_concurrent: int):
+        self.max_concurrent = max_concurrent
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_concurrent)
+        return semaphore
+
+    async def __aenter__(self):
+        await self._semaphore().acquire()
+
+    async def __aexit__(self, *exc):
+        self._semaphore().release()
+
+
+def _limiter(max_concurrent: Optional[int]):
+    return _LoopLimiter(max_concurrent) if max_concurrent else contextlib.nullcontext()
+
+
+def offloaded(mode: Literal["thread", "process"] = "thread", timeout: Optional[float] = None,
+              max_concurrent: Optional[int] = None):
+    """
+    Turn a sync tool into an async one that runs on the shared thread or
+    process pool, with an optional timeout and concurrency cap.
+
+    Place it under @ai_function; functools.wraps keeps the signature the
+    framework builds the tool schema from.
+    """
+    def decorator(func: Callable) -> Callable:
+        if inspect.iscoroutinefunction(func):
+            raise TypeError(f"@offloaded is for sync functions; {func.__name__} is async")
+        limit = _limiter(max_concurrent)
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            async with limit:
+                return await asyncio.wait_for(_run_sync(func, mode, args, kwargs), timeout)
+
+        return wrapper
+    return decorator
+
+
+@dataclass
+class ToolCall:
+    call_id: str
+    name: str
+    arguments: Union[str, Dict[str, Any]] = field(default_factory=dict)  # dict or the model's JSON string
+
+
+@dataclass
+class ToolResult:
+    call_id: str
+    name: str
+    result: Any = None
+    error: Optional[str] = None
+    duration: float = 0.0
+    timed_out: bool = False
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+@dataclass
+class _ToolSpec:
+    func: Callable
+    mode: str
+    timeout: Optional[float]
+    limit: Any
+
+
+class ToolExecutor:
+    """Dispatches the tool calls of one model turn concurrently."""
+
+    def __init__(
+        self,
+        tools: Iterable[Any] = (),
+        default_timeout: Optional[float] = 30,
+        max_concurrency: int = 16,
+        registry: Optional[ToolRegistry] = None
+    ):
+        self.default_timeout = default_timeout
+        self.max_concurrency = max_concurrency
+        # With a registry, arguments are validated against the precompiled schema first
+        self.registry = registry
+        self._tools: Dict[str, _ToolSpec] = {}
+        self._agent_tools: Dict[str, Any] = {}
+        self._overall = _LoopLimiter(max_concurrency)
+        for tool in tools:
+            self.register(tool)
+
+    def register(
+        self,
+        tool: Any,
+        name: Optional[str] = None,
+        mode: Mode = "auto",
+        timeout: Optional[float] = None,
+        max_concurrent: Optional[int] = None
+    ) -> None:
+        """
+        Add a tool. mode="auto" runs coroutines on the loop and sync functions
+        on the thread pool; "process" sends a sync tool to the process pool
+        and "inline" keeps a trivial sync tool on the loop thread.
+        """
+        # Wrapped coroutines (e.g. @cached_tool) are called through their
+        # wrapper; sync tools are called as the plain function
+        func = getattr(tool, "func", tool)
+        if mode == "auto":
+            mode = "async" if inspect.iscoroutinefunction(func) else "thread"
+        if mode != "async":
+            if inspect.iscoroutinefunction(func):
+                raise ValueError(f"{mode!r} mode needs a sync function")
+            func = _raw_function(tool)
+        tool_name = name or getattr(tool, "name", None) or func.__name__
+        self._tools[tool_name] = _ToolSpec(func, mode, timeout, _limiter(max_concurrent))
+        self._agent_tools.pop(tool_name, None)
+        if self.registry is not None and tool_name not in self.registry:
+            self.registry.register(tool, tool_name)
+
+    def configure(self, name: str, mode: Optional[Mode] = None, timeout: Optional[float] = None,
+                  max_concurrent: Optional[int] = None) -> None:
+        """Change how an already registered tool is run."""
+        spec = self._tools[name]
+        if mode is not None:
+            if (mode == "async") != inspect.iscoroutinefunction(spec.func):
+                raise ValueError(f"{mode!r} mode doesn't match how {name} is defined")
+            spec.mode = mode
+        if timeout is not None:
+            spec.timeout = timeout
+        if max_concurrent is not None:
+            spec.limit = _limiter(max_concurrent)
+
+    @property
+    def tool_names(self) -> List[str]:
+        return list(self._tools)
+
+    def agent_tools(self, names: Optional[Iterable[str]] = None) -> List[Any]:
+        """
+        Framework tools for create_agent(tools=...) that run through this
+        executor, so calls the framework makes get the same mode, timeout and
+        caps (sync tools run on the pool, not the event loop thread). Built
+        once per tool; configure() changes apply to them too.
+        """
+        from agent_framework import ai_function
+
+        tools = []
+        for name in (names if names is not None else self._tools):
+            tool = self._agent_tools.get(name)
+            if tool is None:
+                if name not in self._tools:
+                    raise KeyError(f"Unknown tool: {name}")
+                compiled = compile_tool(self._tools[name].func, name)
+                tool = ai_function(name=name, description=compiled.description)(self._dispatcher(name))
+                self._agent_tools[name] = tool
+            tools.append(tool)
+        return tools
+
+    def _dispatcher(self, name: str) -> Callable:
+        spec = self._tools[name]
+
+        # Wraps the original function so the framework builds the same schema
+        @functools.wraps(inspect.unwrap(spec.func))
+        async def dispatch(**arguments):
+            spec = self._tools[name]  # read per call: configure() may have changed it
+            timeout = spec.timeout if spec.timeout is not None else self.default_timeout
+            async with spec.limit, self._overall:
+                return await asyncio.wait_for(self._invoke(spec, arguments), timeout)
+
+        return dispatch
+
+    async def run(self, calls: Iterable[ToolCall]) -> List[ToolResult]:
+        """Run all calls concurrently; results come back in call order."""
+        return list(await asyncio.gather(*(self.run_one(call) for call in calls)))
+
+    async def run_one(self, call: ToolCall) -> ToolResult:
+        spec = self._tools.get(call.name)
+        if spec is None:
+            return ToolResult(call.call_id, call.name, error=f"Unknown tool: {call.name}")
+
+        timeout = spec.timeout if spec.timeout is not None else self.default_timeout
+        start = time.perf_counter()
+        try:
+            arguments = call.arguments
+            if self.registry is not None:
+                arguments = self.registry.validate(call.name, arguments)
+            elif isinstance(arguments, str):
+                arguments = json.loads(arguments or "{}")
+            # Per-tool cap first: a call queued behind its own tool's cap
+            # must not hold one of the executor's overall slots meanwhile
+            async with spec.limit, self._overall:
+                result = await asyncio.wait_for(self._invoke(spec, arguments), timeout)
+            return ToolResult(call.call_id, call.name, result=result, duration=time.perf_counter() - start)
+        except ToolArgumentError as e:
+            return ToolResult(call.call_id, call.name, error=str(e), duration=time.perf_counter() - start)
+        except asyncio.TimeoutError:
+            logger.warning(f"Tool {call.name} timed out after {timeout}s")
+            return ToolResult(call.call_id, call.name, error=f"Tool {call.name} timed out after {timeout}s",
+                              duration=time.perf_counter() - start, timed_out=True)
+        except Exception as e:
+            logger.exception(f"Tool {call.name} failed")
+            return ToolResult(call.call_id, call.name, error=f"{type(e).__name__}: {e}",
+                              duration=time.perf_counter() - start)
+
+    async def _invoke(self, spec: _ToolSpec, arguments: Dict[str, Any]) -> Any:
+        if spec.mode == "async":
+            return await spec.func(**arguments)
+        return await _run_sync(spec.func, spec.mode, (), arguments)
+
+
+if __name__ == "__main__":
+    def get_weather(city: str) -> str:
+        time.sleep(0.2)  # blocking client call
+        return f"Weather in {city}: 20°C"
+
+    def search_documents(query: str, limit: int = 5) -> list:
+        time.sleep(0.3)
+        return [f"{query} result {i}" for i in range(limit)]
+
+    async def fetch_api_data(endpoint: str) -> str:
+        await asyncio.sleep(0.25)
+        return f"data from {endpoint}"
+
+    calls = [
+        ToolCall("1", "get_weather", {"city": "New York"}),
+        ToolCall("2", "get_weather", {"city": "London"}),
+        ToolCall("3", "get_weather", {"city": "Tokyo"}),
+        ToolCall("4", "search_documents", {"query": "agents"}),
+        ToolCall("5", "fetch_api_data", {"endpoint": "/status"}),
+    ]
+
+    async def demo():
+        tools = {"get_weather": get_weather, "search_documents": search_documents, "fetch_api_data": fetch_api_data}
+
+        start = time.perf_counter()
+        for call in calls:  # what running tools one after another on the loop costs
+            result = tools[call.name](**call.arguments)
+            if inspect.isawaitable(result):
+                await result
+        sequential = time.perf_counter() - start
+
+        executor = ToolExecutor(tools.values(), default_timeout=5)
+        executor.configure("get_weather", max_concurrent=2)
+        start = time.perf_counter()
+        results = await executor.run(calls)
+        parallel = time.perf_counter() - start
+
+        print(f"Sequential: {sequential * 1000:.0f} ms (sum of tool durations)")
+        print(f"Parallel:   {parallel * 1000:.0f} ms (slowest tool, get_weather capped at 2 at a time)")
+        for r in results:
+            print(f"  {r.call_id} {r.name:<17}{r.duration * 1000:>6.0f} ms  {r.result if r.ok else r.error}")
+
+        executor.configure("search_documents", timeout=0.1)
+        timed_out = await executor.run_one(ToolCall("6", "search_documents", {"query": "slow"}))
+        print(f"Timeout:    {timed_out.error}")
+
+    asyncio.run(demo())
@@ -0,0 +1,309 @@
+"""
+Tool Registry with Precompiled Schemas
+
+Turning a tool's Annotated/Field signature into a JSON schema and a pydantic
+validator is the expensive part of tool setup. The registry does it once per
+function, at registration, and shares the result with every agent and every
+call:
+- One CompiledTool (JSON schema + TypeAdapter) per function and tool name,
+  process-wide
+- Plain functions are wrapped as framework tools (ai_function) once, so
+  agents built with create_agent(tools=registry.tools(...)) share the tool
+  objects instead of wrapping every function again per agent
+- Tool definitions for a toolset are built once and reused by each agent
+- Tool-call arguments (dict or the model's raw JSON string) are validated
+  with the compiled adapter; JSON is parsed by pydantic-core directly
+
+Tool modules queue their tools with register_on_first_use(), so nothing is
+compiled at import time; the first get_tool_registry() call registers them.
+
+Usage:
+    from common.tool_registry import get_tool_registry, register_on_first_use
+
+    register_on_first_use([get_weather, search_documents])   # at module level
+
+    registry = get_tool_registry()
+    agent = client.create_agent(name=..., instructions=..., tools=registry.tools())
+    kwargs = registry.validate("get_weather", '{"city": "Tokyo"}')
+"""
+import inspect
+import json
+import threading
+import typing
+import weakref
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from pydantic import ConfigDict, TypeAdapter, ValidationError, create_model
+
+# function -> {tool name -> CompiledTool}, shared by all registries
+_COMPILED: "weakref.WeakKeyDictionary[Callable, Dict[str, CompiledTool]]" = weakref.WeakKeyDictionary()
+_COMPILED_LOCK = threading.Lock()
+
+
+class ToolArgumentError(ValueError):
+    """Tool-call arguments failed validation (message is safe to return to the model)."""
+
+    def __init__(self, tool: str, error: ValidationError):
+        self.tool = tool
+        self.errors = error.errors(include_url=False)
+        details = "; ".join(f"{'.'.join(map(str, e['loc'])) or 'arguments'}: {e['msg']}" for e in self.errors)
+        super().__init__(f"Invalid arguments for {tool}: {details}")
+
+
+@dataclass(frozen=True)
+class CompiledTool:
+    name: str
+    description: str
+    parameters: Dict[str, Any]  # JSON schema
+    adapter: TypeAdapter
+    is_async: bool
+
+    @property
+    def definition(self) -> Dict[str, Any]:
+        return {
+            "type": "function",
+            "function": {"name": self.name, "description": self.description, "parameters": self.parameters}
+        }
+
+
+def _target(tool: Any) -> Callable:
+    """The function a tool wraps (ai_function objects keep it on .func)."""
+    func = getattr(tool, "func", tool)
+    return getattr(func, "__func__", func)  # bound methods share their function's schema
+
+
+def compile_tool(tool: Any, name: Optional[str] = None) -> CompiledTool:
+    """Build (or fetch) the schema and validator for a tool function under a name."""
+    func = _target(tool)
+    tool_name = name or inspect.unwrap(func).__name__
+    compiled = _COMPILED.get(func, {}).get(tool_name)
+    if compiled is not None:
+        return compiled
+
+    with _COMPILED_LOCK:
+        by_name = _COMPILED.setdefault(func, {})
+        compiled = by_name.get(tool_name)
+        if compiled is None:
+            compiled = by_name[tool_name] = _compile(func, tool_name)
+    return compiled
+
+
+def _as_framework_tool(tool: Any, compiled: CompiledTool) -> Any:
+    """Wrap a plain function as an ai_function once, so agents can share it."""
+    if hasattr(tool, "func"):  # already a framework tool
+        return tool
+    try:
+        from agent_framework import ai_function
+    except ImportError:  # validation and dispatch work without the framework
+        return tool
+    return ai_function(name=compiled.name, description=compiled.description)(tool)
+
+
+def _compile(func: Callable, name: Optional[str]) -> CompiledTool:
+    # Hints and signature come from the innermost function, so decorators
+    # using functools.wraps (@cached_tool, @offloaded) are transparent
+    source = inspect.unwrap(func)
+    hints = typing.get_type_hints(source, include_extras=True)
+    fields = {}
+    for param in inspect.signature(source).parameters.values():
+        if param.name in ("self", "cls") or param.kind in (param.VAR_POSITIONAL, param.VAR_KEYWORD):
+            continue
+        default = ... if param.default is param.empty else param.default
+        fields[param.name] = (hints.get(param.name, Any), default)
+
+    tool_name = name or source.__name__
+    model = create_model(f"{tool_name}_arguments", __config__=ConfigDict(extra="forbid"), **fields)
+    adapter = TypeAdapter(model)
+    return CompiledTool(
+        name=tool_name,
+        description=inspect.getdoc(source) or "",
+        parameters=adapter.json_schema(),
+        adapter=adapter,
+        is_async=inspect.iscoroutinefunction(func)
+    )
+
+
+class ToolRegistry:
+    """Name -> tool lookup over precompiled schemas and validators."""
+
+    def __init__(self):
+        self._tools: Dict[str, Tuple[Any, CompiledTool]] = {}
+        self._sources: Dict[str, Any] = {}  # name -> the tool as registered
+        self._definitions: Dict[Tuple[str, ...], List[dict]] = {}
+
+    def register(self, tool: Any, name: Optional[str] = None) -> CompiledTool:
+        """
+        Add a tool under its name. Registering the same tool again is a no-op;
+        a different tool under a taken name (e.g. a method bound to another
+        instance) raises ValueError instead of silently replacing it.
+        """
+        compiled = compile_tool(tool, name or getattr(tool, "name", None))
+        existing = self._sources.get(compiled.name)
+        if existing is not None:
+            if existing is tool or existing == tool:
+                return compiled
+            raise ValueError(
+                f"Tool {compiled.name!r} is already registered for a different function or instance; "
+                "register it under another name or in a separate ToolRegistry"
+            )
+        self._tools[compiled.name] = (_as_framework_tool(tool, compiled), compiled)
+        self._sources[compiled.name] = tool
+        self._definitions.clear()
+        return compiled
+
+    def register_all(self, tools: Iterable[Any]) -> None:
+        for tool in tools:
+            self.register(tool)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._tools
+
+    def get(self, name: str) -> Tuple[Any, CompiledTool]:
+        try:
+            return self._tools[name]
+        except KeyError:
+            raise KeyError(f"Unknown tool: {name}") from None
+
+    def definitions(self, names: Optional[Iterable[str]] = None) -> List[dict]:
+        """Tool definitions for a toolset; the same list object for the same names."""
+        key = tuple(names) if names is not None else tuple(self._tools)
+        cached = self._definitions.get(key)
+        if cached is None:
+            cached = [self.get(name)[1].definition for name in key]
+            self._definitions[key] = cached
+        return cached
+
+    def tools(self, names: Optional[Iterable[str]] = None) -> List[Any]:
+        """The registered (framework) tool objects, for create_agent(tools=...)."""
+        return [self.get(name)[0] for name in (names if names is not None else self._tools)]
+
+    def validate(self, name: str, arguments: Union[str, bytes, Dict[str, Any], None]) -> Dict[str, Any]:
+        """Validate tool-call arguments and return the keyword arguments to call with."""
+        adapter = self.get(name)[1].adapter
+        try:
+            if isinstance(arguments, (str, bytes)):
+                model = adapter.validate_json(arguments or "{}")
+            else:
+                model = adapter.validate_python(arguments or {})
+        except ValidationError as e:
+            raise ToolArgumentError(name, e) from None
+        # Iterating the model yields (field, value) without re-serializing nested models
+        return dict(model)
+
+    async def call(self, name: str, arguments: Union[str, bytes, Dict[str, Any], None]) -> Any:
+        """Validate and invoke a tool (sync tools run inline; see ToolExecutor for offload)."""
+        tool = self.get(name)[0]
+        result = getattr(tool, "func", tool)(**self.validate(name, arguments))
+        return await result if inspect.isawaitable(result) else result
+
+
+_registry: Optional[ToolRegistry] = None
+_registry_lock = threading.Lock()
+_pending: List[List[Any]] = []  # toolsets queued by register_on_first_use()
+
+
+def register_on_first_use(tools: Iterable[Any]) -> None:
+    """Queue tools for the shared registry; they are compiled on the next get_tool_registry() call."""
+    with _registry_lock:
+        _pending.append(list(tools))
+
+
+def get_tool_registry() -> ToolRegistry:
+    """Process-wide registry shared by all agents (registers any queued tools first)."""
+    global _registry
+    if _registry is None or _pending:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ToolRegistry()
+            while _pending:
+                _registry.register_all(_pending.pop(0))
+    return _registry
+
+
+if __name__ == "__main__":
+    import asyncio
+    import time
+    from typing import Annotated, Literal
+    from pydantic import Field
+
+    def get_weather(
+        city: Annotated[str, Field(description="City name")],
+        units: Annotated[Literal["celsius", "fahrenheit"], Field(description="Temperature unit")] = "celsius"
+    ) -> str:
+        """Get current weather for a city."""
+        return f"Weather in {city}: 20 {units}"
+
+    def search_documents(
+        query: Annotated[str, Field(description="Search query")],
+        limit: Annotated[int, Field(description="Max results", ge=1, le=20)] = 10
+    ) -> list:
+        """Search internal document repository."""
+        return [query] * limit
+
+    def send_notification(
+        message: Annotated[str, Field(description="Message content")],
+        recipient: Annotated[str, Field(description="Email or user ID")],
+        priority: Annotated[Optional[str], Field(description="Priority: low, normal, high")] = "normal",
+        schedule: Annotated[Optional[str], Field(description="ISO datetime to send")] = None
+    ) -> str:
+        """Send a notification to a user."""
+        return f"queued for {recipient}"
+
+    toolset = [get_weather, search_documents, send_notification]
+    agents = 2000
+    calls = 20_000
+    raw_args = '{"query": "agent patterns", "limit": 5}'
+
+    registry = ToolRegistry()
+    registry.register_all(toolset)
+
+    # Agent construction: plain functions are wrapped into framework tools
+    # (schema and input model built) for every agent; the registry's tool
+    # objects are built once and shared
+    try:
+        from agent_framework.openai import OpenAIChatClient
+    except ImportError:
+        print("Agent construction: skipped (agent_framework is not installed)")
+    else:
+        client = OpenAIChatClient(model_id="gpt-4o-mini", api_key="benchmark")  # constructing sends no request
+
+        def build_agents(tools) -> float:
+            start = time.perf_counter()
+            for _ in range(agents):
+                client.create_agent(name="ToolAgent", instructions="Use the tools.", tools=tools())
+            return (time.perf_counter() - start) / agents
+
+        per_agent = build_agents(lambda: list(toolset))
+        shared = build_agents(registry.tools)
+        print(f"Agent construction (3 tools): {per_agent * 1e6:,.0f} µs plain functions vs "
+              f"{shared * 1e6:,.0f} µs registry tools")
+
+    # Dispatch: json.loads + building a model per call vs the compiled adapter
+    start = time.perf_counter()
+    for _ in range(calls // 10):
+        model = create_model("search_documents_arguments", **{
+            "query": (Annotated[str, Field(description="Search query")], ...),
+            "limit": (Annotated[int, Field(ge=1, le=20)], 10)
+        })
+        model.model_validate(json.loads(raw_args))
+    naive = (time.perf_counter() - start) / (calls // 10)
+
+    start = time.perf_counter()
+    for _ in range(calls):
+        registry.validate("search_documents", raw_args)
+    fast = (time.perf_counter() - start) / calls
+    print(f"Argument validation:          {naive * 1e6:,.0f} µs per-call model vs {fast * 1e6:,.2f} µs compiled")
+
+    async def dispatch():
+        start = time.perf_counter()
+        for _ in range(calls):
+            await registry.call("get_weather", {"city": "Tokyo"})
+        return (time.perf_counter() - start) / calls
+
+    print(f"Dispatch (validate + call):   {asyncio.run(dispatch()) * 1e6:,.2f} µs")
+
+    try:
+        registry.validate("search_documents", '{"query": "x", "limit": 99}')
+    except ToolArgumentError as e:
+        print(f"Rejected: {e}")
@@ -0,0 +1,74 @@
+"""
+Research Assistant - Headless Batch Mode
+Built with Microsoft Agent Framework
+
+Author: Nithin Mohan T K
+Part 3 of the MAF Series
+
+Runs research prompts from a JSONL file as independent sessions with bounded
+concurrency. Results are appended to an output JSONL file as each prompt
+completes; that file doubles as the checkpoint, so re-running the same command
+after an interruption only processes prompts that have not succeeded yet.
+
+Input lines:  {"id": "q1", "prompt": "Summarize recent work on agentic AI"}
+Output lines: {"id": "q1", "prompt": "...", "response": "...", "error": null, "latency_s": 4.2}
+
+Usage:
+    python batch_research.py prompts.jsonl results.jsonl --concurrency 8
+"""
+
+import argparse
+import asyncio
+import logging
+from pathlib import Path
+from typing import Optional
+
+from common.batch import BatchReport, read_jsonl, run_batch_jobs
+
+logger = logging.getLogger(__name__)
+
+
+async def run_batch(
+    agent,
+    input_path: Path,
+    output_path: Path,
+    concurrency: int = 8,
+    timeout: Optional[float] = 300
+) -> BatchReport:
+    """Run every pending prompt through the agent and stream results to output_path."""
+
+    def make_handler():
+        async def handle(record: dict) -> str:
+            # Each prompt is its own session
+            thread = agent.get_new_thread()
+            result = await agent.run(record["prompt"], thread)
+            return result.text
+        return handle
+
+    return await run_batch_jobs(
+        read_jsonl(input_path), output_path, make_handler,
+        concurrency=concurrency, timeout=timeout, unit="prompts", result_field="response", echo=("prompt",)
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Run research prompts in batch")
+    parser.add_argument("input", type=Path, help="JSONL file of prompts")
+    parser.add_argument("output", type=Path, help="JSONL file for results (also the resume checkpoint)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent sessions")
+    parser.add_argument("--timeout", type=float, default=300, help="Per-prompt timeout in seconds")
+    args = parser.parse_args()
+
+    from research_assistant import create_research_agent
+
+    agent = create_research_agent()
+    report = await run_batch(agent, args.input, args.output, args.concurrency, args.timeout)
+
+    print("\n" + "=" * 60)
+    print("  📊 Batch complete")
+    print("=" * 60)
+    print(report.summary())
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -7,17 +7,21 @@ Part 3 of the MAF Series
 """
 
 import asyncio
-import os
 import logging
 from typing import Annotated
 from datetime import datetime
 
 from dotenv import load_dotenv
 from pydantic import Field
-from azure.identity import AzureCliCredential
 
 from agent_framework import ai_function
-from agent_framework.azure import AzureOpenAIResponsesClient
+
+from stream_render import render_stream
+from tool_cache import cached_tool, cache_stats
+
+from common.clients import get_responses_client
+from common.lazy import lazy_factory
+from common.tool_executor import ToolExecutor, offloaded
 
 # Configure logging
 logging.basicConfig(
@@ -34,6 +38,7 @@ load_dotenv()
 # ============================================================
 
 @ai_function
+@cached_tool(ttl=600, stale_ttl=3600, max_entries=2048)
 async def search_web(
     query: Annotated[str, Field(description="The search query")],
     num_results: Annotated[int, Field(description="Number of results")] = 5
@@ -51,16 +56,17 @@ async def search_web(
     """
 
 @ai_function
+@offloaded(timeout=30)  # CPU-bound: keep it off the event loop thread
 def summarize_text(
     content: Annotated[str, Field(description="Content to summarize")],
     max_words: Annotated[int, Field(description="Max words")] = 100
 ) -> str:
     """Create a concise summary of the provided content."""
     logger.info(f"Summarizing content ({len(content)} chars)")
-    words = content.split()
-    if len(words) <= max_words:
-        return content
-    return ' '.join(words[:max_words]) + '...'
+    # Extractive: keeps the most central sentences rather than the first N words.
+    # Imported on first use so loading the tools doesn't pay for NumPy.
+    from summarizer import extractive_summary
+    return extractive_summary(content, max_words)
 
 @ai_function
 def format_citation(
@@ -81,30 +87,41 @@ def get_date() -> str:
 # MAIN APPLICATION
 # ============================================================
 
+RESEARCH_INSTRUCTIONS = """
+    You are an expert research assistant. Your capabilities:
+    
+    1. Search the web for current information
+    2. Summarize complex content concisely
+    3. Provide properly formatted citations
+    4. Give accurate, well-sourced answers
+    
+    Always:
+    - Cite your sources
+    - Be objective and accurate
+    - Acknowledge uncertainty when appropriate
+    - Use tools to find real information
+"""
+
+
+@lazy_factory
+def get_tool_executor() -> ToolExecutor:
+    """Runs the agent's tool calls: sync tools on the thread pool, never on the event loop."""
+    return ToolExecutor([search_web, summarize_text, format_citation, get_date])
+
+
+def create_research_agent():
+    """Create the research assistant agent (shared by interactive and batch modes)."""
+    return get_responses_client().create_agent(
+        name="ResearchAssistant",
+        instructions=RESEARCH_INSTRUCTIONS,
+        tools=get_tool_executor().agent_tools()
+    )
+
+
 async def main():
     try:
         # Initialize agent
-        agent = AzureOpenAIResponsesClient(
-            credential=AzureCliCredential(),
-            endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-        ).create_agent(
-            name="ResearchAssistant",
-            instructions="""
-                You are an expert research assistant. Your capabilities:
-                
-                1. Search the web for current information
-                2. Summarize complex content concisely
-                3. Provide properly formatted citations
-                4. Give accurate, well-sourced answers
-                
-                Always:
-                - Cite your sources
-                - Be objective and accurate
-                - Acknowledge uncertainty when appropriate
-                - Use tools to find real information
-            """,
-            tools=[search_web, summarize_text, format_citation, get_date]
-        )
+        agent = create_research_agent()
         
         # Create conversation thread
         thread = agent.get_new_thread()
@@ -123,6 +140,7 @@ async def main():
                     continue
                 
                 if user_input.lower() == 'exit':
+                    logger.info(f"Tool cache stats: {cache_stats()}")
                     print("\n👋 Thank you for using Research Assistant!")
                     break
                 
@@ -134,16 +152,11 @@ async def main():
                 # Stream the response
                 print("\n🤖 Assistant: ", end="", flush=True)
                 
-                start_time = datetime.now()
-                response_text = ""
-                
-                async for update in agent.run_stream(user_input, thread):
-                    if update.text:
-                        print(update.text, end="", flush=True)
-                        response_text += update.text
+                result = await render_stream(agent.run_stream(user_input, thread))
                 
-                elapsed = (datetime.now() - start_time).total_seconds()
-                print(f"\n\n⏱️  [Response time: {elapsed:.2f}s]")
+                ttft = f"{result.ttft:.2f}s" if result.ttft is not None else "n/a"
+                print(f"\n\n⏱️  [Response time: {result.elapsed:.2f}s | "
+                      f"first token: {ttft} | {result.tokens_per_sec:.0f} tokens/s]")
                 
             except KeyboardInterrupt:
                 print("\n\n⚠️  Interrupted. Type 'exit' to quit.")
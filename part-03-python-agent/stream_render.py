@@ -0,0 +1,168 @@
+"""
+Streaming Response Renderer
+Buffered consumer for agent.run_stream()
+
+Author: Nithin Mohan T K
+Part 3 of the MAF Series
+
+Collects streamed chunks into a list (joined once at the end instead of
+repeated string concatenation) and writes to the terminal on a time/size
+cadence rather than one write+flush per token. The time cadence runs on a
+timer, so text isn't held back while the model pauses between chunks, and
+whatever is pending is written even if the stream fails. Time-to-first-token and
+tokens/sec are measured while streaming, without a second pass.
+"""
+
+import asyncio
+import sys
+import time
+from dataclasses import dataclass
+from typing import AsyncIterable, List, Optional, TextIO
+
+
+@dataclass
+class StreamResult:
+    text: str
+    chunks: int
+    ttft: Optional[float]  # seconds until the first text chunk
+    elapsed: float
+
+    @property
+    def tokens_per_sec(self) -> float:
+        """Streaming rate after the first token (each text chunk counted as one token)."""
+        if self.ttft is None or self.chunks < 2:
+            return 0.0
+        generation_time = self.elapsed - self.ttft
+        return (self.chunks - 1) / generation_time if generation_time > 0 else 0.0
+
+
+class StreamRenderer:
+    """Accumulates chunks and flushes them to `out` in batches."""
+
+    def __init__(
+        self,
+        out: TextIO = sys.stdout,
+        flush_interval: Optional[float] = None,
+        flush_bytes: int = 4096
+    ):
+        self.out = out
+        # Interactive terminals get a short cadence; pipes/log files mostly flush by size
+        if flush_interval is None:
+            flush_interval = 0.05 if getattr(out, "isatty", lambda: False)() else 1.0
+        self.flush_interval = flush_interval
+        self.flush_bytes = flush_bytes
+
+        self._chunks: List[str] = []
+        self._pending: List[str] = []
+        self._pending_size = 0
+        self._start = time.perf_counter()
+        self._last_flush = self._start
+        self._first_chunk_at: Optional[float] = None
+
+    def start(self) -> None:
+        """Reset the clock (call right before the request is sent)."""
+        self._start = self._last_flush = time.perf_counter()
+
+    def write(self, chunk: str) -> None:
+        if not chunk:
+            return
+        now = time.perf_counter()
+        if self._first_chunk_at is None:
+            self._first_chunk_at = now
+            # Show the first token immediately - it is what the user is waiting for
+            self._chunks.append(chunk)
+            self.out.write(chunk)
+            self.out.flush()
+            self._last_flush = now
+            return
+
+        self._chunks.append(chunk)
+        self._pending.append(chunk)
+        self._pending_size += len(chunk)
+        if self._pending_size >= self.flush_bytes or now - self._last_flush >= self.flush_interval:
+            self._flush(now)
+
+    def time_until_flush(self) -> Optional[float]:
+        """Seconds until pending text is due on the time cadence (None if nothing is pending)."""
+        if not self._pending:
+            return None
+        return max(0.0, self.flush_interval - (time.perf_counter() - self._last_flush))
+
+    def flush(self) -> None:
+        self._flush(time.perf_counter())
+
+    def _flush(self, now: float) -> None:
+        if self._pending:
+            self.out.write("".join(self._pending))
+            self.out.flush()
+            self._pending.clear()
+            self._pending_size = 0
+        self._last_flush = now
+
+    def finish(self) -> StreamResult:
+        now = time.perf_counter()
+        self._flush(now)
+        return StreamResult(
+            text="".join(self._chunks),
+            chunks=len(self._chunks),
+            ttft=(self._first_chunk_at - self._start) if self._first_chunk_at is not None else None,
+            elapsed=now - self._start
+        )
+
+
+async def _flush_timer(renderer: StreamRenderer) -> None:
+    while True:
+        delay = renderer.time_until_flush()
+        await asyncio.sleep(renderer.flush_interval if delay is None else delay)
+        if renderer.time_until_flush() == 0.0:
+            renderer.flush()
+
+
+async def render_stream(updates: AsyncIterable, out: TextIO = sys.stdout, **options) -> StreamResult:
+    """Consume an agent.run_stream() iterator, rendering text as it arrives."""
+    renderer = StreamRenderer(out, **options)
+    # The timer flushes pending text while the stream is quiet; chunks that
+    # arrive in the meantime still flush inline by size and time
+    timer = asyncio.create_task(_flush_timer(renderer))
+    try:
+        async for update in updates:
+            if update.text:
+                renderer.write(update.text)
+    finally:
+        timer.cancel()
+        # Show what arrived before a failure or cancellation
+        renderer.flush()
+    return renderer.finish()
+
+
+if __name__ == "__main__":
+    import io
+
+    class Update:
+        def __init__(self, text):
+            self.text = text
+
+    async def fake_stream(n):
+        for i in range(n):
+            yield Update(f"token{i} ")
+
+    async def naive(n, out):
+        response_text = ""
+        async for update in fake_stream(n):
+            if update.text:
+                print(update.text, end="", file=out, flush=True)
+                response_text += update.text
+        return response_text
+
+    async def demo():
+        n = 200_000
+        start = time.perf_counter()
+        await naive(n, io.StringIO())
+        print(f"Per-chunk print + concat: {time.perf_counter() - start:.2f}s")
+
+        start = time.perf_counter()
+        result = await render_stream(fake_stream(n), io.StringIO())
+        print(f"StreamRenderer:           {time.perf_counter() - start:.2f}s "
+              f"({result.chunks} chunks, {result.tokens_per_sec:,.0f} tokens/s)")
+
+    asyncio.run(demo())
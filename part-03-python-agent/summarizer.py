@@ -0,0 +1,210 @@
+"""
+Extractive Summarizer
+Local TF-IDF / TextRank sentence ranking (no network, no model)
+
+Author: Nithin Mohan T K
+Part 3 of the MAF Series
+
+Sentences are turned into a sparse TF-IDF matrix X (CSR arrays in NumPy),
+then ranked with TextRank over the cosine-similarity graph X·Xᵀ. The graph is
+never materialized: each power-iteration step is two sparse mat-vecs,
+X·(Xᵀ·v), so cost grows with the number of terms rather than sentences².
+The highest-ranked sentences are returned in document order within a word
+budget. summarize_stream() handles inputs too large to hold at once by
+ranking fixed-size windows and re-ranking the surviving candidates.
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Iterable, List, Tuple
+
+import numpy as np
+
+SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+(?=[\"'(\[A-Z0-9])|\n\s*\n")
+TOKEN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being
+below between both but by can did do does doing down during each few for from further had has
+have having he her here hers herself him himself his how i if in into is it its itself just me
+more most my myself no nor not now of off on once only or other our ours ourselves out over own
+same she should so some such than that the their theirs them themselves then there these they
+this those through to too under until up very was we were what when where which while who whom
+why will with you your yours yourself yourselves
+""".split())
+
+
+@dataclass
+class SparseMatrix:
+    """Minimal CSR matrix: rows are sentences, columns are terms."""
+    data: np.ndarray
+    indices: np.ndarray
+    row_of: np.ndarray  # row index of every stored value
+    shape: Tuple[int, int]
+
+    def dot(self, vector: np.ndarray) -> np.ndarray:
+        """X · v"""
+        return np.bincount(self.row_of, weights=self.data * vector[self.indices], minlength=self.shape[0])
+
+    def tdot(self, vector: np.ndarray) -> np.ndarray:
+        """Xᵀ · v"""
+        return np.bincount(self.indices, weights=self.data * vector[self.row_of], minlength=self.shape[1])
+
+
+def split_sentences(text: str) -> List[str]:
+    return [s.strip() for s in SENTENCE_SPLIT.split(text) if s and s.strip()]
+
+
+def tfidf_matrix(sentences: List[str]) -> SparseMatrix:
+    """Build an L2-normalized sublinear TF-IDF matrix for the sentences."""
+    tokens, rows = [], []
+    for row, sentence in enumerate(sentences):
+        words = [w for w in TOKEN.findall(sentence.lower()) if w not in STOPWORDS]
+        tokens.extend(words)
+        rows.extend([row] * len(words))
+
+    n_rows = len(sentences)
+    if not tokens:
+        empty = np.zeros(0)
+        return SparseMatrix(empty, empty.astype(np.int64), empty.astype(np.int64), (n_rows, 0))
+
+    vocab, term_ids = np.unique(np.array(tokens), return_inverse=True)
+    n_terms = len(vocab)
+    rows = np.array(rows, dtype=np.int64)
+
+    # Count (sentence, term) pairs in one vectorized pass
+    pair_keys, counts = np.unique(rows * n_terms + term_ids, return_counts=True)
+    row_of = pair_keys // n_terms
+    indices = pair_keys % n_terms
+
+    df = np.bincount(indices, minlength=n_terms)
+    idf = np.log((1 + n_rows) / (1 + df)) + 1.0
+    data = (1.0 + np.log(counts)) * idf[indices]
+
+    norms = np.sqrt(np.bincount(row_of, weights=data * data, minlength=n_rows))
+    data = data / norms[row_of]
+    return SparseMatrix(data, indices, row_of, (n_rows, n_terms))
+
+
+def textrank_scores(matrix: SparseMatrix, damping: float = 0.85, iterations: int = 50, tol: float = 1e-6) -> np.ndarray:
+    """PageRank over the sentence cosine-similarity graph, computed matrix-free."""
+    n = matrix.shape[0]
+    if n == 0:
+        return np.zeros(0)
+
+    nonempty = np.bincount(matrix.row_of, minlength=n) > 0
+    # Weighted degree of each sentence, excluding its similarity to itself
+    degree = matrix.dot(matrix.tdot(np.ones(n))) - nonempty
+    degree[degree <= 0] = 1.0
+
+    scores = np.full(n, 1.0 / n)
+    for _ in range(iterations):
+        v = scores / degree
+        spread = matrix.dot(matrix.tdot(v)) - v * nonempty
+        updated = (1 - damping) / n + damping * spread
+        if np.abs(updated - scores).sum() < tol:
+            return updated
+        scores = updated
+    return scores
+
+
+def rank_sentences(sentences: List[str]) -> np.ndarray:
+    """Sentence indices ordered from most to least central."""
+    scores = textrank_scores(tfidf_matrix(sentences))
+    # Stable sort keeps earlier sentences first on ties
+    return np.argsort(-scores, kind="stable")
+
+
+def _select(sentences: List[str], order: np.ndarray, max_words: int) -> List[int]:
+    chosen, budget = [], max_words
+    for index in order:
+        length = len(sentences[index].split())
+        if length <= budget:
+            chosen.append(int(index))
+            budget -= length
+        if budget <= 0:
+            break
+    if not chosen and len(order):
+        chosen.append(int(order[0]))
+    return sorted(chosen)
+
+
+def extractive_summary(text: str, max_words: int = 100) -> str:
+    """Return the most central sentences, in document order, within max_words."""
+    if len(text.split()) <= max_words:
+        return text
+    sentences = split_sentences(text)
+    if len(sentences) <= 1:
+        return " ".join(text.split()[:max_words]) + "..."
+
+    chosen = _select(sentences, rank_sentences(sentences), max_words)
+    summary = " ".join(sentences[i] for i in chosen)
+    words = summary.split()
+    return summary if len(words) <= max_words else " ".join(words[:max_words]) + "..."
+
+
+def summarize_stream(chunks: Iterable[str], max_words: int = 100, window_sentences: int = 2000) -> str:
+    """
+    Summarize a very large input delivered in chunks (e.g. file reads).
+
+    Each window of sentences keeps only its best candidates (a few times the
+    word budget), so memory stays bounded; the candidates are then ranked
+    together for the final summary.
+    """
+    candidates: List[Tuple[int, str]] = []
+    window: List[str] = []
+    position = 0
+    carry = ""
+
+    def flush_window():
+        nonlocal window, position
+        if window:
+            keep = _select(window, rank_sentences(window), max_words * 3)
+            candidates.extend((position + i, window[i]) for i in keep)
+            position += len(window)
+            window = []
+
+    for chunk in chunks:
+        buffer = carry + chunk
+        boundary = None
+        for boundary in SENTENCE_SPLIT.finditer(buffer):
+            pass
+        if boundary is None:
+            carry = buffer
+            continue
+        # Everything after the last boundary may continue in the next chunk;
+        # it is carried unstripped so the chunk joins with its own whitespace
+        window.extend(split_sentences(buffer[:boundary.start()]))
+        carry = buffer[boundary.end():]
+        if len(window) >= window_sentences:
+            flush_window()
+
+    window.extend(split_sentences(carry))
+    flush_window()
+
+    sentences = [s for _, s in sorted(candidates)]
+    return extractive_summary(" ".join(sentences), max_words)
+
+
+if __name__ == "__main__":
+    import random
+    import time
+
+    random.seed(7)
+    topics = ["agents", "workflow", "latency", "threads", "tools", "redis", "approval", "telemetry"]
+    filler = ["the", "system", "team", "report", "value", "process", "result", "model", "data"]
+    document = " ".join(
+        f"{random.choice(topics).title()} {' '.join(random.choices(topics + filler, k=random.randint(8, 25)))}."
+        for _ in range(4000)
+    )
+    print(f"Document: {len(document) / 1024:.0f} KB, {len(split_sentences(document))} sentences")
+
+    start = time.perf_counter()
+    summary = extractive_summary(document, max_words=80)
+    print(f"extractive_summary: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    start = time.perf_counter()
+    chunks = (document[i:i + 65536] for i in range(0, len(document), 65536))
+    summarize_stream(chunks, max_words=80, window_sentences=1000)
+    print(f"summarize_stream:   {(time.perf_counter() - start) * 1000:.1f} ms")
+    print(f"\nSummary ({len(summary.split())} words):\n{summary}")
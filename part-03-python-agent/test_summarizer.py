@@ -0,0 +1,27 @@
+from summarizer import extractive_summary, split_sentences, summarize_stream
+
+TEXT = (
+    "The cat sat on the mat. The dog ran far away. Agents call tools in a loop. "
+    "Workflows chain agents together. Threads keep the conversation history. "
+    "Tools return results to the agent."
+)
+
+
+def _chunks(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def test_stream_matches_whole_text_at_every_chunk_size():
+    expected = extractive_summary(" ".join(split_sentences(TEXT)), max_words=1000)
+    for size in range(1, len(TEXT) + 1):
+        assert summarize_stream(_chunks(TEXT, size), max_words=1000) == expected, size
+
+
+def test_chunk_boundary_inside_sentence_keeps_the_space():
+    summary = summarize_stream(["The dog ", "ran far away. The cat sat."], max_words=1000)
+    assert summary == "The dog ran far away. The cat sat."
+
+
+def test_chunk_boundary_after_sentence_end_still_splits():
+    summary = summarize_stream(["The cat sat on the mat. ", "The dog ran."], max_words=1000)
+    assert summary == "The cat sat on the mat. The dog ran."
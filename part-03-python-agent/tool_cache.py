@@ -0,0 +1,226 @@
+"""
+Tool Result Cache
+Async caching decorator for ai_function tools
+
+Author: Nithin Mohan T K
+Part 3 of the MAF Series
+
+Features:
+- Normalized keys (case and whitespace insensitive string arguments)
+- TTL expiry with a bounded LRU
+- Concurrent identical calls coalesced into a single backend call
+- Stale-while-revalidate: stale results are served while a refresh runs
+- Per-tool hit-rate metrics via cache_stats()
+"""
+
+import asyncio
+import functools
+import inspect
+import json
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# All caches created by @cached_tool, keyed by tool name
+_CACHES: Dict[str, "ToolCache"] = {}
+
+
+def normalize_value(value: Any) -> Any:
+    """Normalize an argument so trivially different queries share a cache entry."""
+    if isinstance(value, str):
+        return " ".join(value.split()).casefold()
+    return value
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    stale_hits: int = 0
+    misses: int = 0
+    coalesced: int = 0
+    refreshes: int = 0
+    errors: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        served = self.hits + self.stale_hits + self.coalesced
+        total = served + self.misses
+        return served / total if total else 0.0
+
+    def to_dict(self) -> dict:
+        return {**asdict(self), "hit_rate": round(self.hit_rate, 4)}
+
+
+@dataclass
+class _Entry:
+    value: Any
+    stored_at: float
+
+
+class ToolCache:
+    """TTL + LRU cache with request coalescing and stale-while-revalidate."""
+
+    def __init__(self, name: str, ttl: float = 300, stale_ttl: float = 0, max_entries: int = 1024):
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.stats = CacheStats()
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._load_tasks: set = set()
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        entry = self._entries.get(key)
+        if entry is not None:
+            age = time.monotonic() - entry.stored_at
+            if age < self.ttl:
+                self.stats.hits += 1
+                self._entries.move_to_end(key)
+                return entry.value
+            if age < self.ttl + self.stale_ttl:
+                self.stats.stale_hits += 1
+                self._entries.move_to_end(key)
+                if key not in self._inflight:
+                    self._start_refresh(key, loader)
+                return entry.value
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.stats.coalesced += 1
+            return await asyncio.shield(inflight)
+
+        self.stats.misses += 1
+        # Shielded: a cancelled caller doesn't cancel the load other callers share
+        return await asyncio.shield(self._start_load(key, loader))
+
+    def _start_load(self, key: str, loader: Callable[[], Awaitable[Any]]) -> asyncio.Future:
+        """
+        Register the shared future for `key` synchronously, then load in a task.
+        Concurrent callers in the same tick see the registration and coalesce,
+        and the load doesn't belong to any one caller.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._inflight[key] = future
+
+        async def load():
+            try:
+                value = await loader()
+            except asyncio.CancelledError:
+                future.cancel()
+                raise
+            except Exception as e:
+                self.stats.errors += 1
+                future.set_exception(e)
+                future.exception()  # mark retrieved when nobody else is waiting
+            else:
+                self._store(key, value)
+                future.set_result(value)
+            finally:
+                if self._inflight.get(key) is future:
+                    del self._inflight[key]
+
+        task = loop.create_task(load())
+        self._load_tasks.add(task)
+        task.add_done_callback(self._load_tasks.discard)
+        return future
+
+    def _start_refresh(self, key: str, loader: Callable[[], Awaitable[Any]]) -> None:
+        self.stats.refreshes += 1
+
+        def report(future: asyncio.Future) -> None:
+            if not future.cancelled() and future.exception() is not None:
+                logger.warning(
+                    f"Background refresh for {self.name} failed, keeping stale value: {future.exception()}"
+                )
+
+        self._start_load(key, loader).add_done_callback(report)
+
+    def _store(self, key: str, value: Any) -> None:
+        self._entries[key] = _Entry(value=value, stored_at=time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats.evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def cached_tool(
+    ttl: float = 300,
+    stale_ttl: float = 0,
+    max_entries: int = 1024,
+    normalize: Callable[[Any], Any] = normalize_value,
+    name: Optional[str] = None
+):
+    """
+    Cache an async tool's results. Apply underneath @ai_function:
+
+        @ai_function
+        @cached_tool(ttl=600, stale_ttl=3600)
+        async def search_web(query: ..., num_results: ...) -> str: ...
+    """
+    def decorator(func):
+        if not inspect.iscoroutinefunction(func):
+            raise TypeError(f"@cached_tool requires an async function, got {func.__name__}")
+
+        signature = inspect.signature(func)
+        cache = ToolCache(name or func.__name__, ttl=ttl, stale_ttl=stale_ttl, max_entries=max_entries)
+        _CACHES[cache.name] = cache
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = json.dumps(
+                {param: normalize(value) for param, value in bound.arguments.items()},
+                sort_keys=True,
+                default=repr
+            )
+            return await cache.get_or_load(key, lambda: func(*args, **kwargs))
+
+        wrapper.cache = cache
+        return wrapper
+
+    return decorator
+
+
+def cache_stats() -> Dict[str, dict]:
+    """Hit-rate metrics for every cached tool."""
+    return {name: cache.stats.to_dict() for name, cache in _CACHES.items()}
+
+
+if __name__ == "__main__":
+    @cached_tool(ttl=0.2, stale_ttl=1.0)
+    async def slow_search(query: str, num_results: int = 5) -> str:
+        await asyncio.sleep(0.3)  # simulate a 300 ms search backend
+        return f"results for {query}"
+
+    async def demo():
+        start = time.perf_counter()
+        await asyncio.gather(*(slow_search("AI  Agents") for _ in range(50)))
+        print(f"50 concurrent identical calls: {time.perf_counter() - start:.2f}s")
+
+        start = time.perf_counter()
+        await slow_search("ai agents ")
+        print(f"Normalized repeat: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        await asyncio.sleep(0.3)
+        start = time.perf_counter()
+        await slow_search("ai agents")
+        print(f"Stale hit (refreshing in background): {(time.perf_counter() - start) * 1000:.1f} ms")
+        await asyncio.sleep(0.4)
+
+        print(json.dumps(cache_stats(), indent=2))
+
+    asyncio.run(demo())
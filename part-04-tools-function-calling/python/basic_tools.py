@@ -1,11 +1,27 @@
 """
 Part 4: Tool Definition Patterns - Python Examples
 """
+import asyncio
+import logging
+import os
+from datetime import datetime, timezone
 from typing import Annotated, Literal, Optional, List
 from pydantic import Field, BaseModel
 from agent_framework import ai_function
 import aiohttp
 
+from http_client import get_http_client
+from notification_dispatcher import Notification, get_notification_dispatcher
+from search_index import SearchIndex
+
+from common.clients import get_responses_client
+from common.lazy import lazy_factory
+from common.tool_executor import ToolExecutor, offloaded
+from common.tool_registry import get_tool_registry, register_on_first_use
+
+logger = logging.getLogger(__name__)
+
+
 # Pattern 1: Simple function with typed parameters
 @ai_function
 def get_weather(
@@ -30,11 +46,13 @@ async def fetch_api_data(
 ) -> str:
     """Fetch data from an external API."""
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(endpoint, timeout=10) as response:
-                if response.status == 200:
-                    return await response.text()
-                return f"API returned status {response.status}"
+        # Shared pooled client: keep-alive, DNS cache, ETag revalidation, size cap
+        response = await get_http_client().get(endpoint)
+        if response.status == 200:
+            if response.truncated:
+                return response.text + "\n[Response truncated]"
+            return response.text
+        return f"API returned status {response.status}"
     except aiohttp.ClientError as e:
         return f"API error: {str(e)}"
 
@@ -46,33 +64,92 @@ class SearchResult(BaseModel):
     snippet: str
 
 @ai_function
+@offloaded(timeout=5)  # index scoring is CPU work; don't block the event loop
 def search_documents(
     query: Annotated[str, Field(description="Search query")],
     limit: Annotated[int, Field(description="Max results", ge=1, le=20)] = 10
 ) -> List[dict]:
     """Search internal document repository."""
-    results = [
-        {"title": f"Document about {query}", "url": f"/docs/{i}", "snippet": f"Content related to {query}..."}
-        for i in range(min(limit, 3))
-    ]
-    return results
+    index = get_search_index()
+    if index is None:
+        # No index configured: placeholder results, as before the index existed
+        return [
+            {"title": f"Document about {query}", "url": f"/docs/{i}", "snippet": f"Content related to {query}..."}
+            for i in range(min(limit, 3))
+        ]
+    hits = index.search(query, k=limit)
+    return [{"title": h["title"], "url": h["url"], "snippet": h["snippet"]} for h in hits]
+
+
+@lazy_factory
+def get_search_index() -> Optional[SearchIndex]:
+    """BM25 index over the document repository, memory-mapped from SEARCH_INDEX_DIR (None if unset)."""
+    directory = os.getenv("SEARCH_INDEX_DIR")
+    if not directory:
+        logger.warning("SEARCH_INDEX_DIR is not set; search_documents returns placeholder results")
+        return None
+    if not os.path.exists(os.path.join(directory, "meta.json")):
+        raise FileNotFoundError(f"SEARCH_INDEX_DIR={directory!r} has no saved index (meta.json)")
+    return SearchIndex.load(directory)
 
 
 # Pattern 4: Optional parameters with defaults
 @ai_function
-def send_notification(
+async def send_notification(
     message: Annotated[str, Field(description="Message content")],
     recipient: Annotated[str, Field(description="Email or user ID")],
     priority: Annotated[Optional[str], Field(description="Priority: low, normal, high")] = "normal",
     schedule: Annotated[Optional[str], Field(description="ISO datetime to send")] = None
 ) -> str:
     """Send a notification to a user."""
+    deliver_at = None
+    if schedule:
+        try:
+            when = datetime.fromisoformat(schedule)
+        except ValueError:
+            return f"Invalid schedule '{schedule}': use an ISO datetime such as 2025-01-31T09:00:00+00:00"
+        # Naive datetimes are treated as UTC
+        deliver_at = (when if when.tzinfo else when.replace(tzinfo=timezone.utc)).timestamp()
+
+    # Queued only; delivery is batched in the background
+    notification_id = get_notification_dispatcher().submit(
+        Notification(message, recipient, priority or "normal", deliver_at)
+    )
     scheduled_info = f" scheduled for {schedule}" if schedule else ""
-    return f"Notification ({priority}) queued for {recipient}{scheduled_info}"
+    return f"Notification {notification_id} ({priority}) queued for {recipient}{scheduled_info}"
+
+
+# Schemas and validators are compiled on first registry use, once, and shared by every agent
+register_on_first_use([get_weather, fetch_api_data, search_documents, send_notification])
+
+
+@lazy_factory
+def get_tool_executor() -> ToolExecutor:
+    """Runs the agents' tool calls: sync tools on the thread pool, never on the event loop."""
+    registry = get_tool_registry()
+    return ToolExecutor(
+        registry.tools(["get_weather", "fetch_api_data", "search_documents", "send_notification"]),
+        registry=registry
+    )
+
+
+def create_tools_agent(client=None):
+    """Agent over the shared executor's tool objects (built once, no per-agent tool setup)."""
+    client = client or get_responses_client()
+    return client.create_agent(
+        name="ToolsAgent",
+        instructions="Answer using the available tools.",
+        tools=get_tool_executor().agent_tools()
+    )
+
+
+async def demo():
+    print(get_weather("New York", "fahrenheit"))
+    print(await search_documents("AI agents", 5))
+    print(await send_notification("Hello!", "user@example.com", "high"))
+    await get_notification_dispatcher().stop()  # flush queued notifications
 
 
 if __name__ == "__main__":
     # Demo the tools
-    print(get_weather("New York", "fahrenheit"))
-    print(search_documents("AI agents", 5))
-    print(send_notification("Hello!", "user@example.com", "high"))
+    asyncio.run(demo())
@@ -0,0 +1,212 @@
+"""
+Part 4: Read-Through Customer Cache for CRMTools
+
+Agents look up the same customer several times per conversation; this cache
+answers the repeats without a CRM round trip:
+- Bounded LRU with a per-entry TTL
+- Negative caching: "not found" is remembered briefly (negative_ttl)
+- Explicit invalidation when a mutating tool touches a customer
+- Optional Redis tier shared by all workers; the local tier then uses a
+  short local_ttl so an invalidation on one worker is seen by the others
+  within seconds
+- Hit/miss statistics via stats.to_dict() for tuning the TTLs
+"""
+import json
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
+from typing import Dict, Iterable, Iterator, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# peek() result for ids the local tier knows nothing about
+MISSING = object()
+
+
+@dataclass
+class CustomerCacheStats:
+    hits: int = 0
+    negative_hits: int = 0
+    shared_hits: int = 0  # served from Redis
+    misses: int = 0
+    invalidations: int = 0
+    evictions: int = 0
+    shared_errors: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        served = self.hits + self.negative_hits + self.shared_hits
+        total = served + self.misses
+        return served / total if total else 0.0
+
+    def to_dict(self) -> dict:
+        return {**asdict(self), "hit_rate": round(self.hit_rate, 4)}
+
+
+class CustomerCache:
+    """Two-tier (local LRU + optional Redis) cache of customer records."""
+
+    def __init__(
+        self,
+        ttl: float = 300,
+        negative_ttl: float = 30,
+        max_entries: int = 10_000,
+        redis_url: Optional[str] = None,
+        local_ttl: float = 5,
+        namespace: str = "crm:customer"
+    ):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.namespace = namespace
+        self.stats = CustomerCacheStats()
+        self._entries: "OrderedDict[str, tuple[Optional[dict], float]]" = OrderedDict()
+        # Invalidation epochs guard against a lookup that started before an
+        # invalidation writing its (now stale) result back afterwards. An
+        # epoch is only dropped once no lookup older than it is in flight.
+        self._epoch = 0
+        self._invalidated: Dict[str, int] = {}
+        self._lookups: Dict[int, int] = {}  # token -> backend lookups in flight
+
+        self.redis = None
+        if redis_url:
+            import redis.asyncio as aioredis
+            self.redis = aioredis.from_url(redis_url)
+        # With a shared tier, keep local copies briefly so invalidations propagate
+        self.local_ttl = min(local_ttl, ttl) if self.redis else ttl
+
+    def _key(self, customer_id: str) -> str:
+        return f"{self.namespace}:{customer_id}"
+
+    # ------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------
+
+    def peek(self, customer_id: str):
+        """Local-tier lookup without I/O. Returns the record, None (known not to exist) or MISSING."""
+        entry = self._entries.get(customer_id)
+        if entry is None:
+            return MISSING
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._entries[customer_id]
+            return MISSING
+        self._entries.move_to_end(customer_id)
+        if value is None:
+            self.stats.negative_hits += 1
+        else:
+            self.stats.hits += 1
+        return value
+
+    async def get_many(self, customer_ids: List[str]) -> Dict[str, Optional[dict]]:
+        """Cached entries for the ids (local, then one Redis MGET); misses are omitted."""
+        found: Dict[str, Optional[dict]] = {}
+        remaining = []
+        for customer_id in customer_ids:
+            value = self.peek(customer_id)
+            if value is MISSING:
+                remaining.append(customer_id)
+            else:
+                found[customer_id] = value
+
+        if remaining and self.redis is not None:
+            try:
+                raws = await self.redis.mget([self._key(i) for i in remaining])
+            except Exception as e:
+                self.stats.shared_errors += 1
+                logger.warning(f"Customer cache Redis read failed: {e}")
+                raws = [None] * len(remaining)
+            still_missing = []
+            for customer_id, raw in zip(remaining, raws):
+                if raw is None:
+                    still_missing.append(customer_id)
+                    continue
+                value = json.loads(raw)
+                self.stats.shared_hits += 1
+                self._store_local(customer_id, value)
+                found[customer_id] = value
+            remaining = still_missing
+
+        self.stats.misses += len(remaining)
+        return found
+
+    # ------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------
+
+    @contextmanager
+    def lookup(self) -> Iterator[int]:
+        """
+        Wrap a backend lookup; pass the token to set_many() with its results.
+
+            with cache.lookup() as token:
+                records = await fetch(ids)
+                await cache.set_many(records, token)
+        """
+        token = self._epoch
+        self._lookups[token] = self._lookups.get(token, 0) + 1
+        try:
+            yield token
+        finally:
+            remaining = self._lookups[token] - 1
+            if remaining:
+                self._lookups[token] = remaining
+            else:
+                del self._lookups[token]
+            self._prune_invalidated()
+
+    def _prune_invalidated(self) -> None:
+        """Forget invalidation epochs no in-flight lookup predates (once over max_entries)."""
+        if len(self._invalidated) <= self.max_entries:
+            return
+        oldest = min(self._lookups, default=self._epoch)
+        self._invalidated = {i: epoch for i, epoch in self._invalidated.items() if epoch > oldest}
+
+    async def set_many(self, customers: Dict[str, Optional[dict]], token: Optional[int] = None) -> None:
+        """Cache lookup results; None marks a customer that doesn't exist."""
+        if token is not None:
+            customers = {i: v for i, v in customers.items() if self._invalidated.get(i, -1) <= token}
+        for customer_id, value in customers.items():
+            self._store_local(customer_id, value)
+
+        if self.redis is not None and customers:
+            try:
+                pipe = self.redis.pipeline(transaction=False)
+                for customer_id, value in customers.items():
+                    ttl = self.ttl if value is not None else self.negative_ttl
+                    pipe.set(self._key(customer_id), json.dumps(value), ex=max(1, int(ttl)))
+                await pipe.execute()
+            except Exception as e:
+                self.stats.shared_errors += 1
+                logger.warning(f"Customer cache Redis write failed: {e}")
+
+    async def invalidate(self, customer_ids: Iterable[str]) -> None:
+        """Drop customers from both tiers (call after a mutation)."""
+        ids = list(customer_ids)
+        self._epoch += 1
+        for customer_id in ids:
+            self._entries.pop(customer_id, None)
+            self._invalidated[customer_id] = self._epoch
+        self._prune_invalidated()
+        self.stats.invalidations += len(ids)
+        if self.redis is not None and ids:
+            try:
+                await self.redis.delete(*[self._key(i) for i in ids])
+            except Exception as e:
+                self.stats.shared_errors += 1
+                logger.warning(f"Customer cache Redis invalidation failed: {e}")
+
+    def _store_local(self, customer_id: str, value: Optional[dict]) -> None:
+        ttl = self.local_ttl if value is not None else min(self.negative_ttl, self.local_ttl)
+        self._entries[customer_id] = (value, time.monotonic() + ttl)
+        self._entries.move_to_end(customer_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats.evictions += 1
+
+    async def close(self) -> None:
+        if self.redis is not None:
+            await self.redis.aclose()
+
@@ -1,48 +1,199 @@
 """
 Part 4: CRM Integration Tools
 """
+import asyncio
 import os
 import aiohttp
-from typing import Annotated
+from typing import Annotated, Dict, List, Optional
 from pydantic import Field
 from agent_framework import ai_function
+import logging
+
+from crm_cache import MISSING, CustomerCache
+from crm_loader import BatchLoader
+from crm_orders import OrderBatcher, OrderRequest, OrderResult
+from http_client import discard_session
+
+from common.idempotency import idempotency_key
+from common.tool_registry import ToolRegistry, get_tool_registry
+
+logger = logging.getLogger(__name__)
+
+
+class CRMError(Exception):
+    """Unexpected status from the CRM API."""
+
+    def __init__(self, status: int):
+        self.status = status
+        super().__init__(f"CRM API returned status {status}")
 
 
 class CRMTools:
     """Tools for CRM integration."""
-    
-    def __init__(self, api_key: str, base_url: str):
+
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str,
+        batch_size: int = 100,
+        limit_per_host: int = 20,
+        timeout: float = 10,
+        cache: Optional[CustomerCache] = None
+    ):
         self.api_key = api_key
         self.base_url = base_url
-    
+        self.limit_per_host = limit_per_host
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+
+        # One pooled session per event loop instead of one per call
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # None until the first batch request tells us whether /customers?ids= exists
+        self._batch_supported: Optional[bool] = None
+        self._customers = BatchLoader(self._fetch_customers, max_batch_size=batch_size)
+        # Read-through cache; pass CustomerCache(redis_url=...) to share it across workers
+        self.cache = cache or CustomerCache()
+        # Orders are batched and carry idempotency keys
+        self.orders = OrderBatcher(self._get_session, base_url)
+
+    def register(self, registry: Optional[ToolRegistry] = None) -> ToolRegistry:
+        """
+        Add this instance's tools to a tool registry (the shared one by default).
+
+        The tools are bound to this instance (its base URL and API key), so
+        the shared registry holds them for one instance only; registering a
+        second instance there raises ValueError. Give each further instance
+        its own ToolRegistry(). Schemas are cached per function, so many
+        instances still compile get_customer/create_order only once.
+        """
+        registry = registry if registry is not None else get_tool_registry()
+        registry.register_all([self.get_customer, self.create_order])
+        return registry
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            # A session is bound to its loop: release the old one before replacing it
+            discard_session(self._session, self._loop, "await CRMTools.close()")
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit_per_host=self.limit_per_host, ttl_dns_cache=300),
+                timeout=self.timeout,
+                headers={"Authorization": f"Bearer {self.api_key}"}
+            )
+            self._loop = loop
+        return self._session
+
+    async def close(self) -> None:
+        await self.orders.drain()
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        await self.cache.close()
+
+    def cache_stats(self) -> dict:
+        return self.cache.stats.to_dict()
+
+    async def invalidate_customers(self, *customer_ids: str) -> None:
+        """Drop cached records; call from any tool that changes a customer."""
+        await self.cache.invalidate(customer_ids)
+
+    # ------------------------------------------------------------
+    # Customer lookups (batched)
+    # ------------------------------------------------------------
+
+    async def fetch_customer(self, customer_id: str) -> Optional[dict]:
+        """Customer record, or None if it doesn't exist. Concurrent calls are batched."""
+        cached = self.cache.peek(customer_id)
+        if cached is not MISSING:
+            return cached
+        return await self._customers.load(customer_id)
+
+    async def _fetch_customers(self, customer_ids: List[str]) -> Dict[str, object]:
+        # Read-through: shared cache tier first, the CRM only for what's left
+        found: Dict[str, object] = await self.cache.get_many(customer_ids)
+        remaining = [i for i in customer_ids if i not in found]
+        if not remaining:
+            return found
+
+        with self.cache.lookup() as token:
+            fetched = None
+            if self._batch_supported is not False:
+                fetched = await self._fetch_customer_batch(remaining)
+            if fetched is None:
+                # No batch endpoint: parallel single gets over the pooled session
+                results = await asyncio.gather(*(self._fetch_one(i) for i in remaining), return_exceptions=True)
+                fetched = dict(zip(remaining, results))
+
+            # Errors aren't cached; records and "not found" are
+            await self.cache.set_many({i: v for i, v in fetched.items() if not isinstance(v, Exception)}, token)
+        return {**found, **fetched}
+
+    async def _fetch_customer_batch(self, customer_ids: List[str]) -> Optional[Dict[str, object]]:
+        session = await self._get_session()
+        async with session.get(f"{self.base_url}/customers", params={"ids": ",".join(customer_ids)}) as response:
+            if response.status in (404, 405, 501):
+                if self._batch_supported is None:
+                    logger.info("CRM has no batch customer endpoint; using parallel single lookups")
+                self._batch_supported = False
+                return None
+            if response.status != 200:
+                raise CRMError(response.status)
+            data = await response.json()
+
+        self._batch_supported = True
+        records = data.get("customers", []) if isinstance(data, dict) else data
+        found = {str(record.get("id")): record for record in records}
+        # Only IDs the CRM explicitly reports as unknown count as "not found"
+        not_found = {str(i) for i in data.get("not_found", [])} if isinstance(data, dict) else set()
+        results: Dict[str, object] = {}
+        unreported = []
+        for customer_id in customer_ids:
+            if customer_id in found:
+                results[customer_id] = found[customer_id]
+            elif customer_id in not_found:
+                results[customer_id] = None
+            else:
+                unreported.append(customer_id)
+        if unreported:
+            # Left out of the batch (pagination, partial failure): look them up one by one
+            singles = await asyncio.gather(*(self._fetch_one(i) for i in unreported), return_exceptions=True)
+            results.update(zip(unreported, singles))
+        return results
+
+    async def _fetch_one(self, customer_id: str) -> Optional[dict]:
+        session = await self._get_session()
+        async with session.get(f"{self.base_url}/customers/{customer_id}") as response:
+            if response.status == 200:
+                return await response.json()
+            if response.status == 404:
+                return None
+            raise CRMError(response.status)
+
+    # ------------------------------------------------------------
+    # Tools
+    # ------------------------------------------------------------
+
     @ai_function
     async def get_customer(
         self,
         customer_id: Annotated[str, Field(description="Customer ID")]
     ) -> str:
         """Retrieve customer information from CRM."""
-        async with aiohttp.ClientSession() as session:
-            headers = {"Authorization": f"Bearer {self.api_key}"}
-            try:
-                async with session.get(
-                    f"{self.base_url}/customers/{customer_id}",
-                    headers=headers,
-                    timeout=10
-                ) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        return f"""Customer Found:
+        try:
+            data = await self.fetch_customer(customer_id)
+        except CRMError as e:
+            return f"API error: status {e.status}"
+        except aiohttp.ClientError as e:
+            return f"Connection error: {str(e)}"
+
+        if data is None:
+            return f"Customer {customer_id} not found."
+        return f"""Customer Found:
                         - ID: {data.get('id')}
                         - Name: {data.get('name')}
                         - Email: {data.get('email')}
                         - Status: {data.get('status')}"""
-                    elif response.status == 404:
-                        return f"Customer {customer_id} not found."
-                    else:
-                        return f"API error: status {response.status}"
-            except aiohttp.ClientError as e:
-                return f"Connection error: {str(e)}"
-    
+
     @ai_function
     async def create_order(
         self,
@@ -51,39 +202,118 @@ class CRMTools:
         quantity: Annotated[int, Field(description="Quantity")] = 1
     ) -> str:
         """Create a new order in the system."""
-        async with aiohttp.ClientSession() as session:
-            payload = {
-                "customer_id": customer_id,
-                "products": product_ids.split(","),
-                "quantity": quantity
-            }
-            try:
-                async with session.post(
-                    f"{self.base_url}/orders",
-                    json=payload,
-                    headers={"Authorization": f"Bearer {self.api_key}"},
-                    timeout=10
-                ) as response:
-                    if response.status == 201:
-                        data = await response.json()
-                        return f"Order created! Order ID: {data.get('order_id')}"
-                    else:
-                        error = await response.text()
-                        return f"Failed to create order: {error}"
-            except aiohttp.ClientError as e:
-                return f"Connection error: {str(e)}"
+        products = product_ids.split(",")
+        # Stable across agent retries inside an idempotency scope
+        key = idempotency_key("create_order", customer_id, products, quantity)
+        result = (await self.create_orders([OrderRequest(customer_id, products, quantity, key)]))[0]
+        if result.ok:
+            return f"Order created! Order ID: {result.order_id}"
+        return f"Failed to create order: {result.error}"
+
+    async def create_orders(self, orders: List[OrderRequest]) -> List[OrderResult]:
+        """Bulk order creation: queued, batched, retried safely with idempotency keys."""
+        for order in orders:
+            if not order.idempotency_key:
+                order.idempotency_key = idempotency_key("create_order", order.customer_id, order.products, order.quantity)
+        results = await self.orders.submit_many(orders)
+        await self.invalidate_customers(*{o.customer_id for o, r in zip(orders, results) if r.ok})
+        return results
+
+
+async def _lookup_demo():
+    """Compare per-call sessions with the pooled, batched client on the stub CRM."""
+    import time
+    from crm_stub_server import StubCRM, start_stub_server
+
+    base_url = "http://127.0.0.1:8090"
+    ids = [f"C{i:05d}" for i in range(20)] + ["C99999"]  # one unknown customer
+
+    for batch_enabled in (True, False):
+        crm = StubCRM.with_customers(latency=0.01, batch_enabled=batch_enabled)
+        runner = await start_stub_server(crm, port=8090)
+
+        async def one_session_per_call(customer_id):
+            async with aiohttp.ClientSession() as session:
+                async with session.get(f"{base_url}/customers/{customer_id}") as response:
+                    return await response.json() if response.status == 200 else None
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one_session_per_call(i) for i in ids))
+        naive_ms = (time.perf_counter() - start) * 1000
+        naive_requests = sum(crm.requests.values())
+
+        crm.requests.clear()
+        tools = CRMTools(api_key="demo-key", base_url=base_url)
+        start = time.perf_counter()
+        results = await asyncio.gather(*(tools.fetch_customer(i) for i in ids))
+        batched_ms = (time.perf_counter() - start) * 1000
+
+        mode = "batch endpoint" if batch_enabled else "no batch endpoint"
+        print(f"{len(ids)} concurrent lookups ({mode}):")
+        print(f"  session per call: {naive_requests:>3} requests, {naive_ms:6.1f} ms")
+        print(f"  CRMTools:         {sum(crm.requests.values()):>3} requests, {batched_ms:6.1f} ms "
+              f"({sum(r is None for r in results)} not found)")
+
+        # Repeat lookups within a conversation are served from the cache
+        crm.requests.clear()
+        for _ in range(3):
+            await asyncio.gather(*(tools.fetch_customer(i) for i in ids))
+        print(f"  3 repeat rounds:  {sum(crm.requests.values()):>3} requests, cache {tools.cache_stats()}")
+        await tools.close()
+        await runner.cleanup()
+
+
+async def _order_demo(count: int = 2000):
+    """Sequential single POSTs vs the batched order pipeline, then lost responses."""
+    import time
+    from crm_stub_server import StubCRM, start_stub_server
+
+    base_url = "http://127.0.0.1:8090"
+    crm = StubCRM.with_customers(latency=0.005)
+    runner = await start_stub_server(crm, port=8090)
+    orders = lambda: [OrderRequest(f"C{i % 1000:05d}", ["P1", "P2"], 1) for i in range(count)]
+
+    tools = CRMTools(api_key="demo-key", base_url=base_url)
+    session = await tools._get_session()
+    start = time.perf_counter()
+    for order in orders()[:200]:
+        async with session.post(f"{base_url}/orders", json=order.to_json()) as response:
+            await response.read()
+    sequential = 200 / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    results = await tools.create_orders(orders())
+    batched = count / (time.perf_counter() - start)
+    print(f"Orders: sequential {sequential:,.0f}/s, batched {batched:,.0f}/s "
+          f"({tools.orders.stats.requests} requests for {count} orders, {sum(r.ok for r in results)} ok)")
+
+    # Responses lost after the CRM committed: retries reuse the keys, so no duplicates
+    await tools.close()
+    crm.fail_rate = 0.3
+    crm.requests.clear()
+    tools = CRMTools(api_key="demo-key", base_url=base_url)
+    results = await tools.create_orders(orders()[:500])
+    print(f"With 30% lost responses: {sum(r.ok for r in results)}/500 ok, "
+          f"{crm.requests['orders_created']} orders created, {tools.orders.stats}")
+    await tools.close()
+    await runner.cleanup()
 
 
 # Usage example
 if __name__ == "__main__":
     crm_tools = CRMTools(
         api_key=os.getenv("CRM_API_KEY", "demo-key"),
-        base_url="https://api.example.com"
+        base_url="https://api.example.com",
+        cache=CustomerCache(ttl=300, negative_ttl=30, redis_url=os.getenv("REDIS_URL"))
     )
-    
+    registry = crm_tools.register()
+
     # Register with agent
     # agent = client.create_agent(
     #     name="OrderAgent",
     #     instructions="Help customers with orders.",
-    #     tools=[crm_tools.get_customer, crm_tools.create_order]
+    #     tools=registry.tools(["get_customer", "create_order"])
     # )
+
+    asyncio.run(_lookup_demo())
+    asyncio.run(_order_demo())
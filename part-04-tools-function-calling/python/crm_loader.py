@@ -0,0 +1,77 @@
+"""
+Part 4: DataLoader-style Batching
+
+BatchLoader collects every load(key) made in the same event-loop tick and
+resolves them with one call to a batch function, so N concurrent lookups
+become one round trip instead of N. Duplicate keys in a tick share a single
+future.
+"""
+import asyncio
+from typing import Awaitable, Callable, Dict, Generic, Hashable, Iterable, List, Optional, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+# Receives the distinct keys of one tick; returns a value (or an Exception
+# instance) per key. Keys missing from the result resolve to None.
+BatchFunction = Callable[[List[K]], Awaitable[Dict[K, V]]]
+
+
+class BatchLoader(Generic[K, V]):
+    """Coalesces same-tick loads into batched calls of at most max_batch_size keys."""
+
+    def __init__(self, batch_fn: BatchFunction, max_batch_size: int = 100):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.batches = 0
+        self.loads = 0
+
+        self._pending: Dict[K, asyncio.Future] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tasks: set = set()
+
+    async def load(self, key: K) -> Optional[V]:
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop, self._pending = loop, {}
+
+        self.loads += 1
+        future = self._pending.get(key)
+        if future is None:
+            if not self._pending:
+                # First key of this tick: dispatch once the current callbacks have run
+                loop.call_soon(self._dispatch)
+            future = self._pending[key] = loop.create_future()
+        # Shielded: one cancelled caller must not cancel the key for the others
+        return await asyncio.shield(future)
+
+    async def load_many(self, keys: Iterable[K]) -> List[Optional[V]]:
+        return list(await asyncio.gather(*(self.load(key) for key in keys)))
+
+    def _dispatch(self) -> None:
+        pending, self._pending = self._pending, {}
+        keys = list(pending)
+        for i in range(0, len(keys), self.max_batch_size):
+            chunk = {key: pending[key] for key in keys[i:i + self.max_batch_size]}
+            task = self._loop.create_task(self._run_batch(chunk))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, futures: Dict[K, asyncio.Future]) -> None:
+        self.batches += 1
+        try:
+            results = await self.batch_fn(list(futures))
+        except Exception as e:
+            for future in futures.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for key, future in futures.items():
+            if future.done():
+                continue  # caller was cancelled
+            value = results.get(key)
+            if isinstance(value, Exception):
+                future.set_exception(value)
+            else:
+                future.set_result(value)
@@ -0,0 +1,215 @@
+"""
+Part 4: Bulk Order Pipeline for CRMTools
+
+create_order calls are queued and sent to the CRM in batches:
+- A batch goes out when it reaches max_batch orders or max_wait seconds
+  after its first order, whichever comes first
+- At most max_concurrent_batches requests are in flight
+- Every order carries a client-generated idempotency key. Transport retries
+  and agent retries (see common.idempotency) resend the same key, so the
+  CRM can return the original order instead of creating a duplicate.
+- Each caller awaits its own OrderResult
+
+Backends without POST /orders/batch get parallel single POST /orders calls
+with an Idempotency-Key header.
+"""
+import asyncio
+import random
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+import logging
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+@dataclass
+class OrderRequest:
+    customer_id: str
+    products: List[str]
+    quantity: int = 1
+    idempotency_key: str = ""
+
+    def to_json(self) -> dict:
+        return {
+            "idempotency_key": self.idempotency_key,
+            "customer_id": self.customer_id,
+            "products": self.products,
+            "quantity": self.quantity
+        }
+
+
+@dataclass
+class OrderResult:
+    idempotency_key: str
+    order_id: Optional[str] = None
+    error: Optional[str] = None
+    duplicate: bool = False  # the CRM had already processed this key
+
+    @property
+    def ok(self) -> bool:
+        return self.order_id is not None
+
+
+class _RetryableError(Exception):
+    pass
+
+
+@dataclass
+class OrderBatcherStats:
+    orders: int = 0
+    batches: int = 0
+    requests: int = 0
+    retries: int = 0
+    duplicates: int = 0
+    failed: int = 0
+
+
+class OrderBatcher:
+    """Size/time-bounded batching of order creation with idempotency keys."""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Awaitable[aiohttp.ClientSession]],
+        base_url: str,
+        max_batch: int = 50,
+        max_wait: float = 0.02,
+        max_concurrent_batches: int = 4,
+        max_attempts: int = 3,
+        base_delay: float = 0.2
+    ):
+        self.session_factory = session_factory
+        self.base_url = base_url
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_concurrent_batches = max_concurrent_batches
+        self.stats = OrderBatcherStats()
+
+        # None until the first batch request tells us whether /orders/batch exists
+        self.batch_supported: Optional[bool] = None
+        self._buffer: List[Tuple[OrderRequest, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._tasks: set = set()
+
+    async def submit(self, order: OrderRequest) -> OrderResult:
+        """Queue an order and wait for its result."""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop, self._buffer, self._timer = loop, [], None
+            self._slots = asyncio.Semaphore(self.max_concurrent_batches)
+
+        future = loop.create_future()
+        self._buffer.append((order, future))
+        self.stats.orders += 1
+        if len(self._buffer) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        # Shielded so a cancelled caller doesn't lose the result for a retry
+        return await asyncio.shield(future)
+
+    async def submit_many(self, orders: List[OrderRequest]) -> List[OrderResult]:
+        return list(await asyncio.gather(*(self.submit(order) for order in orders)))
+
+    async def drain(self) -> None:
+        """Send anything buffered and wait for in-flight batches."""
+        self._flush()
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._buffer:
+            batch, self._buffer = self._buffer[:self.max_batch], self._buffer[self.max_batch:]
+            task = self._loop.create_task(self._send(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, batch: List[Tuple[OrderRequest, asyncio.Future]]) -> None:
+        orders = [order for order, _ in batch]
+        async with self._slots:
+            self.stats.batches += 1
+            try:
+                results = await self._with_retries(orders)
+            except Exception as e:
+                logger.error(f"Order batch of {len(orders)} failed: {e}")
+                results = {o.idempotency_key: OrderResult(o.idempotency_key, error=str(e)) for o in orders}
+
+        for order, future in batch:
+            result = results.get(order.idempotency_key) or OrderResult(order.idempotency_key, error="No result from CRM")
+            self.stats.duplicates += result.duplicate
+            self.stats.failed += not result.ok
+            if not future.done():
+                future.set_result(result)
+
+    async def _with_retries(self, orders: List[OrderRequest]) -> Dict[str, OrderResult]:
+        for attempt in range(self.max_attempts):
+            try:
+                if self.batch_supported is not False:
+                    results = await self._post_batch(orders)
+                    if results is not None:
+                        return results
+                return await self._post_singles(orders)
+            except (_RetryableError, aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt == self.max_attempts - 1:
+                    raise
+                # Same idempotency keys on every attempt, so a request that
+                # did reach the CRM isn't applied twice
+                delay = self.base_delay * (2 ** attempt) * (1 + random.random() / 2)
+                self.stats.retries += 1
+                logger.warning(f"Order request failed ({e!r}); retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    async def _post_batch(self, orders: List[OrderRequest]) -> Optional[Dict[str, OrderResult]]:
+        session = await self.session_factory()
+        self.stats.requests += 1
+        payload = {"orders": [order.to_json() for order in orders]}
+        async with session.post(f"{self.base_url}/orders/batch", json=payload) as response:
+            if response.status in (404, 405, 501):
+                if self.batch_supported is None:
+                    logger.info("CRM has no batch order endpoint; sending single orders")
+                self.batch_supported = False
+                return None
+            if response.status in RETRYABLE_STATUS:
+                raise _RetryableError(f"status {response.status}")
+            if response.status not in (200, 201, 207):
+                error = await response.text()
+                return {o.idempotency_key: OrderResult(o.idempotency_key, error=error) for o in orders}
+            data = await response.json()
+
+        self.batch_supported = True
+        return {item["idempotency_key"]: self._parse(item["idempotency_key"], item) for item in data.get("results", [])}
+
+    async def _post_singles(self, orders: List[OrderRequest]) -> Dict[str, OrderResult]:
+        session = await self.session_factory()
+
+        async def post(order: OrderRequest) -> OrderResult:
+            self.stats.requests += 1
+            payload = {k: v for k, v in order.to_json().items() if k != "idempotency_key"}
+            headers = {"Idempotency-Key": order.idempotency_key}
+            async with session.post(f"{self.base_url}/orders", json=payload, headers=headers) as response:
+                if response.status in RETRYABLE_STATUS:
+                    raise _RetryableError(f"status {response.status}")
+                if response.status in (200, 201):
+                    data = await response.json()
+                    data.setdefault("duplicate", response.status == 200)
+                    return self._parse(order.idempotency_key, data)
+                return OrderResult(order.idempotency_key, error=await response.text())
+
+        results = await asyncio.gather(*(post(order) for order in orders))
+        return {result.idempotency_key: result for result in results}
+
+    @staticmethod
+    def _parse(key: str, item: dict) -> OrderResult:
+        if item.get("order_id"):
+            return OrderResult(key, order_id=item["order_id"], duplicate=bool(item.get("duplicate")))
+        return OrderResult(key, error=item.get("error", "Order rejected"))
@@ -0,0 +1,148 @@
+"""
+Part 4: Local Stub CRM Server
+
+A small aiohttp app that mimics the CRM API used by CRMTools, for demos and
+benchmarks without a real backend. It counts requests so round-trip savings
+can be measured.
+
+Endpoints:
+    GET  /customers/{id}          one customer (404 if unknown)
+    GET  /customers?ids=a,b,c     batch lookup, unknown IDs listed under "not_found"
+                                  (can be disabled)
+    POST /orders                  one order; Idempotency-Key header replays
+                                  the original order with 200 instead of 201
+    POST /orders/batch            {"orders": [...]} with an idempotency_key per
+                                  order (can be disabled)
+
+fail_rate makes order endpoints answer 503 *after* committing, like a
+timeout on the way back, to exercise idempotent retries.
+
+Run standalone:
+    python crm_stub_server.py --port 8090 --latency 0.02
+"""
+import argparse
+import asyncio
+import itertools
+import random
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, Optional, Tuple
+
+from aiohttp import web
+
+
+@dataclass
+class StubCRM:
+    latency: float = 0.01  # simulated backend time per request
+    batch_enabled: bool = True
+    fail_rate: float = 0.0
+    customers: Dict[str, dict] = field(default_factory=dict)
+    orders: Dict[str, dict] = field(default_factory=dict)  # idempotency key -> order
+    requests: Counter = field(default_factory=Counter)
+    _order_ids: Iterator[int] = field(default_factory=lambda: itertools.count(1))
+
+    @classmethod
+    def with_customers(cls, count: int = 1000, **kwargs) -> "StubCRM":
+        crm = cls(**kwargs)
+        for i in range(count):
+            customer_id = f"C{i:05d}"
+            crm.customers[customer_id] = {
+                "id": customer_id,
+                "name": f"Customer {i}",
+                "email": f"customer{i}@example.com",
+                "status": "active" if i % 7 else "inactive"
+            }
+        return crm
+
+    async def get_customer(self, request: web.Request) -> web.Response:
+        self.requests["get_customer"] += 1
+        await asyncio.sleep(self.latency)
+        customer = self.customers.get(request.match_info["customer_id"])
+        if customer is None:
+            return web.json_response({"error": "not found"}, status=404)
+        return web.json_response(customer)
+
+    async def get_customers(self, request: web.Request) -> web.Response:
+        if not self.batch_enabled:
+            return web.json_response({"error": "not found"}, status=404)
+        self.requests["get_customers_batch"] += 1
+        await asyncio.sleep(self.latency)
+        ids = [i for i in request.query.get("ids", "").split(",") if i]
+        return web.json_response({
+            "customers": [self.customers[i] for i in ids if i in self.customers],
+            "not_found": [i for i in ids if i not in self.customers]
+        })
+
+    def _create_order(self, key: Optional[str], order: dict) -> Tuple[dict, bool]:
+        """Returns (order, duplicate)."""
+        if key and key in self.orders:
+            return self.orders[key], True
+        if order.get("customer_id") not in self.customers:
+            return {"error": f"Unknown customer {order.get('customer_id')}"}, False
+        created = {"order_id": f"ORD-{next(self._order_ids):06d}", **order}
+        if key:
+            self.orders[key] = created
+        self.requests["orders_created"] += 1
+        return created, False
+
+    def _lost_response(self) -> bool:
+        return self.fail_rate > 0 and random.random() < self.fail_rate
+
+    async def create_order(self, request: web.Request) -> web.Response:
+        self.requests["create_order"] += 1
+        await asyncio.sleep(self.latency)
+        order, duplicate = self._create_order(request.headers.get("Idempotency-Key"), await request.json())
+        if "error" in order:
+            return web.json_response(order, status=400)
+        if self._lost_response():
+            return web.json_response({"error": "upstream timeout"}, status=503)
+        return web.json_response(order, status=200 if duplicate else 201)
+
+    async def create_orders_batch(self, request: web.Request) -> web.Response:
+        if not self.batch_enabled:
+            return web.json_response({"error": "not found"}, status=404)
+        self.requests["create_orders_batch"] += 1
+        await asyncio.sleep(self.latency)
+        results = []
+        for item in (await request.json()).get("orders", []):
+            key = item.pop("idempotency_key", None)
+            order, duplicate = self._create_order(key, item)
+            results.append({"idempotency_key": key, "duplicate": duplicate, **order})
+        if self._lost_response():
+            return web.json_response({"error": "upstream timeout"}, status=503)
+        return web.json_response({"results": results}, status=207)
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/customers", self.get_customers)
+        app.router.add_get("/customers/{customer_id}", self.get_customer)
+        app.router.add_post("/orders", self.create_order)
+        app.router.add_post("/orders/batch", self.create_orders_batch)
+        return app
+
+
+async def start_stub_server(crm: StubCRM, host: str = "127.0.0.1", port: int = 8090) -> web.AppRunner:
+    """Start the stub in the current event loop; call runner.cleanup() to stop."""
+    runner = web.AppRunner(crm.app())
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description="Local stub CRM API")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", type=float, default=0.01)
+    parser.add_argument("--customers", type=int, default=1000)
+    parser.add_argument("--no-batch", action="store_true", help="Disable the batch endpoints")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Share of order responses lost after commit")
+    args = parser.parse_args(argv)
+
+    crm = StubCRM.with_customers(
+        args.customers, latency=args.latency, batch_enabled=not args.no_batch, fail_rate=args.fail_rate
+    )
+    web.run_app(crm.app(), host="127.0.0.1", port=args.port)
+
+
+if __name__ == "__main__":
+    main()
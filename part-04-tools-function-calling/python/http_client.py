@@ -0,0 +1,248 @@
+"""
+Part 4: Shared HTTP Client for Tools
+
+One lifecycle-managed aiohttp session for all HTTP-calling tools instead of a
+new ClientSession (new TCP + TLS handshake, cold DNS) per call:
+- Connection pool with per-host limits and keep-alive
+- DNS cache
+- Conditional requests (ETag / Last-Modified) with a bounded response cache
+- Streaming body reads with a size cap
+"""
+import asyncio
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional
+import logging
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+
+def discard_session(session: Optional[aiohttp.ClientSession], loop: Optional[asyncio.AbstractEventLoop],
+                    close_hint: str = "close it") -> None:
+    """
+    Release a session that belongs to another event loop (the caller is
+    about to build a new one for the current loop) instead of dropping it.
+    """
+    if session is None or session.closed:
+        return
+    if loop is not None and loop.is_running():
+        # Still running in another thread: close it there
+        asyncio.run_coroutine_threadsafe(session.close(), loop)
+        return
+    # Its loop is no longer running, so the close can't be awaited there;
+    # detach it rather than replace it silently
+    logger.warning(
+        "Event loop changed; detaching the HTTP session from the previous loop "
+        f"({close_hint} before that loop ends to close it cleanly)"
+    )
+    session.detach()
+
+
+@dataclass
+class HttpResponse:
+    status: int
+    text: str
+    headers: Dict[str, str]
+    from_cache: bool = False
+    truncated: bool = False
+
+
+@dataclass
+class _CachedBody:
+    status: int
+    text: str
+    headers: Dict[str, str]
+    etag: Optional[str]
+    last_modified: Optional[str]
+
+
+@dataclass
+class HttpClientStats:
+    requests: int = 0
+    revalidated: int = 0  # 304 Not Modified served from cache
+    truncated: int = 0
+    errors: int = 0
+
+
+class ToolHttpClient:
+    """Pooled, caching HTTP client shared by tools."""
+
+    def __init__(
+        self,
+        limit: int = 100,
+        limit_per_host: int = 10,
+        keepalive_timeout: float = 30,
+        dns_ttl: int = 300,
+        timeout: float = 10,
+        max_body_bytes: int = 1024 * 1024,
+        cache_entries: int = 512
+    ):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_ttl = dns_ttl
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.max_body_bytes = max_body_bytes
+        self.cache_entries = cache_entries
+        self.stats = HttpClientStats()
+
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._cache: "OrderedDict[str, _CachedBody]" = OrderedDict()
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        # A session is bound to its event loop; rebuild if the loop changed
+        if self._session is None or self._session.closed or self._loop is not loop:
+            self._discard_session()
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=self.dns_ttl,
+                use_dns_cache=True
+            )
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+            self._loop = loop
+        return self._session
+
+    def _discard_session(self) -> None:
+        """Close (or detach) the session built on a previous event loop."""
+        session, old_loop = self._session, self._loop
+        self._session = self._loop = None
+        discard_session(session, old_loop, "await close_http_client()")
+
+    async def get(
+        self,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        max_bytes: Optional[int] = None,
+        use_cache: bool = True
+    ) -> HttpResponse:
+        """GET a URL, revalidating cached bodies and capping the body size."""
+        session = await self._get_session()
+        request_headers = dict(headers or {})
+        cached = self._cache.get(url) if use_cache else None
+        if cached:
+            if cached.etag:
+                request_headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                request_headers["If-Modified-Since"] = cached.last_modified
+
+        self.stats.requests += 1
+        try:
+            async with session.get(url, headers=request_headers) as response:
+                if response.status == 304 and cached:
+                    self.stats.revalidated += 1
+                    self._cache.move_to_end(url)
+                    return HttpResponse(cached.status, cached.text, cached.headers, from_cache=True)
+
+                text, truncated = await self._read_capped(response, max_bytes or self.max_body_bytes)
+                if use_cache and response.status == 200 and not truncated:
+                    self._store(url, response, text)
+                return HttpResponse(response.status, text, dict(response.headers), truncated=truncated)
+        except aiohttp.ClientError:
+            self.stats.errors += 1
+            raise
+
+    async def _read_capped(self, response: aiohttp.ClientResponse, max_bytes: int):
+        chunks, size, truncated = [], 0, False
+        async for chunk in response.content.iter_chunked(64 * 1024):
+            remaining = max_bytes - size
+            if len(chunk) > remaining:
+                chunks.append(chunk[:remaining])
+                truncated = True
+                break
+            chunks.append(chunk)
+            size += len(chunk)
+        if truncated:
+            self.stats.truncated += 1
+            logger.warning(f"Response from {response.url} truncated at {max_bytes} bytes")
+        body = b"".join(chunks)
+        try:
+            return body.decode(response.charset or "utf-8", errors="replace"), truncated
+        except LookupError:  # unknown charset in Content-Type
+            logger.warning(f"Unknown charset {response.charset!r} from {response.url}, decoding as utf-8")
+            return body.decode("utf-8", errors="replace"), truncated
+
+    def _store(self, url: str, response: aiohttp.ClientResponse, text: str) -> None:
+        headers = response.headers  # case-insensitive
+        etag = headers.get("ETag")
+        last_modified = headers.get("Last-Modified")
+        if not (etag or last_modified) or "no-store" in headers.get("Cache-Control", ""):
+            return
+        self._cache[url] = _CachedBody(response.status, text, dict(headers), etag, last_modified)
+        self._cache.move_to_end(url)
+        while len(self._cache) > self.cache_entries:
+            self._cache.popitem(last=False)
+
+    async def close(self) -> None:
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+_client: Optional[ToolHttpClient] = None
+
+
+def get_http_client() -> ToolHttpClient:
+    """Process-wide HTTP client for tools."""
+    global _client
+    if _client is None:
+        _client = ToolHttpClient()
+    return _client
+
+
+async def close_http_client() -> None:
+    """Close the shared client (call on application shutdown)."""
+    if _client is not None:
+        await _client.close()
+
+
+if __name__ == "__main__":
+    import statistics
+    import time
+    from aiohttp import web
+
+    # Local stub API with ETag support
+    async def handle(request):
+        body = '{"items": ' + str(list(range(200))) + "}"
+        etag = '"v1"'
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+        return web.Response(text=body, content_type="application/json", headers={"ETag": etag})
+
+    async def demo():
+        app = web.Application()
+        app.router.add_get("/data", handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 8089)
+        await site.start()
+        url = "http://127.0.0.1:8089/data"
+
+        naive = []
+        for _ in range(200):
+            start = time.perf_counter()
+            async with aiohttp.ClientSession() as session:
+                async with session.get(url) as response:
+                    await response.text()
+            naive.append(time.perf_counter() - start)
+
+        client = ToolHttpClient()
+        pooled = []
+        for _ in range(200):
+            start = time.perf_counter()
+            await client.get(url)
+            pooled.append(time.perf_counter() - start)
+
+        print(f"Session per call p50: {statistics.median(naive) * 1000:.2f} ms")
+        print(f"Shared client p50:    {statistics.median(pooled) * 1000:.2f} ms")
+        print(f"Stats: {client.stats}")
+
+        await client.close()
+        await runner.cleanup()
+
+    asyncio.run(demo())
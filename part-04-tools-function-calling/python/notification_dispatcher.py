@@ -0,0 +1,412 @@
+"""
+Part 4: Notification Dispatcher for send_notification
+
+The tool only enqueues; delivery happens here in the background:
+- In-process queue with priority lanes (high / normal / low, weighted so low
+  priority still drains under load)
+- Hierarchical timer wheel for ISO-scheduled delivery: O(1) insert, one
+  timer task for every pending notification instead of one sleep per item
+- Micro-batching: ready notifications are grouped per (channel, recipient
+  domain) and sent as one transport call per batch
+- Pluggable transport; StubTransport records batches locally
+
+The dispatcher runs on one event loop: start() it there (or submit() from
+that loop first); other threads can then submit() safely. stop() returns
+whatever it could not deliver, including scheduled and retrying
+notifications, so callers can persist and resubmit them.
+"""
+import asyncio
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+PRIORITIES = ("high", "normal", "low")
+# Notifications taken from each lane per drain round
+LANE_WEIGHTS = {"high": 8, "normal": 3, "low": 1}
+
+
+@dataclass
+class Notification:
+    message: str
+    recipient: str
+    priority: str = "normal"
+    deliver_at: Optional[float] = None  # epoch seconds; None = now
+    notification_id: str = field(default_factory=lambda: f"ntf_{uuid.uuid4().hex[:12]}")
+    created_at: float = field(default_factory=time.time)
+    attempts: int = 0
+
+    @property
+    def channel(self) -> str:
+        return "email" if "@" in self.recipient else "chat"
+
+    @property
+    def domain(self) -> str:
+        return self.recipient.rsplit("@", 1)[1].lower() if "@" in self.recipient else "internal"
+
+
+class Transport(ABC):
+    """Delivers one batch of notifications that share a channel and domain."""
+
+    @abstractmethod
+    async def send_batch(self, channel: str, domain: str, notifications: List[Notification]) -> None:
+        pass
+
+
+class StubTransport(Transport):
+    """Local transport for development and benchmarks: records every batch."""
+
+    def __init__(self, latency: float = 0.0, keep: int = 1000):
+        self.latency = latency
+        self.batches: Deque[Tuple[str, str, List[str]]] = deque(maxlen=keep)
+        self.sent = 0
+
+    async def send_batch(self, channel: str, domain: str, notifications: List[Notification]) -> None:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.sent += len(notifications)
+        self.batches.append((channel, domain, [n.notification_id for n in notifications]))
+        logger.debug(f"Sent {len(notifications)} {channel} notifications to {domain}")
+
+
+class HierarchicalTimerWheel:
+    """
+    Multi-level timer wheel (tick x slots per level, each level `slots` times
+    coarser). Items land in the finest level that covers their delay and
+    cascade down as the wheel turns; anything beyond the top level waits in
+    an overflow list until it comes into range.
+    """
+
+    def __init__(self, tick: float = 0.1, slots: int = 256, levels: int = 3, start: Optional[float] = None):
+        self.tick = tick
+        self.slots = slots
+        self.levels = levels
+        self._wheels: List[List[list]] = [[[] for _ in range(slots)] for _ in range(levels)]
+        self._overflow: List[Tuple[int, object]] = []
+        self._current = int((start if start is not None else time.time()) / tick)
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def schedule(self, item: object, at: float) -> None:
+        self._count += 1
+        self._place(max(int(at / self.tick), self._current + 1), item)
+
+    def _place(self, due: int, item: object) -> None:
+        delta = due - self._current
+        span = self.slots
+        for level in range(self.levels):
+            if delta < span:
+                slot = (due // (span // self.slots)) % self.slots
+                self._wheels[level][slot].append((due, item))
+                return
+            span *= self.slots
+        self._overflow.append((due, item))
+
+    def advance(self, now: Optional[float] = None) -> List[object]:
+        """Move the wheel up to `now` and return every item that came due."""
+        target = int((now if now is not None else time.time()) / self.tick)
+        due: List[object] = []
+        if self._count == 0:
+            self._current = max(self._current, target)
+            return due
+
+        while self._current < target:
+            self._current += 1
+            self._cascade()
+            slot = self._wheels[0][self._current % self.slots]
+            if slot:
+                due.extend(item for _, item in slot)
+                slot.clear()
+        self._count -= len(due)
+        return due
+
+    def remove_all(self) -> List[object]:
+        """Take every pending item out of the wheel (due or not)."""
+        items = [item for wheel in self._wheels for slot in wheel for _, item in slot]
+        items.extend(item for _, item in self._overflow)
+        for wheel in self._wheels:
+            for slot in wheel:
+                slot.clear()
+        self._overflow = []
+        self._count = 0
+        return items
+
+    def _cascade(self) -> None:
+        # On each boundary of a coarser level, redistribute its current slot
+        span = 1
+        for level in range(1, self.levels):
+            span *= self.slots
+            if self._current % span:
+                break
+            slot = self._wheels[level][(self._current // span) % self.slots]
+            entries, slot[:] = list(slot), []
+            for due, item in entries:
+                self._place(due, item)
+        else:
+            if self._current % (span * self.slots) == 0 and self._overflow:
+                entries, self._overflow = self._overflow, []
+                for due, item in entries:
+                    self._place(due, item)
+
+
+@dataclass
+class DispatcherStats:
+    queued: int = 0
+    scheduled: int = 0
+    sent: int = 0
+    batches: int = 0
+    retries: int = 0
+    failed: int = 0
+
+
+class NotificationDispatcher:
+    """Background dispatcher: priority lanes -> per-domain micro-batches -> transport."""
+
+    def __init__(
+        self,
+        transport: Transport,
+        batch_size: int = 100,
+        batch_window: float = 0.02,
+        max_concurrent_sends: int = 8,
+        max_attempts: int = 3,
+        tick: float = 0.1
+    ):
+        self.transport = transport
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.max_concurrent_sends = max_concurrent_sends
+        self.max_attempts = max_attempts
+        self.stats = DispatcherStats()
+
+        self._lanes: Dict[str, Deque[Notification]] = {p: deque() for p in PRIORITIES}
+        self._wheel = HierarchicalTimerWheel(tick=tick)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._ready: Optional[asyncio.Event] = None
+        self._send_slots: Optional[asyncio.Semaphore] = None
+        self._tasks: List[asyncio.Task] = []
+        self._inflight: set = set()
+
+    # ------------------------------------------------------------
+    # Producer side
+    # ------------------------------------------------------------
+
+    def submit(self, notification: Notification) -> str:
+        """
+        Queue a notification and return its ID immediately. Safe from any
+        thread once the dispatcher is started; before that it must be called
+        on the event loop that will own it.
+        """
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if self._loop is None:
+            if running is None:
+                raise RuntimeError(
+                    "NotificationDispatcher is not started: call start() on its event loop "
+                    "before submitting from other threads"
+                )
+            self.start()
+        elif self._loop.is_closed():
+            raise RuntimeError(
+                "NotificationDispatcher's event loop has closed: stop() it and start() it on the current loop"
+            )
+        if running is self._loop:
+            self._enqueue(notification)
+        else:
+            self._loop.call_soon_threadsafe(self._enqueue, notification)
+        return notification.notification_id
+
+    def _enqueue(self, notification: Notification) -> None:
+        if notification.priority not in self._lanes:
+            notification.priority = "normal"
+        if notification.deliver_at and notification.deliver_at > time.time() + self._wheel.tick:
+            self._wheel.schedule(notification, notification.deliver_at)
+            self.stats.scheduled += 1
+            return
+        self._lanes[notification.priority].append(notification)
+        self.stats.queued += 1
+        self._ready.set()
+
+    @property
+    def pending(self) -> int:
+        return sum(len(lane) for lane in self._lanes.values()) + len(self._wheel)
+
+    # ------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------
+
+    def start(self) -> None:
+        """Start the background tasks on the running event loop."""
+        if self._tasks:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._ready = asyncio.Event()
+        self._send_slots = asyncio.Semaphore(self.max_concurrent_sends)
+        self._tasks = [
+            asyncio.create_task(self._dispatch_loop()),
+            asyncio.create_task(self._timer_loop())
+        ]
+
+    async def stop(self, drain: bool = True, timeout: float = 10.0,
+                   flush_scheduled: bool = False) -> List[Notification]:
+        """
+        Stop the dispatcher and return the notifications it did not deliver.
+
+        drain waits (up to timeout) for queued and in-flight sends. Scheduled
+        and retrying notifications are returned with their deliver_at intact
+        for the caller to persist and resubmit, unless flush_scheduled sends
+        them now as part of the drain.
+        """
+        if drain and self._tasks:
+            deadline = time.monotonic() + timeout
+            while time.monotonic() < deadline:
+                if flush_scheduled and len(self._wheel):
+                    self._release(self._wheel.remove_all())
+                if not (any(self._lanes.values()) or self._inflight or (flush_scheduled and len(self._wheel))):
+                    break
+                await asyncio.sleep(self.batch_window)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, *self._inflight, return_exceptions=True)
+        self._tasks = []
+        self._loop = None
+
+        undelivered = [n for priority in PRIORITIES for n in self._lanes[priority]] + self._wheel.remove_all()
+        for lane in self._lanes.values():
+            lane.clear()
+        if undelivered:
+            logger.warning(f"Dispatcher stopped with {len(undelivered)} undelivered notifications")
+        return undelivered
+
+    def _release(self, notifications: List[Notification]) -> None:
+        """Move notifications into their lanes for immediate dispatch."""
+        for notification in notifications:
+            self._lanes[notification.priority].append(notification)
+        if notifications:
+            self.stats.queued += len(notifications)
+            self._ready.set()
+
+    # ------------------------------------------------------------
+    # Background tasks
+    # ------------------------------------------------------------
+
+    async def _timer_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self._wheel.tick)
+            self._release(self._wheel.advance())
+
+    async def _dispatch_loop(self) -> None:
+        while True:
+            await self._ready.wait()
+            # Give concurrent submits a moment to join the batch
+            if self.batch_window:
+                await asyncio.sleep(self.batch_window)
+            self._ready.clear()
+
+            while any(self._lanes.values()):
+                for group_key, batch in self._take_batches():
+                    await self._send_slots.acquire()
+                    task = asyncio.create_task(self._send(group_key, batch))
+                    self._inflight.add(task)
+                    task.add_done_callback(self._inflight.discard)
+
+    def _take_batches(self):
+        """One weighted round across the lanes, grouped by (channel, domain)."""
+        groups: Dict[Tuple[str, str], List[Notification]] = defaultdict(list)
+        for priority in PRIORITIES:
+            lane = self._lanes[priority]
+            for _ in range(min(len(lane), LANE_WEIGHTS[priority] * self.batch_size)):
+                notification = lane.popleft()
+                groups[(notification.channel, notification.domain)].append(notification)
+        for group_key, items in groups.items():
+            for i in range(0, len(items), self.batch_size):
+                yield group_key, items[i:i + self.batch_size]
+
+    async def _send(self, group_key: Tuple[str, str], batch: List[Notification]) -> None:
+        channel, domain = group_key
+        try:
+            await self.transport.send_batch(channel, domain, batch)
+            self.stats.sent += len(batch)
+            self.stats.batches += 1
+        except Exception as e:
+            retry = [n for n in batch if n.attempts + 1 < self.max_attempts]
+            for n in batch:
+                n.attempts += 1
+            self.stats.failed += len(batch) - len(retry)
+            self.stats.retries += len(retry)
+            logger.warning(f"Sending {len(batch)} {channel} notifications to {domain} failed: {e}")
+            if retry:
+                # Back off through the timer wheel rather than sleeping in a task
+                backoff = 2 ** max(n.attempts for n in retry)
+                for n in retry:
+                    n.deliver_at = time.time() + backoff
+                    self._wheel.schedule(n, n.deliver_at)
+        finally:
+            self._send_slots.release()
+
+
+_dispatcher: Optional[NotificationDispatcher] = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_notification_dispatcher() -> NotificationDispatcher:
+    """Process-wide dispatcher (StubTransport until configured)."""
+    global _dispatcher
+    if _dispatcher is None:
+        with _dispatcher_lock:
+            if _dispatcher is None:
+                _dispatcher = NotificationDispatcher(StubTransport())
+    return _dispatcher
+
+
+def configure_notification_transport(transport: Transport, **options) -> NotificationDispatcher:
+    """Replace the transport (e.g. with an email/Teams sender) before first use."""
+    global _dispatcher
+    _dispatcher = NotificationDispatcher(transport, **options)
+    return _dispatcher
+
+
+if __name__ == "__main__":
+    import random
+
+    async def demo():
+        random.seed(3)
+        transport = StubTransport(latency=0.005)  # ~5 ms per outbound call
+        dispatcher = NotificationDispatcher(transport, batch_size=100)
+        domains = ["contoso.com", "fabrikam.com", "example.org", "northwind.io"]
+        total = 50_000
+
+        start = time.perf_counter()
+        for i in range(total):
+            recipient = f"user{i}@{random.choice(domains)}" if i % 5 else f"user{i}"
+            dispatcher.submit(Notification(f"Message {i}", recipient, random.choice(PRIORITIES)))
+        enqueue = time.perf_counter() - start
+
+        while dispatcher.stats.sent < total:
+            await asyncio.sleep(0.01)
+        elapsed = time.perf_counter() - start
+        print(f"Enqueued {total:,} in {enqueue * 1000:.0f} ms ({total / enqueue:,.0f}/s)")
+        print(f"Delivered in {elapsed:.2f}s ({total / elapsed:,.0f}/s) using {dispatcher.stats.batches} transport calls")
+        print(f"One call per notification would take ~{total * transport.latency / dispatcher.max_concurrent_sends:.0f}s "
+              f"at the same concurrency")
+
+        # Scheduled delivery: thousands of timers, one timer task
+        now = time.time()
+        for i in range(10_000):
+            dispatcher.submit(Notification(f"Reminder {i}", f"user{i}@contoso.com", deliver_at=now + 0.5 + (i % 10) * 0.1))
+        print(f"Scheduled 10,000 reminders; pending in wheel: {dispatcher.pending}")
+        while dispatcher.stats.sent < total + 10_000:
+            await asyncio.sleep(0.05)
+        print(f"Reminders delivered after {time.time() - now:.2f}s; stats: {dispatcher.stats}")
+        await dispatcher.stop()
+
+    asyncio.run(demo())
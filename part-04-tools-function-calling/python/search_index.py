@@ -0,0 +1,317 @@
+"""
+Part 4: Local Search Index for search_documents
+
+In-memory inverted index with BM25 ranking, built for a large internal corpus:
+- Incremental indexing: new documents go into a live segment and are
+  searchable immediately
+- Compact postings: doc IDs are delta-encoded uint32 arrays with uint16 term
+  frequencies, stored contiguously per term
+- Warm start: save() writes the index to disk and load() memory-maps it
+  instead of rebuilding, so a worker is ready as soon as the lexicon is read
+- Scoring is vectorized with NumPy over the query terms' postings only;
+  top-k is selected with argpartition (a partial selection, like a k-heap,
+  without sorting every match)
+
+On-disk layout (directory):
+    postings.u32   delta-encoded doc IDs for every term, concatenated
+    tfs.u16        term frequencies aligned with postings.u32
+    lexicon.txt    one term per line, in the order of offsets.npy
+    offsets.npy    int64 start of each term's postings (+ final end offset)
+    doclen.npy     uint32 token count per document
+    docs.jsonl     per-document metadata (id, title, url, snippet)
+    docs_offsets.npy  byte offset of each line in docs.jsonl
+    meta.json      document count and average length
+"""
+import json
+import mmap
+import os
+import re
+from array import array
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+TOKEN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset("a an and are as at be by for from in is it of on or that the to with".split())
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in TOKEN.findall(text.lower()) if t not in STOPWORDS]
+
+
+class SearchIndex:
+    """BM25 inverted index with an mmap'd base segment and a live in-memory segment."""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+
+        # Base segment (loaded from disk, read-only)
+        self._base_docs = 0
+        self._lexicon: Dict[str, int] = {}
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._postings = np.zeros(0, dtype=np.uint32)
+        self._tfs = np.zeros(0, dtype=np.uint16)
+        self._base_doclen = np.zeros(0, dtype=np.uint32)
+        self._docs_map: Optional[mmap.mmap] = None
+        self._docs_offsets = np.zeros(1, dtype=np.uint64)
+
+        # Live segment (incremental additions)
+        self._live_postings: Dict[str, array] = {}
+        self._live_tfs: Dict[str, array] = {}
+        self._live_doclen = array("I")
+        self._live_docs: List[dict] = []
+        # Base + live doc lengths, grown geometrically so the base segment
+        # is copied once per growth rather than on every add
+        self._doclen_buffer = np.zeros(0, dtype=np.uint32)
+        self._doclen_filled = 0
+
+        self._total_length = 0
+        self._directory: Optional[Path] = None  # where the base segment is mapped from
+
+    # ------------------------------------------------------------
+    # Indexing
+    # ------------------------------------------------------------
+
+    @property
+    def doc_count(self) -> int:
+        return self._base_docs + len(self._live_docs)
+
+    def add(self, doc_id: str, title: str, text: str, url: Optional[str] = None) -> None:
+        """Index a document; it is searchable immediately."""
+        docnum = self.doc_count
+        tokens = tokenize(f"{title} {text}")
+        for term, tf in Counter(tokens).items():
+            if term not in self._live_postings:
+                self._live_postings[term] = array("I")
+                self._live_tfs[term] = array("H")
+            self._live_postings[term].append(docnum)
+            self._live_tfs[term].append(min(tf, 65535))
+
+        self._live_doclen.append(len(tokens))
+        self._total_length += len(tokens)
+        self._live_docs.append({
+            "id": doc_id,
+            "title": title,
+            "url": url or f"/docs/{doc_id}",
+            "snippet": " ".join(text.split()[:40])
+        })
+
+    def _term_postings(self, term: str):
+        """Decoded (doc IDs, tfs) for a term across both segments."""
+        parts_ids, parts_tfs = [], []
+        index = self._lexicon.get(term)
+        if index is not None:
+            start, end = self._offsets[index], self._offsets[index + 1]
+            parts_ids.append(np.cumsum(self._postings[start:end], dtype=np.int64))
+            parts_tfs.append(self._tfs[start:end])
+        if term in self._live_postings:
+            parts_ids.append(np.frombuffer(self._live_postings[term], dtype=np.uint32).astype(np.int64))
+            parts_tfs.append(np.frombuffer(self._live_tfs[term], dtype=np.uint16))
+        if not parts_ids:
+            return None, None
+        if len(parts_ids) == 1:
+            return parts_ids[0], parts_tfs[0]
+        return np.concatenate(parts_ids), np.concatenate(parts_tfs)
+
+    # ------------------------------------------------------------
+    # Search
+    # ------------------------------------------------------------
+
+    def search(self, query: str, k: int = 10) -> List[dict]:
+        """Return the top-k documents for a query by BM25 score."""
+        n_docs = self.doc_count
+        if n_docs == 0:
+            return []
+
+        doclen = self._doclen()
+        avgdl = self._total_length / n_docs if self._total_length else 1.0
+
+        # Only touch the postings of the query terms - never every document
+        all_ids, all_scores = [], []
+        for term in set(tokenize(query)):
+            ids, tfs = self._term_postings(term)
+            if ids is None:
+                continue
+            df = len(ids)
+            idf = np.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            tf = tfs.astype(np.float32)
+            norm = self.k1 * (1 - self.b + self.b * doclen[ids] / avgdl)
+            all_ids.append(ids)
+            all_scores.append(idf * tf * (self.k1 + 1) / (tf + norm))
+
+        if not all_ids:
+            return []
+
+        if len(all_ids) == 1:
+            docs, scores = all_ids[0], all_scores[0]
+        else:
+            docs, inverse = np.unique(np.concatenate(all_ids), return_inverse=True)
+            scores = np.bincount(inverse, weights=np.concatenate(all_scores))
+
+        if len(docs) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(docs))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [{**self._doc(int(docs[i])), "score": round(float(scores[i]), 4)} for i in top]
+
+    def _doclen(self) -> np.ndarray:
+        if not len(self._live_doclen):
+            return self._base_doclen
+        n_docs = self.doc_count
+        if self._doclen_filled < n_docs:
+            if len(self._doclen_buffer) < n_docs:
+                grown = np.empty(max(n_docs, 2 * len(self._doclen_buffer), 1024), dtype=np.uint32)
+                grown[:self._doclen_filled] = self._doclen_buffer[:self._doclen_filled]
+                self._doclen_buffer = grown
+            if self._doclen_filled < self._base_docs:
+                self._doclen_buffer[:self._base_docs] = self._base_doclen
+                self._doclen_filled = self._base_docs
+            live = np.frombuffer(self._live_doclen, dtype=np.uint32)
+            self._doclen_buffer[self._doclen_filled:n_docs] = live[self._doclen_filled - self._base_docs:]
+            self._doclen_filled = n_docs
+        return self._doclen_buffer[:n_docs]
+
+    def _doc(self, docnum: int) -> dict:
+        if docnum >= self._base_docs:
+            return self._live_docs[docnum - self._base_docs]
+        start, end = int(self._docs_offsets[docnum]), int(self._docs_offsets[docnum + 1])
+        return json.loads(self._docs_map[start:end])
+
+    # ------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------
+
+    def save(self, directory: str) -> None:
+        """
+        Merge both segments and write the mmap-able on-disk index.
+
+        Every file is written as *.tmp and then moved into place, meta.json
+        last. Saving into the directory this index was loaded from drops the
+        old maps before replacing the files and then maps the new ones, so
+        the index keeps working (with the live segment merged into the base).
+        """
+        path = Path(directory)
+        path.mkdir(parents=True, exist_ok=True)
+
+        def tmp(name: str) -> Path:
+            return path / f"{name}.tmp"
+
+        terms = sorted(set(self._lexicon) | set(self._live_postings))
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        with open(tmp("postings.u32"), "wb") as postings_file, open(tmp("tfs.u16"), "wb") as tfs_file:
+            position = 0
+            for i, term in enumerate(terms):
+                ids, tfs = self._term_postings(term)
+                deltas = np.diff(ids, prepend=0).astype(np.uint32)
+                postings_file.write(deltas.tobytes())
+                tfs_file.write(np.asarray(tfs, dtype=np.uint16).tobytes())
+                position += len(ids)
+                offsets[i + 1] = position
+
+        doc_offsets = np.zeros(self.doc_count + 1, dtype=np.uint64)
+        with open(tmp("docs.jsonl"), "wb") as docs_file:
+            for docnum in range(self.doc_count):
+                docs_file.write(json.dumps(self._doc(docnum)).encode() + b"\n")
+                doc_offsets[docnum + 1] = docs_file.tell()
+
+        # File objects, so np.save doesn't append ".npy" to the temp names
+        for name, values in (("offsets.npy", offsets),
+                             ("doclen.npy", self._doclen().astype(np.uint32)),
+                             ("docs_offsets.npy", doc_offsets)):
+            with open(tmp(name), "wb") as f:
+                np.save(f, values)
+        tmp("lexicon.txt").write_text("\n".join(terms), encoding="utf-8")
+        tmp("meta.json").write_text(json.dumps({
+            "doc_count": self.doc_count,
+            "total_length": self._total_length,
+            "k1": self.k1,
+            "b": self.b
+        }))
+
+        remap = self._directory is not None and self._directory == path.resolve()
+        if remap:
+            self._unmap()
+        for name in ("postings.u32", "tfs.u16", "docs.jsonl", "offsets.npy", "doclen.npy",
+                     "docs_offsets.npy", "lexicon.txt", "meta.json"):
+            os.replace(tmp(name), path / name)
+        if remap:
+            self.__dict__.update(SearchIndex.load(directory).__dict__)
+        logger.info(f"Saved index: {self.doc_count} docs, {len(terms)} terms, {offsets[-1]} postings")
+
+    def _unmap(self) -> None:
+        """Release the memory maps of the base segment (state is unusable until reloaded)."""
+        if self._docs_map is not None:
+            self._docs_map.close()
+            self._docs_map = None
+        self._offsets = self._postings = self._tfs = self._base_doclen = self._docs_offsets = None
+
+    @classmethod
+    def load(cls, directory: str) -> "SearchIndex":
+        """Memory-map a saved index (no rebuild)."""
+        path = Path(directory)
+        meta = json.loads((path / "meta.json").read_text())
+        index = cls(k1=meta["k1"], b=meta["b"])
+
+        index._base_docs = meta["doc_count"]
+        index._total_length = meta["total_length"]
+        terms = (path / "lexicon.txt").read_text(encoding="utf-8").split("\n")
+        index._lexicon = {term: i for i, term in enumerate(terms) if term}
+        index._offsets = np.load(path / "offsets.npy", mmap_mode="r")
+        index._base_doclen = np.load(path / "doclen.npy", mmap_mode="r")
+        index._docs_offsets = np.load(path / "docs_offsets.npy", mmap_mode="r")
+
+        if index._offsets[-1] > 0:
+            index._postings = np.memmap(path / "postings.u32", dtype=np.uint32, mode="r")
+            index._tfs = np.memmap(path / "tfs.u16", dtype=np.uint16, mode="r")
+        if index._base_docs:
+            with open(path / "docs.jsonl", "rb") as f:
+                index._docs_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        index._directory = path.resolve()
+        return index
+
+
+if __name__ == "__main__":
+    import itertools
+    import random
+    import sys
+    import tempfile
+    import time
+
+    n_docs = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    random.seed(42)
+    vocabulary = [f"term{i}" for i in range(50_000)]
+    cum_weights = list(itertools.accumulate(1 / (i + 1) for i in range(len(vocabulary))))  # Zipf-like
+    corpus = [
+        " ".join(random.choices(vocabulary, cum_weights=cum_weights, k=random.randint(50, 200)))
+        for _ in range(n_docs)
+    ]
+
+    index = SearchIndex()
+    start = time.perf_counter()
+    for i, text in enumerate(corpus):
+        index.add(f"doc-{i}", f"Document {i}", text)
+    print(f"Indexed {n_docs:,} docs in {time.perf_counter() - start:.1f}s")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        index.save(tmp)
+        print(f"Saved in {time.perf_counter() - start:.1f}s")
+
+        start = time.perf_counter()
+        loaded = SearchIndex.load(tmp)
+        print(f"Warm start (mmap load) in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+        queries = [" ".join(random.choices(vocabulary[:5000], k=3)) for _ in range(500)]
+        start = time.perf_counter()
+        for query in queries:
+            loaded.search(query, k=10)
+        elapsed = time.perf_counter() - start
+        print(f"{len(queries) / elapsed:,.0f} queries/sec ({elapsed / len(queries) * 1000:.2f} ms/query)")
+        print(loaded.search(queries[0], k=3))
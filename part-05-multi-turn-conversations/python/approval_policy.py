@@ -0,0 +1,223 @@
+"""
+Part 5: Approval Policy Engine
+
+Declarative approval rules compiled once into a dispatch table keyed by
+action, so checking a tool call costs one dict lookup plus the predicates of
+that action's rules - no matter how many rules exist in total.
+
+Rule format (JSON or Python dicts):
+
+    {"action": "refund", "when": {"amount": {"gt": 100}}, "reason": "Refund over $100"}
+    {"action": "modify_permissions", "when": {"role": {"in": ["admin", "owner"]}}}
+    {"action": "*", "when": {"environment": {"exists": true, "eq": "production"}}}
+
+All conditions in `when` must hold. Rules with action "*" apply to every action.
+The gate fails closed: a condition whose parameter is missing or can't be
+compared (e.g. "5000" against 100) counts as holding, so the call needs
+approval. Use {"exists": true} to express an optional parameter explicitly.
+"""
+import asyncio
+import json
+import operator
+import os
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+OPERATORS: Dict[str, Callable[[Any, Any], bool]] = {
+    "eq": operator.eq,
+    "ne": operator.ne,
+    "gt": operator.gt,
+    "gte": operator.ge,
+    "lt": operator.lt,
+    "lte": operator.le,
+    "in": lambda value, options: value in options,
+    "not_in": lambda value, options: value not in options,
+}
+
+
+@dataclass(frozen=True)
+class CompiledRule:
+    action: str
+    predicates: Tuple[Callable[[dict], bool], ...]
+    reason: str
+
+    def matches(self, params: dict) -> bool:
+        for predicate in self.predicates:
+            if not predicate(params):
+                return False
+        return True
+
+
+def _compile_condition(param: str, op: str, expected: Any) -> Callable[[dict], bool]:
+    """Turn one `param: {op: value}` condition into a closure."""
+    if op == "exists":
+        return lambda params: (param in params) == bool(expected)
+
+    if op not in OPERATORS:
+        raise ValueError(f"Unknown operator '{op}' for parameter '{param}'")
+    compare = OPERATORS[op]
+
+    # Sets make membership checks O(1) for large option lists
+    if op in ("in", "not_in"):
+        if not isinstance(expected, (list, tuple, set, frozenset)):
+            raise ValueError(f"Operator '{op}' for parameter '{param}' needs a list, got {expected!r}")
+        try:
+            expected = frozenset(expected)
+        except TypeError:
+            raise ValueError(f"Operator '{op}' for parameter '{param}' needs hashable options") from None
+
+    def predicate(params: dict) -> bool:
+        # Can't evaluate the condition -> require approval rather than skip it
+        value = params.get(param, _MISSING)
+        if value is _MISSING:
+            return True
+        try:
+            return bool(compare(value, expected))
+        except TypeError:
+            return True
+
+    return predicate
+
+
+def compile_rule(rule: dict) -> CompiledRule:
+    """Validate and compile a single rule definition."""
+    if not isinstance(rule, dict):
+        raise ValueError(f"Rule must be an object, got {rule!r}")
+    if not isinstance(rule.get("action"), str):
+        raise ValueError(f"Rule is missing 'action' (a string): {rule}")
+    when = rule.get("when") or {}
+    if not isinstance(when, dict):
+        raise ValueError(f"Rule 'when' must be an object: {rule}")
+
+    predicates = []
+    for param, conditions in when.items():
+        if not isinstance(conditions, dict):
+            conditions = {"eq": conditions}
+        for op, expected in conditions.items():
+            predicates.append(_compile_condition(param, op, expected))
+
+    reason = rule.get("reason") or f"Action '{rule['action']}' is classified as high-risk"
+    return CompiledRule(action=rule["action"], predicates=tuple(predicates), reason=reason)
+
+
+def compile_rules(rules: List[dict]) -> Dict[str, Tuple[CompiledRule, ...]]:
+    """Build the action -> rules dispatch table (wildcard rules appended to every entry)."""
+    if not isinstance(rules, list):
+        raise ValueError(f"Approval policy must be a list of rules, got {type(rules).__name__}")
+    table: Dict[str, List[CompiledRule]] = {}
+    wildcard: List[CompiledRule] = []
+
+    for rule in rules:
+        compiled = compile_rule(rule)
+        if compiled.action == "*":
+            wildcard.append(compiled)
+        else:
+            table.setdefault(compiled.action, []).append(compiled)
+
+    dispatch = {action: tuple(entries + wildcard) for action, entries in table.items()}
+    dispatch["*"] = tuple(wildcard)
+    return dispatch
+
+
+class PolicyEngine:
+    """Evaluates compiled approval rules; reloads atomically."""
+
+    def __init__(self, rules: Optional[List[dict]] = None, path: Optional[str] = None):
+        self.path = path
+        self._mtime: Optional[float] = None
+        self._reload_lock = threading.Lock()
+        self._watch_task = None
+        self._table: Dict[str, Tuple[CompiledRule, ...]] = compile_rules(rules or [])
+        if path:
+            self.reload_if_changed()
+
+    def evaluate(self, action: str, params: dict) -> Optional[CompiledRule]:
+        """Return the first matching rule, or None if no approval is needed."""
+        table = self._table  # single read, so a concurrent reload can't tear
+        rules = table.get(action)
+        if rules is None:
+            rules = table["*"]
+        for rule in rules:
+            if rule.matches(params):
+                return rule
+        return None
+
+    def load_rules(self, rules: List[dict]) -> None:
+        """Compile a new rule set and swap it in atomically."""
+        table = compile_rules(rules)
+        self._table = table
+        logger.info(f"Approval policy loaded: {len(rules)} rules, {len(table) - 1} actions")
+
+    def reload_if_changed(self) -> bool:
+        """Reload from `path` if the file changed. Invalid files keep the old rules."""
+        if not self.path:
+            return False
+        with self._reload_lock:
+            try:
+                mtime = os.stat(self.path).st_mtime
+                if mtime == self._mtime:
+                    return False
+                with open(self.path) as f:
+                    rules = json.load(f)
+                self.load_rules(rules)
+                self._mtime = mtime
+                return True
+            except (OSError, ValueError) as e:
+                logger.error(f"Failed to reload approval policy from {self.path}: {e}")
+                return False
+
+    async def watch(self, interval: float = 5.0) -> None:
+        """Poll the rules file and hot-swap on change (run as a background task)."""
+        while True:
+            await asyncio.sleep(interval)
+            await asyncio.to_thread(self.reload_if_changed)
+
+    def start_watching(self, interval: float = 5.0) -> None:
+        """Run watch() on the running event loop (no-op without a path or if already watching)."""
+        if self.path and (self._watch_task is None or self._watch_task.done()):
+            self._watch_task = asyncio.get_running_loop().create_task(self.watch(interval))
+
+    async def stop_watching(self) -> None:
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            try:
+                await self._watch_task
+            except asyncio.CancelledError:
+                pass
+            self._watch_task = None
+
+
+DEFAULT_RULES = [
+    {"action": "delete_account"},
+    {"action": "modify_permissions"},
+    {"action": "refund", "when": {"amount": {"gt": 100}}, "reason": "Refunds over $100 require approval"},
+    {"action": "refund_over_100"},  # legacy action name
+]
+
+
+if __name__ == "__main__":
+    import time
+
+    # Micro-benchmark: evaluation cost should not grow with the rule count
+    for rule_count in (10, 1000, 10000):
+        rules = [
+            {"action": f"action_{i}", "when": {"amount": {"gt": i}, "role": {"in": ["admin", "owner"]}}}
+            for i in range(rule_count)
+        ] + DEFAULT_RULES
+        engine = PolicyEngine(rules)
+        actions = [f"action_{i}" for i in range(rule_count)]
+
+        calls = 200_000
+        params = {"amount": 150, "role": "admin"}
+        start = time.perf_counter()
+        for n in range(calls):
+            engine.evaluate("refund", params)
+            engine.evaluate(actions[n % rule_count], params)
+        elapsed = time.perf_counter() - start
+        print(f"{rule_count:>6} rules: {elapsed / (calls * 2) * 1e9:.0f} ns per evaluation")
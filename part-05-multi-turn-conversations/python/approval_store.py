@@ -0,0 +1,444 @@
+"""
+Part 5: Approval Store for Human-in-the-Loop Workflows
+
+Pluggable storage for pending approvals with secondary indexes (by session and
+by status), async waiters that wake as soon as a decision is recorded, and a
+timer-wheel expirer that rejects abandoned requests in bulk.
+"""
+import asyncio
+import json
+import time
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from dataclasses import dataclass, field, asdict
+from enum import Enum
+from typing import Dict, List, Optional, Set
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ApprovalStatus(Enum):
+    PENDING = "pending"
+    APPROVED = "approved"
+    REJECTED = "rejected"
+    EXPIRED = "expired"
+
+
+@dataclass
+class Approval:
+    approval_id: str
+    session_id: str
+    action: str
+    params: dict
+    reason: str
+    status: ApprovalStatus = ApprovalStatus.PENDING
+    created_at: float = field(default_factory=time.time)
+    expires_at: Optional[float] = None
+    decided_at: Optional[float] = None
+
+    def to_json(self) -> str:
+        data = asdict(self)
+        data["status"] = self.status.value
+        return json.dumps(data)
+
+    @classmethod
+    def from_json(cls, raw) -> "Approval":
+        data = json.loads(raw)
+        data["status"] = ApprovalStatus(data["status"])
+        return cls(**data)
+
+
+class ApprovalStore(ABC):
+    """Interface for approval storage backends."""
+
+    @abstractmethod
+    async def create(self, approval: Approval) -> None:
+        """Store a new pending approval."""
+
+    @abstractmethod
+    async def get(self, approval_id: str) -> Optional[Approval]:
+        """Fetch an approval by ID."""
+
+    @abstractmethod
+    async def decide(self, approval_id: str, status: ApprovalStatus) -> Optional[Approval]:
+        """Atomically move a pending approval to a final status.
+
+        Returns the updated approval, or None if it does not exist or was
+        already decided (so two approvers can't both act on it).
+        """
+
+    @abstractmethod
+    async def reopen(self, approval_id: str, status: ApprovalStatus) -> Optional[Approval]:
+        """Atomically move an approval decided as `status` back to pending.
+
+        Used when acting on a decision fails, so the request can be retried.
+        Returns None if the approval is gone or no longer has that status.
+        """
+
+    @abstractmethod
+    async def delete(self, approval_id: str) -> bool:
+        """Remove an approval and its index entries."""
+
+    @abstractmethod
+    async def list_by_session(self, session_id: str) -> List[Approval]:
+        """All approvals belonging to a session."""
+
+    @abstractmethod
+    async def list_by_status(self, status: ApprovalStatus) -> List[Approval]:
+        """All approvals with the given status."""
+
+    @abstractmethod
+    async def wait_for_decision(self, approval_id: str, timeout: Optional[float] = None) -> Optional[Approval]:
+        """Wait until the approval is decided. Returns None on timeout."""
+
+    @abstractmethod
+    async def due_for_expiry(self, now: float) -> List[str]:
+        """IDs of pending approvals whose deadline has passed."""
+
+    async def expire(self, approval_ids: List[str]) -> List[Approval]:
+        """Expire a batch of pending approvals."""
+        expired = []
+        for approval_id in approval_ids:
+            approval = await self.decide(approval_id, ApprovalStatus.EXPIRED)
+            if approval:
+                expired.append(approval)
+        return expired
+
+
+class InMemoryApprovalStore(ApprovalStore):
+    """Single-process approval store (development and tests)."""
+
+    def __init__(self, retention: float = 86400 * 7):
+        self.retention = retention  # How long decided approvals are kept, like the Redis store
+        self._approvals: Dict[str, Approval] = {}
+        self._by_session: Dict[str, Set[str]] = defaultdict(set)
+        self._by_status: Dict[ApprovalStatus, Set[str]] = defaultdict(set)
+        self._waiters: Dict[str, asyncio.Event] = {}
+        self._waiter_counts: Dict[str, int] = defaultdict(int)
+
+    async def create(self, approval: Approval) -> None:
+        self._approvals[approval.approval_id] = approval
+        self._by_session[approval.session_id].add(approval.approval_id)
+        self._by_status[approval.status].add(approval.approval_id)
+
+    async def get(self, approval_id: str) -> Optional[Approval]:
+        return self._approvals.get(approval_id)
+
+    async def decide(self, approval_id: str, status: ApprovalStatus) -> Optional[Approval]:
+        approval = self._approvals.get(approval_id)
+        if approval is None or approval.status != ApprovalStatus.PENDING:
+            return None
+
+        self._by_status[ApprovalStatus.PENDING].discard(approval_id)
+        approval.status = status
+        approval.decided_at = time.time()
+        self._by_status[status].add(approval_id)
+
+        self._wake(approval_id)
+        return approval
+
+    async def reopen(self, approval_id: str, status: ApprovalStatus) -> Optional[Approval]:
+        approval = self._approvals.get(approval_id)
+        if approval is None or approval.status != status:
+            return None
+
+        self._by_status[status].discard(approval_id)
+        approval.status = ApprovalStatus.PENDING
+        approval.decided_at = None
+        self._by_status[ApprovalStatus.PENDING].add(approval_id)
+        return approval
+
+    def _wake(self, approval_id: str) -> None:
+        event = self._waiters.pop(approval_id, None)
+        self._waiter_counts.pop(approval_id, None)
+        if event:
+            event.set()
+
+    async def delete(self, approval_id: str) -> bool:
+        approval = self._approvals.pop(approval_id, None)
+        if approval is None:
+            return False
+        self._wake(approval_id)
+        self._by_session[approval.session_id].discard(approval_id)
+        if not self._by_session[approval.session_id]:
+            del self._by_session[approval.session_id]
+        self._by_status[approval.status].discard(approval_id)
+        return True
+
+    async def list_by_session(self, session_id: str) -> List[Approval]:
+        return [self._approvals[i] for i in self._by_session.get(session_id, ())]
+
+    async def list_by_status(self, status: ApprovalStatus) -> List[Approval]:
+        return [self._approvals[i] for i in self._by_status.get(status, ())]
+
+    async def wait_for_decision(self, approval_id: str, timeout: Optional[float] = None) -> Optional[Approval]:
+        approval = self._approvals.get(approval_id)
+        if approval is None:
+            return None
+        if approval.status != ApprovalStatus.PENDING:
+            return approval
+
+        event = self._waiters.setdefault(approval_id, asyncio.Event())
+        self._waiter_counts[approval_id] += 1
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            # Drop the event once its last waiter gives up (decide() already popped it otherwise)
+            if self._waiters.get(approval_id) is event:
+                self._waiter_counts[approval_id] -= 1
+                if self._waiter_counts[approval_id] <= 0:
+                    del self._waiters[approval_id]
+                    del self._waiter_counts[approval_id]
+        return self._approvals.get(approval_id, approval)
+
+    def _purge_decided(self, now: float) -> None:
+        """Drop decided approvals past their retention (Redis expires them by TTL)."""
+        stale = [
+            approval_id for approval_id, approval in self._approvals.items()
+            if approval.decided_at is not None and approval.decided_at + self.retention <= now
+        ]
+        for approval_id in stale:
+            approval = self._approvals.pop(approval_id)
+            self._by_session[approval.session_id].discard(approval_id)
+            if not self._by_session[approval.session_id]:
+                del self._by_session[approval.session_id]
+            self._by_status[approval.status].discard(approval_id)
+
+    async def due_for_expiry(self, now: float) -> List[str]:
+        self._purge_decided(now)
+        return [
+            approval_id for approval_id in self._by_status.get(ApprovalStatus.PENDING, ())
+            if self._approvals[approval_id].expires_at is not None
+            and self._approvals[approval_id].expires_at <= now
+        ]
+
+
+# Atomic pending -> final transition; publishes the decided approval for waiters
+DECIDE_SCRIPT = """
+local raw = redis.call('GET', KEYS[1])
+if not raw then return nil end
+local approval = cjson.decode(raw)
+if approval['status'] ~= 'pending' then return nil end
+approval['status'] = ARGV[1]
+approval['decided_at'] = tonumber(ARGV[2])
+local updated = cjson.encode(approval)
+redis.call('SET', KEYS[1], updated, 'KEEPTTL')
+redis.call('SMOVE', KEYS[2], KEYS[3], ARGV[3])
+redis.call('ZREM', KEYS[4], ARGV[3])
+redis.call('PUBLISH', KEYS[5], updated)
+return updated
+"""
+
+
+# Atomic decided -> pending transition (the decision could not be acted on)
+REOPEN_SCRIPT = """
+local raw = redis.call('GET', KEYS[1])
+if not raw then return nil end
+local approval = cjson.decode(raw)
+if approval['status'] ~= ARGV[1] then return nil end
+approval['status'] = 'pending'
+approval['decided_at'] = cjson.null
+local updated = cjson.encode(approval)
+redis.call('SET', KEYS[1], updated, 'KEEPTTL')
+redis.call('SMOVE', KEYS[2], KEYS[3], ARGV[2])
+if type(approval['expires_at']) == 'number' then
+    redis.call('ZADD', KEYS[4], approval['expires_at'], ARGV[2])
+end
+return updated
+"""
+
+
+class RedisApprovalStore(ApprovalStore):
+    """Durable approval store shared by all workers through Redis."""
+
+    def __init__(
+        self,
+        redis_url: str = "redis://localhost:6379",
+        prefix: str = "approval",
+        retention: int = 86400 * 7
+    ):
+        import redis.asyncio as aioredis
+
+        self.redis = aioredis.from_url(redis_url)
+        self.prefix = prefix
+        self.retention = retention  # How long decided approvals are kept for audit
+        self._decide = self.redis.register_script(DECIDE_SCRIPT)
+        self._reopen = self.redis.register_script(REOPEN_SCRIPT)
+
+    def _key(self, approval_id: str) -> str:
+        return f"{self.prefix}:{approval_id}"
+
+    def _session_key(self, session_id: str) -> str:
+        return f"{self.prefix}:session:{session_id}"
+
+    def _status_key(self, status: ApprovalStatus) -> str:
+        return f"{self.prefix}:status:{status.value}"
+
+    def _expiry_key(self) -> str:
+        return f"{self.prefix}:expiry"
+
+    def _channel(self, approval_id: str) -> str:
+        return f"{self.prefix}:decided:{approval_id}"
+
+    async def create(self, approval: Approval) -> None:
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.set(self._key(approval.approval_id), approval.to_json(), ex=self.retention)
+        pipe.sadd(self._session_key(approval.session_id), approval.approval_id)
+        pipe.sadd(self._status_key(approval.status), approval.approval_id)
+        if approval.expires_at is not None:
+            pipe.zadd(self._expiry_key(), {approval.approval_id: approval.expires_at})
+        await pipe.execute()
+
+    async def get(self, approval_id: str) -> Optional[Approval]:
+        raw = await self.redis.get(self._key(approval_id))
+        return Approval.from_json(raw) if raw else None
+
+    async def decide(self, approval_id: str, status: ApprovalStatus) -> Optional[Approval]:
+        raw = await self._decide(
+            keys=[
+                self._key(approval_id),
+                self._status_key(ApprovalStatus.PENDING),
+                self._status_key(status),
+                self._expiry_key(),
+                self._channel(approval_id)
+            ],
+            args=[status.value, time.time(), approval_id]
+        )
+        return Approval.from_json(raw) if raw else None
+
+    async def reopen(self, approval_id: str, status: ApprovalStatus) -> Optional[Approval]:
+        raw = await self._reopen(
+            keys=[
+                self._key(approval_id),
+                self._status_key(status),
+                self._status_key(ApprovalStatus.PENDING),
+                self._expiry_key()
+            ],
+            args=[status.value, approval_id]
+        )
+        return Approval.from_json(raw) if raw else None
+
+    async def delete(self, approval_id: str) -> bool:
+        approval = await self.get(approval_id)
+        if approval is None:
+            return False
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.delete(self._key(approval_id))
+        pipe.srem(self._session_key(approval.session_id), approval_id)
+        pipe.srem(self._status_key(approval.status), approval_id)
+        pipe.zrem(self._expiry_key(), approval_id)
+        await pipe.execute()
+        return True
+
+    async def _load_many(self, approval_ids) -> List[Approval]:
+        ids = [i.decode() if isinstance(i, bytes) else i for i in approval_ids]
+        if not ids:
+            return []
+        raws = await self.redis.mget([self._key(i) for i in ids])
+        return [Approval.from_json(raw) for raw in raws if raw]
+
+    async def list_by_session(self, session_id: str) -> List[Approval]:
+        return await self._load_many(await self.redis.smembers(self._session_key(session_id)))
+
+    async def list_by_status(self, status: ApprovalStatus) -> List[Approval]:
+        return await self._load_many(await self.redis.smembers(self._status_key(status)))
+
+    async def wait_for_decision(self, approval_id: str, timeout: Optional[float] = None) -> Optional[Approval]:
+        pubsub = self.redis.pubsub()
+        await pubsub.subscribe(self._channel(approval_id))
+        try:
+            # Check after subscribing so a decision made in between isn't missed
+            approval = await self.get(approval_id)
+            if approval is None or approval.status != ApprovalStatus.PENDING:
+                return approval
+
+            async def next_decision():
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        return Approval.from_json(message["data"])
+
+            try:
+                return await asyncio.wait_for(next_decision(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        finally:
+            await pubsub.unsubscribe(self._channel(approval_id))
+            await pubsub.aclose()
+
+    async def due_for_expiry(self, now: float) -> List[str]:
+        ids = await self.redis.zrangebyscore(self._expiry_key(), 0, now)
+        return [i.decode() if isinstance(i, bytes) else i for i in ids]
+
+
+class ApprovalExpirer:
+    """
+    Hashed timer wheel that expires stale approvals in bulk.
+
+    Each tick drains one slot and expires everything due in a single call.
+    Once per revolution the store is swept as well, which picks up approvals
+    created by other workers or before a restart.
+    """
+
+    def __init__(self, store: ApprovalStore, tick: float = 1.0, slots: int = 60):
+        self.store = store
+        self.tick = tick
+        self.slots = slots
+        self._wheel: List[Dict[str, float]] = [dict() for _ in range(slots)]
+        self._cursor = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def schedule(self, approval: Approval) -> None:
+        """Place an approval in the slot where its deadline falls."""
+        if approval.expires_at is None:
+            return
+        ticks_away = max(0, int((approval.expires_at - time.time()) / self.tick))
+        slot = (self._cursor + ticks_away) % self.slots
+        self._wheel[slot][approval.approval_id] = approval.expires_at
+
+    async def run_once(self) -> List[Approval]:
+        """Advance the wheel by one tick and expire whatever is due."""
+        now = time.time()
+        slot = self._wheel[self._cursor]
+        due = [approval_id for approval_id, deadline in slot.items() if deadline <= now]
+        for approval_id in due:
+            del slot[approval_id]
+
+        self._cursor = (self._cursor + 1) % self.slots
+        if self._cursor == 0:
+            due.extend(i for i in await self.store.due_for_expiry(now) if i not in due)
+
+        expired = await self.store.expire(due) if due else []
+        if expired:
+            logger.info(f"Expired {len(expired)} stale approvals")
+        return expired
+
+    async def _loop(self):
+        # Catch anything that expired while no expirer was running
+        await self.store.expire(await self.store.due_for_expiry(time.time()))
+        while True:
+            await asyncio.sleep(self.tick)
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Approval expiry tick failed: {e}")
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        """Start ticking on the running event loop (no-op if already running)."""
+        if not self.running:
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -1,16 +1,28 @@
 """
 Part 5: Human-in-the-Loop Workflow
+
+Pending approvals live in an ApprovalStore. Background tasks start on the first
+check_if_approval_needed() or request_human_approval() call: the expirer that
+rejects abandoned requests, and (with APPROVAL_POLICY_PATH set) the watcher
+that hot-reloads the policy file. Call `await shutdown()` when the application
+stops.
 """
 import asyncio
+import os
+import time
+import uuid
+from collections import defaultdict
 from dataclasses import dataclass
-from typing import Optional
-from enum import Enum
-
+from typing import Dict, List, Optional
 
-class ApprovalStatus(Enum):
-    PENDING = "pending"
-    APPROVED = "approved"
-    REJECTED = "rejected"
+from approval_policy import DEFAULT_RULES, PolicyEngine
+from approval_store import (
+    Approval,
+    ApprovalExpirer,
+    ApprovalStatus,
+    ApprovalStore,
+    InMemoryApprovalStore,
+)
 
 
 @dataclass
@@ -21,22 +33,55 @@ class ActionRequest:
     reason: str
 
 
-# In-memory store for pending approvals (use Redis/DB in production)
-pending_approvals = {}
+# Approval rules, compiled once (point APPROVAL_POLICY_PATH at a JSON file to hot-reload;
+# the watcher starts with the other background tasks)
+approval_policy = PolicyEngine(DEFAULT_RULES, path=os.getenv("APPROVAL_POLICY_PATH"))
+
+# Pending approvals (swap for RedisApprovalStore in production)
+approval_store: ApprovalStore = InMemoryApprovalStore()
+approval_expirer = ApprovalExpirer(approval_store)
+
+# Default time an approver has to respond before the request is rejected
+APPROVAL_TTL = 3600
+
+
+async def configure_approval_store(store: ApprovalStore, tick: float = 1.0) -> None:
+    """Replace the approval store (e.g. with RedisApprovalStore)."""
+    global approval_store, approval_expirer
+    await approval_expirer.stop()
+    approval_store = store
+    approval_expirer = ApprovalExpirer(store, tick=tick)
+
+
+def _ensure_background_tasks() -> None:
+    """Start the expirer and policy watcher on the running loop the first time they are needed."""
+    approval_expirer.start()
+    approval_policy.start_watching()
+
+
+async def shutdown() -> None:
+    """Stop the background expirer and policy watcher."""
+    await approval_expirer.stop()
+    await approval_policy.stop_watching()
+
+
+async def _reopen(approval: Approval) -> None:
+    """Put a decision that couldn't be acted on back to pending so it can be retried."""
+    reopened = await approval_store.reopen(approval.approval_id, approval.status)
+    if reopened is not None:
+        approval_expirer.schedule(reopened)
 
 
 async def check_if_approval_needed(action: str, params: dict) -> ActionRequest:
     """Determine if an action requires human approval."""
-    high_risk_actions = ["delete_account", "refund_over_100", "modify_permissions"]
-    
-    requires_approval = action in high_risk_actions
-    reason = f"Action '{action}' is classified as high-risk" if requires_approval else ""
+    _ensure_background_tasks()
+    rule = approval_policy.evaluate(action, params)
     
     return ActionRequest(
         action=action,
         params=params,
-        requires_approval=requires_approval,
-        reason=reason
+        requires_approval=rule is not None,
+        reason=rule.reason if rule else ""
     )
 
 
@@ -44,7 +89,8 @@ async def request_human_approval(
     session_id: str,
     action_request: ActionRequest,
     thread,
-    thread_store
+    thread_store,
+    ttl: Optional[float] = APPROVAL_TTL
 ) -> dict:
     """Pause workflow and request human approval."""
     
@@ -52,14 +98,18 @@ async def request_human_approval(
     await thread_store.save_thread(session_id, thread)
     
     # Store pending approval
-    approval_id = f"approval-{session_id}-{action_request.action}"
-    pending_approvals[approval_id] = {
-        "session_id": session_id,
-        "action": action_request.action,
-        "params": action_request.params,
-        "status": ApprovalStatus.PENDING,
-        "reason": action_request.reason
-    }
+    approval_id = f"approval-{session_id}-{action_request.action}-{uuid.uuid4().hex[:8]}"
+    approval = Approval(
+        approval_id=approval_id,
+        session_id=session_id,
+        action=action_request.action,
+        params=action_request.params,
+        reason=action_request.reason,
+        expires_at=time.time() + ttl if ttl else None
+    )
+    await approval_store.create(approval)
+    _ensure_background_tasks()
+    approval_expirer.schedule(approval)
     
     # Notify approver (email, Slack, Teams, etc.)
     await notify_approver(approval_id, action_request)
@@ -71,6 +121,11 @@ async def request_human_approval(
     }
 
 
+async def wait_for_decision(approval_id: str, timeout: Optional[float] = None) -> Optional[Approval]:
+    """Wait for an approver's decision without polling. Returns None on timeout."""
+    return await approval_store.wait_for_decision(approval_id, timeout)
+
+
 async def notify_approver(approval_id: str, action_request: ActionRequest):
     """Send notification to human approver."""
     print(f"\n🔔 APPROVAL REQUIRED")
@@ -81,6 +136,23 @@ async def notify_approver(approval_id: str, action_request: ActionRequest):
     print(f"   Approve with: handle_approval('{approval_id}', True)")
 
 
+@dataclass
+class ApprovalOutcome:
+    approval_id: str
+    ok: bool
+    response: Optional[str] = None
+    error: Optional[str] = None
+
+
+def _resume_message(approval: Approval) -> str:
+    """Message that tells the agent what the approver decided."""
+    if approval.status == ApprovalStatus.APPROVED:
+        # Execute the approved action
+        result = f"Action '{approval.action}' executed successfully"
+        return f"The action was approved and executed. Result: {result}"
+    return "The action was rejected by the approver. Please suggest alternatives."
+
+
 async def handle_approval(
     approval_id: str,
     approved: bool,
@@ -89,41 +161,141 @@ async def handle_approval(
 ) -> str:
     """Process human approval decision and resume workflow."""
     
-    if approval_id not in pending_approvals:
-        return f"Approval {approval_id} not found"
+    # Record the decision atomically so only one approver can act on it
+    status = ApprovalStatus.APPROVED if approved else ApprovalStatus.REJECTED
+    approval = await approval_store.decide(approval_id, status)
     
-    approval = pending_approvals[approval_id]
-    session_id = approval["session_id"]
+    if approval is None:
+        existing = await approval_store.get(approval_id)
+        if existing is None:
+            return f"Approval {approval_id} not found"
+        return f"Approval {approval_id} is already {existing.status.value}"
     
-    # Load the saved thread
-    thread = await thread_store.load_thread(session_id, agent)
+    session_id = approval.session_id
     
-    if approved:
-        # Execute the approved action
-        result = f"Action '{approval['action']}' executed successfully"
-        approval["status"] = ApprovalStatus.APPROVED
+    try:
+        # Load the saved thread
+        thread = await thread_store.load_thread(session_id, agent)
         
-        # Inform agent of approval
-        response = await agent.run(
-            f"The action was approved and executed. Result: {result}",
-            thread
-        )
-    else:
-        approval["status"] = ApprovalStatus.REJECTED
-        response = await agent.run(
-            "The action was rejected by the approver. Please suggest alternatives.",
-            thread
-        )
-    
-    # Save updated thread
-    await thread_store.save_thread(session_id, thread)
+        # Inform agent of the decision
+        response = await agent.run(_resume_message(approval), thread)
+        
+        # Save updated thread
+        await thread_store.save_thread(session_id, thread)
+    except Exception:
+        # Nothing resumed: make the request retryable instead of stuck as decided
+        await _reopen(approval)
+        raise
     
     # Cleanup
-    del pending_approvals[approval_id]
+    await approval_store.delete(approval_id)
     
     return response.text
 
 
+async def handle_approvals(
+    decisions: Dict[str, bool],
+    agent,
+    thread_store,
+    max_concurrency: int = 8
+) -> List[ApprovalOutcome]:
+    """
+    Process many approval decisions at once.
+    
+    Threads are fetched in one round trip, agents resume concurrently under a
+    semaphore, and threads are written back in one pipelined batch. Approvals
+    for the same session run in order so they never share a thread concurrently.
+    Decisions are recorded only after the threads have loaded. Approvals whose
+    resume fails go back to pending, so they can be retried and inspected;
+    only the ones that resumed and were saved are deleted.
+    Returns one outcome per approval ID, in the order given.
+    """
+    outcomes: Dict[str, ApprovalOutcome] = {}
+    
+    # Look up the pending approvals to find their sessions
+    found = await asyncio.gather(*(approval_store.get(approval_id) for approval_id in decisions))
+    pending: Dict[str, Approval] = {}
+    for approval_id, approval in zip(decisions, found):
+        if approval is None:
+            outcomes[approval_id] = ApprovalOutcome(approval_id, ok=False, error="not found")
+        elif approval.status != ApprovalStatus.PENDING:
+            outcomes[approval_id] = ApprovalOutcome(approval_id, ok=False, error=f"already {approval.status.value}")
+        else:
+            pending[approval_id] = approval
+    
+    # Multi-get every affected thread before any decision is recorded
+    session_ids = list(dict.fromkeys(approval.session_id for approval in pending.values()))
+    if hasattr(thread_store, "load_threads"):
+        threads = await thread_store.load_threads(session_ids, agent)
+    else:
+        loaded = await asyncio.gather(*(thread_store.load_thread(s, agent) for s in session_ids))
+        threads = dict(zip(session_ids, loaded))
+    
+    # Record the decisions atomically (another approver may have won meanwhile)
+    decided = await asyncio.gather(*(
+        approval_store.decide(approval_id, ApprovalStatus.APPROVED if decisions[approval_id] else ApprovalStatus.REJECTED)
+        for approval_id in pending
+    ))
+    by_session: Dict[str, List[Approval]] = defaultdict(list)
+    for approval_id, approval in zip(pending, decided):
+        if approval is None:
+            existing = await approval_store.get(approval_id)
+            error = "not found" if existing is None else f"already {existing.status.value}"
+            outcomes[approval_id] = ApprovalOutcome(approval_id, ok=False, error=error)
+        else:
+            by_session[approval.session_id].append(approval)
+    
+    semaphore = asyncio.Semaphore(max_concurrency)
+    resumed: Dict[str, List[Approval]] = defaultdict(list)
+    failed: List[Approval] = []
+    
+    async def resume_session(session_id: str):
+        thread = threads[session_id]
+        for approval in by_session[session_id]:
+            try:
+                async with semaphore:
+                    response = await agent.run(_resume_message(approval), thread)
+                outcomes[approval.approval_id] = ApprovalOutcome(
+                    approval.approval_id, ok=True, response=response.text
+                )
+                resumed[session_id].append(approval)
+            except Exception as e:
+                outcomes[approval.approval_id] = ApprovalOutcome(
+                    approval.approval_id, ok=False, error=str(e)
+                )
+                failed.append(approval)
+    
+    await asyncio.gather(*(resume_session(s) for s in by_session))
+    
+    # Write back all updated threads in one batch
+    updated = {s: threads[s] for s in resumed}
+    if updated:
+        try:
+            if hasattr(thread_store, "save_threads"):
+                await thread_store.save_threads(updated)
+            else:
+                await asyncio.gather(*(thread_store.save_thread(s, t) for s, t in updated.items()))
+        except Exception as e:
+            # Resumed threads weren't persisted: treat them as not resumed
+            for approvals in resumed.values():
+                for approval in approvals:
+                    outcomes[approval.approval_id] = ApprovalOutcome(
+                        approval.approval_id, ok=False, error=f"thread save failed: {e}"
+                    )
+                    failed.append(approval)
+            resumed.clear()
+    
+    # Failed approvals become retryable; only completed ones are cleaned up
+    await asyncio.gather(
+        *(_reopen(approval) for approval in failed),
+        *(approval_store.delete(a.approval_id) for approvals in resumed.values() for a in approvals)
+    )
+    
+    return [outcomes[approval_id] for approval_id in decisions]
+
+
 if __name__ == "__main__":
     print("Human-in-the-Loop module loaded.")
     print("Use check_if_approval_needed() and handle_approval() for HITL workflows.")
+    print("Clear a queue at once with handle_approvals({approval_id: approved, ...}, agent, store).")
+    print("Await wait_for_decision(approval_id, timeout) to resume as soon as a decision lands.")
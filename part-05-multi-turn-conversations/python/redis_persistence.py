@@ -2,17 +2,45 @@
 Part 5: Redis Thread Persistence
 """
 import json
+import time
 import redis
 from datetime import datetime
-from typing import Optional
+from typing import Dict, List, Optional
+
+from thread_archive import SegmentArchive
+
+# Sorted set of session_id -> last activity (unix time), used to find cold threads
+ACTIVITY_KEY = "agent:threads:activity"
+
+# Delete the hot copy only if the thread has not been touched since the cutoff
+ARCHIVE_EVICT_SCRIPT = """
+local score = redis.call('ZSCORE', KEYS[2], ARGV[1])
+if score and tonumber(score) <= tonumber(ARGV[2]) then
+    redis.call('DEL', KEYS[1])
+    redis.call('ZREM', KEYS[2], ARGV[1])
+    return 1
+end
+return 0
+"""
 
 
 class RedisThreadStore:
     """Persist agent threads to Redis for recovery and session management."""
     
-    def __init__(self, redis_url: str = "redis://localhost:6379"):
+    def __init__(
+        self,
+        redis_url: str = "redis://localhost:6379",
+        archive: Optional[SegmentArchive] = None,
+        idle_threshold: int = 900
+    ):
         self.redis = redis.from_url(redis_url)
         self.ttl = 86400 * 7  # 7 days expiration
+        self.archive = archive  # Cold tier for idle threads (optional)
+        self.idle_threshold = idle_threshold  # Seconds before a thread is considered cold
+        self._evict = self.redis.register_script(ARCHIVE_EVICT_SCRIPT)
+    
+    def _key(self, session_id: str) -> str:
+        return f"agent:thread:{session_id}"
     
     async def save_thread(self, session_id: str, thread) -> None:
         """Save thread state to Redis."""
@@ -24,16 +52,18 @@ class RedisThreadStore:
                 "last_updated": datetime.now().isoformat()
             }
         }
-        self.redis.setex(
-            f"agent:thread:{session_id}", 
-            self.ttl, 
-            json.dumps(data)
-        )
+        pipe = self.redis.pipeline()
+        pipe.setex(self._key(session_id), self.ttl, json.dumps(data))
+        pipe.zadd(ACTIVITY_KEY, {session_id: time.time()})
+        pipe.execute()
         print(f"Thread saved: {session_id} ({len(thread.messages)} messages)")
     
     async def load_thread(self, session_id: str, agent) -> Optional[object]:
-        """Load thread from Redis, or create new if not found."""
-        data = self.redis.get(f"agent:thread:{session_id}")
+        """Load thread from Redis (or the cold archive), or create new if not found."""
+        data = self.redis.get(self._key(session_id))
+        
+        if not data and self.archive is not None:
+            data = self._promote(session_id)
         
         if data:
             parsed = json.loads(data)
@@ -45,15 +75,108 @@ class RedisThreadStore:
         print(f"No existing thread found for {session_id}, creating new")
         return agent.get_new_thread()
     
+    async def load_threads(self, session_ids: List[str], agent) -> Dict[str, object]:
+        """Load many threads in one round trip (MGET), creating new ones for misses."""
+        if not session_ids:
+            return {}
+        payloads = self.redis.mget([self._key(s) for s in session_ids])
+        
+        threads = {}
+        for session_id, data in zip(session_ids, payloads):
+            if not data and self.archive is not None:
+                data = self._promote(session_id)
+            thread = agent.get_new_thread()
+            if data:
+                thread.messages = json.loads(data)["messages"]
+            threads[session_id] = thread
+        
+        print(f"Threads loaded: {len(threads)} sessions")
+        return threads
+    
+    async def save_threads(self, threads: Dict[str, object]) -> None:
+        """Save many threads in a single pipelined batch."""
+        now = datetime.now().isoformat()
+        pipe = self.redis.pipeline()
+        for session_id, thread in threads.items():
+            data = {
+                "messages": thread.messages,
+                "metadata": {
+                    "created": now,
+                    "message_count": len(thread.messages),
+                    "last_updated": now
+                }
+            }
+            pipe.setex(self._key(session_id), self.ttl, json.dumps(data))
+        pipe.zadd(ACTIVITY_KEY, {session_id: time.time() for session_id in threads})
+        pipe.execute()
+        print(f"Threads saved: {len(threads)} sessions")
+    
     async def delete_thread(self, session_id: str) -> bool:
-        """Delete a thread from Redis."""
-        result = self.redis.delete(f"agent:thread:{session_id}")
-        return result > 0
+        """Delete a thread from Redis and the cold archive."""
+        pipe = self.redis.pipeline()
+        pipe.delete(self._key(session_id))
+        pipe.zrem(ACTIVITY_KEY, session_id)
+        deleted, _ = pipe.execute()
+        archived = self.archive.delete(session_id) if self.archive is not None else False
+        return deleted > 0 or archived
     
-    async def list_sessions(self, pattern: str = "agent:thread:*") -> list:
-        """List all active session IDs."""
+    async def list_sessions(self, pattern: str = "agent:thread:*", include_archived: bool = False) -> list:
+        """List all active session IDs (optionally including archived ones)."""
         keys = self.redis.keys(pattern)
-        return [k.decode().split(":")[-1] for k in keys]
+        sessions = [k.decode().split(":")[-1] for k in keys]
+        if include_archived and self.archive is not None:
+            sessions.extend(k for k in self.archive.keys() if k not in sessions)
+        return sessions
+    
+    async def archive_idle_threads(self, idle_seconds: Optional[int] = None, batch_size: int = 500) -> int:
+        """Move threads idle longer than the threshold from Redis to the cold archive."""
+        if self.archive is None:
+            raise RuntimeError("No archive configured for this thread store")
+        
+        cutoff = time.time() - (idle_seconds if idle_seconds is not None else self.idle_threshold)
+        archived = 0
+        
+        while True:
+            session_ids = [
+                s.decode() for s in
+                self.redis.zrangebyscore(ACTIVITY_KEY, 0, cutoff, start=0, num=batch_size)
+            ]
+            if not session_ids:
+                break
+            
+            payloads = self.redis.mget([self._key(s) for s in session_ids])
+            for session_id, payload in zip(session_ids, payloads):
+                if payload is None:
+                    # Expired in Redis already - just drop it from the activity set
+                    self.redis.zrem(ACTIVITY_KEY, session_id)
+                    continue
+                
+                self.archive.put(session_id, payload)
+                if self._evict(keys=[self._key(session_id), ACTIVITY_KEY], args=[session_id, cutoff]):
+                    archived += 1
+                else:
+                    # Thread became active again while we were archiving it
+                    self.archive.delete(session_id)
+            
+            if len(session_ids) < batch_size:
+                break
+        
+        print(f"Archived {archived} idle threads")
+        return archived
+    
+    def _promote(self, session_id: str) -> Optional[bytes]:
+        """Move an archived thread back into Redis and return its payload."""
+        payload = self.archive.get(session_id)
+        if payload is None:
+            return None
+        
+        pipe = self.redis.pipeline()
+        pipe.setex(self._key(session_id), self.ttl, payload)
+        pipe.zadd(ACTIVITY_KEY, {session_id: time.time()})
+        pipe.execute()
+        self.archive.delete(session_id)
+        print(f"Thread promoted from archive: {session_id}")
+        return payload
 
 
 # Usage example
@@ -61,7 +184,7 @@ async def persistent_conversation():
     from agent_framework.azure import AzureOpenAIResponsesClient
     from azure.identity import AzureCliCredential
     
-    store = RedisThreadStore()
+    store = RedisThreadStore(archive=SegmentArchive("./thread-archive"))
     
     agent = AzureOpenAIResponsesClient(
         credential=AzureCliCredential()
@@ -81,6 +204,9 @@ async def persistent_conversation():
     
     # Save after each interaction
     await store.save_thread(session_id, thread)
+    
+    # Periodically (e.g. from a cron job) move cold threads out of Redis
+    await store.archive_idle_threads(idle_seconds=900)
 
 
 if __name__ == "__main__":
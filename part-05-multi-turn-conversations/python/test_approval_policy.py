@@ -0,0 +1,23 @@
+from approval_policy import DEFAULT_RULES, PolicyEngine
+
+
+def test_refund_over_limit_needs_approval():
+    engine = PolicyEngine(DEFAULT_RULES)
+    assert engine.evaluate("refund", {"amount": 5000}) is not None
+    assert engine.evaluate("refund", {"amount": 50}) is None
+
+
+def test_refund_without_amount_fails_closed():
+    engine = PolicyEngine(DEFAULT_RULES)
+    assert engine.evaluate("refund", {}) is not None
+
+
+def test_refund_with_uncomparable_amount_fails_closed():
+    engine = PolicyEngine(DEFAULT_RULES)
+    assert engine.evaluate("refund", {"amount": "5000"}) is not None
+
+
+def test_exists_guard_makes_a_parameter_optional():
+    engine = PolicyEngine([{"action": "*", "when": {"environment": {"exists": True, "eq": "production"}}}])
+    assert engine.evaluate("send_email", {}) is None
+    assert engine.evaluate("send_email", {"environment": "production"}) is not None
@@ -0,0 +1,46 @@
+import os
+
+from thread_archive import INDEX_FILE, SegmentArchive
+
+
+def _reopen(directory):
+    return SegmentArchive(str(directory))
+
+
+def test_torn_index_tail_keeps_earlier_deletes(tmp_path):
+    archive = SegmentArchive(str(tmp_path))
+    archive.put("deleted", b"old thread")
+    archive.put("kept", b"live thread")
+    archive.delete("deleted")
+    archive.put("torn", b"written while crashing")
+    archive.close()
+
+    index = tmp_path / INDEX_FILE
+    with open(index, "r+b") as f:
+        f.truncate(os.path.getsize(index) - 3)  # cut the last entry mid-record
+
+    reopened = _reopen(tmp_path)
+    assert "deleted" not in reopened
+    assert reopened.get("kept") == b"live thread"
+    reopened.put("after", b"new thread")
+    reopened.close()
+
+    again = _reopen(tmp_path)
+    assert again.get("after") == b"new thread"
+    assert "deleted" not in again
+    again.close()
+
+
+def test_rebuild_from_segments_honours_tombstones(tmp_path):
+    archive = SegmentArchive(str(tmp_path))
+    archive.put("promoted", b"moved back to redis")
+    archive.put("kept", b"live thread")
+    archive.delete("promoted")
+    archive.close()
+
+    (tmp_path / INDEX_FILE).unlink()
+
+    rebuilt = _reopen(tmp_path)
+    assert "promoted" not in rebuilt
+    assert rebuilt.get("kept") == b"live thread"
+    rebuilt.close()
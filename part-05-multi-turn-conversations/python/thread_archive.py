@@ -0,0 +1,301 @@
+"""
+Part 5: Cold-Thread Archive (memory-mapped segment files)
+
+Threads that have been idle for a while are moved out of Redis into
+append-only, zlib-compressed segment files on local disk. A compact offset
+index maps each session to (segment, offset, length), and reads go through
+mmap so loading an archived thread is a single page-cache lookup.
+"""
+import mmap
+import os
+import struct
+import threading
+import zlib
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Record layout inside a segment: key_len, payload_len, crc32, key, payload
+# (payload_len 0 = tombstone, so a segment scan also sees deletes)
+RECORD_HEADER = struct.Struct("<HII")
+
+# Index entry layout: key_len, segment, offset, length (length 0 = tombstone)
+INDEX_HEADER = struct.Struct("<HIQI")
+
+# Packed location stored per key in memory (16 bytes instead of a tuple)
+LOCATION = struct.Struct("<IQI")
+
+SEGMENT_PREFIX = "segment-"
+SEGMENT_SUFFIX = ".seg"
+INDEX_FILE = "index.log"
+
+
+class SegmentArchive:
+    """Append-only, compressed segment store with an mmap read path."""
+
+    def __init__(
+        self,
+        directory: str = "./thread-archive",
+        segment_max_bytes: int = 64 * 1024 * 1024,
+        compression_level: int = 6,
+        fsync: bool = False
+    ):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.segment_max_bytes = segment_max_bytes
+        self.compression_level = compression_level
+        self.fsync = fsync
+
+        self._lock = threading.Lock()
+        self._index: Dict[str, bytes] = {}
+        self._maps: Dict[int, mmap.mmap] = {}
+        self._active_segment = 0
+        self._active_file = None
+        self._index_file = None
+
+        self._load_index()
+        self._open_active_segment()
+
+    # ------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------
+
+    def put(self, key: str, payload: bytes) -> None:
+        """Append a payload for key, superseding any previous version."""
+        key_bytes = key.encode()
+        compressed = zlib.compress(payload, self.compression_level)
+        header = RECORD_HEADER.pack(len(key_bytes), len(compressed), zlib.crc32(compressed))
+        record = header + key_bytes + compressed
+
+        with self._lock:
+            offset = self._append_record(record)
+            self._write_index_entry(key_bytes, self._active_segment, offset, len(record))
+            self._index[key] = LOCATION.pack(self._active_segment, offset, len(record))
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the decompressed payload for key, or None if not archived."""
+        with self._lock:
+            location = self._index.get(key)
+            if location is None:
+                return None
+            segment, offset, length = LOCATION.unpack(location)
+            view = self._map_segment(segment, offset + length)
+            record = view[offset:offset + length]
+
+        key_len, payload_len, crc = RECORD_HEADER.unpack_from(record)
+        compressed = record[RECORD_HEADER.size + key_len:RECORD_HEADER.size + key_len + payload_len]
+        if zlib.crc32(compressed) != crc:
+            logger.error(f"Corrupt archive record for {key} in segment {segment}")
+            return None
+        return zlib.decompress(compressed)
+
+    def delete(self, key: str) -> bool:
+        """Tombstone a key (in the segment and the index). Space is reclaimed by compact()."""
+        key_bytes = key.encode()
+        with self._lock:
+            if self._index.pop(key, None) is None:
+                return False
+            self._append_record(RECORD_HEADER.pack(len(key_bytes), 0, 0) + key_bytes)
+            self._write_index_entry(key_bytes, 0, 0, 0)
+            return True
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._index
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def keys(self) -> Iterator[str]:
+        return iter(list(self._index))
+
+    def compact(self) -> int:
+        """Rewrite live records into fresh segments and drop the old ones."""
+        with self._lock:
+            live = {key: LOCATION.unpack(loc) for key, loc in self._index.items()}
+            old_segments = self._segment_numbers()
+            records = []
+            for key, (segment, offset, length) in live.items():
+                view = self._map_segment(segment, offset + length)
+                records.append((key, bytes(view[offset:offset + length])))
+
+            self._close_files()
+            base = (old_segments[-1] + 1) if old_segments else 0
+            self._active_segment = base
+            self._active_file = open(self._segment_path(base), "ab")
+
+            new_index: Dict[str, bytes] = {}
+            index_tmp = self.directory / (INDEX_FILE + ".tmp")
+            with open(index_tmp, "wb") as index_file:
+                self._index_file = index_file
+                for key, record in records:
+                    if self._active_file.tell() + len(record) > self.segment_max_bytes and self._active_file.tell() > 0:
+                        self._roll_segment()
+                    offset = self._active_file.tell()
+                    self._active_file.write(record)
+                    self._write_index_entry(key.encode(), self._active_segment, offset, len(record))
+                    new_index[key] = LOCATION.pack(self._active_segment, offset, len(record))
+                self._active_file.flush()
+                os.fsync(self._active_file.fileno())
+                index_file.flush()
+                os.fsync(index_file.fileno())
+            os.replace(index_tmp, self.directory / INDEX_FILE)
+
+            for segment in old_segments:
+                self._segment_path(segment).unlink(missing_ok=True)
+
+            self._index = new_index
+            self._index_file = open(self.directory / INDEX_FILE, "ab")
+            logger.info(f"Archive compacted: {len(records)} live threads, {len(old_segments)} segments removed")
+            return len(old_segments)
+
+    def close(self) -> None:
+        with self._lock:
+            self._close_files()
+
+    # ------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------
+
+    def _segment_path(self, segment: int) -> Path:
+        return self.directory / f"{SEGMENT_PREFIX}{segment:06d}{SEGMENT_SUFFIX}"
+
+    def _segment_numbers(self) -> list:
+        numbers = []
+        for path in self.directory.glob(f"{SEGMENT_PREFIX}*{SEGMENT_SUFFIX}"):
+            numbers.append(int(path.name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]))
+        return sorted(numbers)
+
+    def _open_active_segment(self) -> None:
+        segments = self._segment_numbers()
+        self._active_segment = segments[-1] if segments else 0
+        self._active_file = open(self._segment_path(self._active_segment), "ab")
+        self._index_file = open(self.directory / INDEX_FILE, "ab")
+
+    def _roll_segment(self) -> None:
+        self._active_file.flush()
+        os.fsync(self._active_file.fileno())
+        self._active_file.close()
+        self._active_segment += 1
+        self._active_file = open(self._segment_path(self._active_segment), "ab")
+
+    def _append_record(self, record: bytes) -> int:
+        """Append a record to the active segment (rolling it if full) and return its offset."""
+        if self._active_file.tell() + len(record) > self.segment_max_bytes and self._active_file.tell() > 0:
+            self._roll_segment()
+        offset = self._active_file.tell()
+        self._active_file.write(record)
+        self._active_file.flush()
+        if self.fsync:
+            os.fsync(self._active_file.fileno())
+        return offset
+
+    def _write_index_entry(self, key_bytes: bytes, segment: int, offset: int, length: int) -> None:
+        self._index_file.write(INDEX_HEADER.pack(len(key_bytes), segment, offset, length) + key_bytes)
+        self._index_file.flush()
+        if self.fsync:
+            os.fsync(self._index_file.fileno())
+
+    def _map_segment(self, segment: int, needed: int) -> mmap.mmap:
+        """Return an mmap covering at least `needed` bytes of the segment."""
+        view = self._maps.get(segment)
+        if view is not None and len(view) >= needed:
+            return view
+        if view is not None:
+            view.close()
+        if segment == self._active_segment:
+            self._active_file.flush()
+        with open(self._segment_path(segment), "rb") as f:
+            view = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps[segment] = view
+        return view
+
+    def _load_index(self) -> None:
+        """Replay the index log (rebuilt from a segment scan if it is missing)."""
+        index_path = self.directory / INDEX_FILE
+        if not index_path.exists():
+            if self._segment_numbers():
+                self._rebuild_index()
+            return
+
+        data = index_path.read_bytes()
+        pos = 0
+        while pos + INDEX_HEADER.size <= len(data):
+            key_len, segment, offset, length = INDEX_HEADER.unpack_from(data, pos)
+            end = pos + INDEX_HEADER.size + key_len
+            if end > len(data):
+                break
+            key = data[pos + INDEX_HEADER.size:end].decode()
+            pos = end
+            if length == 0:
+                self._index.pop(key, None)
+            else:
+                self._index[key] = LOCATION.pack(segment, offset, length)
+
+        if pos != len(data):
+            # Only the last write can be torn; every entry before it is intact
+            logger.warning("Archive index has a torn tail entry; truncating it to the last complete entry")
+            with open(index_path, "r+b") as f:
+                f.truncate(pos)
+
+    def _rebuild_index(self) -> None:
+        self._index.clear()
+        for segment in self._segment_numbers():
+            for key, offset, length, tombstone in self._scan_segment(segment):
+                if tombstone:
+                    self._index.pop(key, None)
+                else:
+                    self._index[key] = LOCATION.pack(segment, offset, length)
+        with open(self.directory / INDEX_FILE, "wb") as f:
+            for key, location in self._index.items():
+                segment, offset, length = LOCATION.unpack(location)
+                key_bytes = key.encode()
+                f.write(INDEX_HEADER.pack(len(key_bytes), segment, offset, length) + key_bytes)
+
+    def _scan_segment(self, segment: int) -> Iterator[Tuple[str, int, int, bool]]:
+        data = self._segment_path(segment).read_bytes()
+        pos = 0
+        while pos + RECORD_HEADER.size <= len(data):
+            key_len, payload_len, crc = RECORD_HEADER.unpack_from(data, pos)
+            length = RECORD_HEADER.size + key_len + payload_len
+            if pos + length > len(data):
+                break
+            start = pos + RECORD_HEADER.size
+            payload = data[start + key_len:pos + length]
+            if zlib.crc32(payload) == crc:
+                yield data[start:start + key_len].decode(), pos, length, payload_len == 0
+            pos += length
+
+    def _close_files(self) -> None:
+        for view in self._maps.values():
+            view.close()
+        self._maps.clear()
+        if self._active_file:
+            self._active_file.close()
+        if self._index_file:
+            self._index_file.close()
+
+
+if __name__ == "__main__":
+    import json
+    import tempfile
+    import time
+
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = SegmentArchive(tmp, segment_max_bytes=1024 * 1024)
+        thread = {"messages": [{"role": "user", "text": "hello " * 50}] * 20}
+
+        start = time.perf_counter()
+        for i in range(5000):
+            archive.put(f"user-{i}", json.dumps(thread).encode())
+        write_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for i in range(5000):
+            archive.get(f"user-{i}")
+        read_time = time.perf_counter() - start
+
+        print(f"Archived 5000 threads in {write_time:.2f}s, read back in {read_time:.2f}s")
+        print(f"Segments: {len(archive._segment_numbers())}, live keys: {len(archive)}")
+        archive.close()
@@ -0,0 +1,31 @@
+"""
+Part 6: Common Base for Executor Wrappers
+
+memoize_agent(), checkpoint_agent(), chunked_extractor() and the profiler
+all hand the WorkflowBuilder a stand-in for an agent. Each one overrides
+run() and/or run_stream(); AgentProxy delegates everything else (name,
+get_new_thread(), instructions, ...) to the wrapped agent, so a wrapper can
+be used anywhere the agent was, including inside another wrapper.
+"""
+from typing import Any, Optional
+
+
+def executor_name(agent: Any) -> str:
+    """The name an agent is known by in a workflow graph."""
+    return getattr(agent, "name", None) or type(agent).__name__
+
+
+class AgentProxy:
+    """Agent stand-in: attributes not defined on the proxy are read from the wrapped agent."""
+
+    def __init__(self, agent: Any, name: Optional[str] = None):
+        self._agent = agent
+        self._executor = name or executor_name(agent)
+
+    def __getattr__(self, name: str) -> Any:
+        if name == "_agent":  # not set yet (e.g. during copy or unpickling)
+            raise AttributeError(name)
+        return getattr(self._agent, name)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self._executor!r})"
@@ -0,0 +1,139 @@
+"""
+Part 6: Batch Document Processing
+
+Runs many documents through the document workflow without per-document setup:
+- The client and the three agents are built once per process; each worker
+  slot gets one workflow graph over those shared agents (a workflow instance
+  runs one document at a time)
+- Documents are streamed from a directory or a JSONL file; a bounded queue
+  keeps the reader at most a few documents ahead of the workers
+- Results are appended to a JSONL file as each document finishes; the file is
+  also the resume checkpoint, so a re-run only processes what's left
+- With --checkpoints, each stage's output is also saved per document, so a
+  document that failed midway resumes at the failed stage on the next run
+
+Input:  a directory of text files (id = relative path), or JSONL lines
+        {"id": "doc-1", "text": "..."}
+Output: {"id": "...", "result": ..., "error": null, "latency_s": 3.1, ...}
+
+Usage:
+    python batch_processing.py ./inbox results.jsonl --concurrency 16
+    python batch_processing.py ./inbox results.jsonl --memo redis://localhost:6379
+    python batch_processing.py ./inbox results.jsonl --checkpoints .checkpoints
+"""
+import argparse
+import asyncio
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional
+import logging
+
+from common.batch import BatchReport, read_jsonl, run_batch_jobs
+from workflow_checkpoint import FileCheckpointStore, RedisCheckpointStore, checkpoint_agent, checkpoint_run
+
+logger = logging.getLogger(__name__)
+
+TEXT_SUFFIXES = {".txt", ".md", ".eml", ".csv", ".json", ".xml", ".html"}
+
+
+def iter_documents(source: Path) -> Iterator[dict]:
+    """Yield {"id", "text"} records lazily from a directory or a JSONL file."""
+    if source.is_dir():
+        for path in sorted(p for p in source.rglob("*") if p.is_file() and p.suffix.lower() in TEXT_SUFFIXES):
+            yield {"id": str(path.relative_to(source)), "text": path.read_text(encoding="utf-8", errors="replace")}
+    else:
+        for record in read_jsonl(source):
+            yield {"id": record["id"], "text": record.get("text") or record.get("document", "")}
+
+
+def workflow_output(result) -> object:
+    """JSON-friendly output of a workflow run."""
+    get_outputs = getattr(result, "get_outputs", None)
+    outputs = get_outputs() if callable(get_outputs) else result
+    if isinstance(outputs, list) and len(outputs) == 1:
+        outputs = outputs[0]
+    text = getattr(outputs, "text", None)
+    if isinstance(text, str):
+        return text
+    if isinstance(outputs, (str, int, float, bool, list, dict)) or outputs is None:
+        return outputs
+    return str(outputs)
+
+
+async def process_batch(
+    source: Path,
+    output_path: Path,
+    build_workflow: Optional[Callable[[], object]] = None,
+    concurrency: int = 8,
+    timeout: Optional[float] = 300,
+    memo_store=None,
+    checkpoint_store=None
+) -> BatchReport:
+    """Process every pending document and stream results to output_path."""
+    if build_workflow is None:
+        from document_workflow import DocumentAgents, build_document_workflow, get_document_agents, memoize_document_agents
+        agents = get_document_agents()
+        if memo_store is not None:
+            agents = memoize_document_agents(agents, memo_store)
+        if checkpoint_store is not None:
+            agents = DocumentAgents(*(checkpoint_agent(agent, checkpoint_store) for agent in agents))
+        build_workflow = lambda: build_document_workflow(agents)
+
+    def make_handler():
+        # One graph per worker over the shared agents; the runner asks for a
+        # new one after a failure, since a cancelled or failed run can leave
+        # the graph mid-superstep
+        workflow = build_workflow()
+
+        async def handle(document: dict):
+            # Stage outputs are checkpointed under the document ID
+            with checkpoint_run(document["id"]) if checkpoint_store is not None else nullcontext():
+                result = await workflow.run(document["text"])
+            if checkpoint_store is not None:
+                await checkpoint_store.clear(document["id"])  # the result line supersedes it
+            return workflow_output(result)
+
+        return handle
+
+    return await run_batch_jobs(
+        iter_documents(source), output_path, make_handler,
+        concurrency=concurrency, timeout=timeout, unit="documents"
+    )
+
+
+async def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Run documents through the processing workflow in batch")
+    parser.add_argument("source", type=Path, help="Directory of documents or a JSONL file")
+    parser.add_argument("output", type=Path, help="JSONL file for results (also the resume checkpoint)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Documents in flight (size to your model quota)")
+    parser.add_argument("--timeout", type=float, default=300, help="Per-document timeout in seconds")
+    parser.add_argument("--memo", nargs="?", const="memory", default=None, metavar="REDIS_URL",
+                        help="Memoize agent calls for repeat documents (in memory, or shared via Redis)")
+    parser.add_argument("--checkpoints", default=None, metavar="DIR_OR_REDIS_URL",
+                        help="Save each stage's output so failed documents resume where they stopped")
+    args = parser.parse_args(argv)
+
+    memo_store = None
+    if args.memo:
+        from workflow_memo import InMemoryMemoStore, RedisMemoStore
+        memo_store = InMemoryMemoStore() if args.memo == "memory" else RedisMemoStore(args.memo)
+
+    checkpoint_store = None
+    if args.checkpoints:
+        checkpoint_store = (RedisCheckpointStore(args.checkpoints) if args.checkpoints.startswith("redis")
+                            else FileCheckpointStore(args.checkpoints))
+
+    report = await process_batch(
+        args.source, args.output, concurrency=args.concurrency, timeout=args.timeout,
+        memo_store=memo_store, checkpoint_store=checkpoint_store
+    )
+
+    print("\n" + "=" * 60)
+    print("  📊 Batch complete")
+    print("=" * 60)
+    print(report.summary())
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -0,0 +1,266 @@
+"""
+Part 6: Map-Reduce Extraction for Large Documents
+
+DataExtractor normally gets the whole document in one prompt. Long contracts
+overflow the context window or take minutes in one call. chunked_extractor()
+wraps the extractor agent as a map-reduce stage:
+
+- Map: documents over max_chars are split on structural boundaries
+  (headings/numbered sections, then paragraphs, then sentences) into
+  overlapping chunks, and the extractor runs over them concurrently
+- Reduce: per-chunk JSON is merged deterministically, in chunk order:
+  dicts merge recursively, lists are concatenated without duplicates, and
+  the first non-empty scalar wins. Differing values are kept under
+  "_conflicts" for the validator to see. Chunks whose extractor call failed
+  or returned no JSON are listed under "_failed_chunks" / "_unparsed_chunks"
+  instead of failing the whole stage.
+
+Latency for a large document is roughly ceil(chunks / max_concurrency)
+extractor calls instead of one very long call. Short documents go straight
+through to the agent.
+"""
+import asyncio
+import json
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import logging
+
+from agent_proxy import AgentProxy
+
+logger = logging.getLogger(__name__)
+
+# Lines that start a new section: "ARTICLE IV", "Section 2.1", "12. Term", "# Heading"
+SECTION_START = re.compile(
+    r"^\s*(?:(?:ARTICLE|Article|SECTION|Section|SCHEDULE|Schedule|EXHIBIT|Exhibit)\b"
+    r"|\d+(?:\.\d+)*\.?\s+[A-Z]|#{1,6}\s)"
+)
+PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+SENTENCE_END = re.compile(r"(?<=[.;!?])\s+")
+WHITESPACE = re.compile(r"\s+")
+JSON_OBJECT = re.compile(r"\{.*\}", re.DOTALL)
+
+
+# ============================================================
+# Map: structural chunking
+# ============================================================
+
+def _sections(text: str) -> List[str]:
+    lines = text.splitlines(keepends=True)
+    sections, current = [], []
+    for line in lines:
+        if current and SECTION_START.match(line):
+            sections.append("".join(current))
+            current = []
+        current.append(line)
+    if current:
+        sections.append("".join(current))
+    return sections
+
+
+def _split_block(block: str, max_chars: int) -> List[str]:
+    """Split one oversized block: paragraphs, then sentences, then a hard cut."""
+    if len(block) <= max_chars:
+        return [block]
+    for pattern in (PARAGRAPH_BREAK, SENTENCE_END):
+        parts = [p for p in pattern.split(block) if p.strip()]
+        if len(parts) > 1:
+            separator = "\n\n" if pattern is PARAGRAPH_BREAK else " "
+            pieces = []
+            for part in parts:
+                # Leave room for the separator re-attached to the part's last piece
+                split = _split_block(part, max_chars - len(separator))
+                split[-1] += separator
+                pieces.extend(split)
+            return pieces
+    return [block[i:i + max_chars] for i in range(0, len(block), max_chars)]
+
+
+def _overlap_tail(chunk: str, overlap: int) -> str:
+    """
+    The last `overlap` chars of a chunk, trimmed to start after a paragraph or
+    sentence boundary (the earliest one, for the longest overlap), else after
+    a word boundary. Without any boundary (a hard cut) the raw tail is used.
+    """
+    if overlap <= 0:
+        return ""
+    start = max(len(chunk) - overlap, 0)
+    for patterns in ((PARAGRAPH_BREAK, SENTENCE_END), (WHITESPACE,)):
+        ends = [m.end() for m in (p.search(chunk, start) for p in patterns) if m and m.end() < len(chunk)]
+        if ends:
+            return chunk[min(ends):]
+    return chunk[start:]
+
+
+def split_document(text: str, max_chars: int = 16_000, overlap: int = 1_000) -> List[str]:
+    """
+    Pack structural blocks into chunks of at most max_chars. Each chunk after
+    the first starts with up to `overlap` trailing chars of the previous
+    chunk (from a sentence or paragraph boundary where possible), so a clause
+    cut at a boundary is seen whole at least once.
+    """
+    if overlap >= max_chars:
+        raise ValueError("overlap must be smaller than max_chars")
+    if len(text) <= max_chars:
+        return [text]
+
+    blocks = [piece for section in _sections(text) for piece in _split_block(section, max_chars - overlap)]
+    chunks: List[str] = []
+    current: List[str] = []
+    size = 0
+    for block in blocks:
+        if current and size + len(block) > max_chars:
+            chunk = "".join(current)
+            chunks.append(chunk)
+            carried = _overlap_tail(chunk, overlap)
+            current, size = [carried], len(carried)
+        current.append(block)
+        size += len(block)
+    if current:
+        chunks.append("".join(current))
+    return chunks
+
+
+# ============================================================
+# Reduce: deterministic merge of per-chunk JSON
+# ============================================================
+
+def parse_json_output(text: str) -> Optional[dict]:
+    """The JSON object in a model reply (tolerates code fences and surrounding prose)."""
+    match = JSON_OBJECT.search(text or "")
+    if not match:
+        return None
+    try:
+        value = json.loads(match.group(0))
+    except json.JSONDecodeError:
+        return None
+    return value if isinstance(value, dict) else None
+
+
+def _empty(value: Any) -> bool:
+    return value is None or value == "" or value == [] or value == {}
+
+
+def _merge(into: dict, other: dict, conflicts: Dict[str, list], path: str = "") -> None:
+    for key, value in other.items():
+        where = f"{path}.{key}" if path else key
+        existing = into.get(key)
+        if _empty(value):
+            into.setdefault(key, value)
+        elif _empty(existing):
+            into[key] = value
+        elif isinstance(existing, dict) and isinstance(value, dict):
+            _merge(existing, value, conflicts, where)
+        elif isinstance(existing, list) and isinstance(value, list):
+            seen = {json.dumps(item, sort_keys=True) for item in existing}
+            for item in value:
+                marker = json.dumps(item, sort_keys=True)
+                if marker not in seen:
+                    seen.add(marker)
+                    existing.append(item)
+        elif existing != value:
+            # First chunk wins; keep the alternatives visible
+            alternatives = conflicts.setdefault(where, [existing])
+            if value not in alternatives:
+                alternatives.append(value)
+
+
+def reduce_extractions(outputs: List[Optional[dict]], failed: Sequence[int] = ()) -> dict:
+    """
+    Merge per-chunk extractions in chunk order (same inputs -> same output).
+    Chunks whose reply had no JSON are listed under "_unparsed_chunks", chunks
+    whose extractor call raised (given as `failed`) under "_failed_chunks".
+    """
+    merged: dict = {}
+    conflicts: Dict[str, list] = {}
+    for output in outputs:
+        if output:
+            _merge(merged, output, conflicts)
+    if conflicts:
+        merged["_conflicts"] = conflicts
+    unparsed = [i for i, output in enumerate(outputs) if output is None and i not in failed]
+    if unparsed:
+        merged["_unparsed_chunks"] = unparsed
+    if failed:
+        merged["_failed_chunks"] = sorted(failed)
+    return merged
+
+
+# ============================================================
+# Map-reduce stage
+# ============================================================
+
+def _message_text(message: Any) -> str:
+    return message if isinstance(message, str) else getattr(message, "text", "") or ""
+
+
+def _with_text(message: Any, text: str) -> Any:
+    if isinstance(message, str):
+        return text
+    from agent_framework import ChatMessage
+    return ChatMessage(role=message.role, text=text)
+
+
+class ChunkedExtractor(AgentProxy):
+    """Extractor proxy: map over chunks of large inputs, reduce the JSON; everything else delegated."""
+
+    def __init__(self, agent: Any, max_chars: int = 16_000, overlap: int = 1_000, max_concurrency: int = 8):
+        super().__init__(agent)
+        self.max_chars = max_chars
+        self.overlap = overlap
+        self.max_concurrency = max_concurrency
+
+    def _split_input(self, messages: Any) -> Tuple[List[Any], int]:
+        """Per-chunk inputs: the largest message (the document) is replaced by each chunk."""
+        items = list(messages) if isinstance(messages, (list, tuple)) else [messages]
+        if not items:
+            return [], 1
+        target = max(range(len(items)), key=lambda i: len(_message_text(items[i])))
+        chunks = split_document(_message_text(items[target]), self.max_chars, self.overlap)
+        if len(chunks) == 1:
+            return [], 1
+        inputs = []
+        for chunk in chunks:
+            replaced = items[:target] + [_with_text(items[target], chunk)] + items[target + 1:]
+            inputs.append(replaced if isinstance(messages, (list, tuple)) else replaced[0])
+        return inputs, len(chunks)
+
+    async def run(self, messages: Any = None, *args, **kwargs) -> Any:
+        inputs, chunk_count = self._split_input(messages) if messages is not None else ([], 1)
+        if chunk_count == 1:
+            return await self._agent.run(messages, *args, **kwargs)
+
+        logger.info(f"Extracting from {chunk_count} chunks ({self.max_concurrency} at a time)")
+        slots = asyncio.Semaphore(self.max_concurrency)
+
+        async def extract(chunk_input: Any) -> Optional[dict]:
+            async with slots:
+                # No shared thread: chunks are independent prompts
+                response = await self._agent.run(chunk_input)
+            return parse_json_output(_message_text(response))
+
+        results = await asyncio.gather(*(extract(chunk_input) for chunk_input in inputs), return_exceptions=True)
+        outputs: List[Optional[dict]] = []
+        failed: List[int] = []
+        for index, result in enumerate(results):
+            if isinstance(result, BaseException):
+                if not isinstance(result, Exception):
+                    raise result
+                logger.warning(f"Chunk {index + 1}/{chunk_count} extraction failed: {result!r}")
+                failed.append(index)
+                result = None
+            outputs.append(result)
+        if len(failed) == chunk_count:
+            raise results[0]  # nothing to merge
+        merged = json.dumps(reduce_extractions(outputs, failed), indent=2, ensure_ascii=False)
+
+        from agent_framework import AgentRunResponse, ChatMessage, Role
+        return AgentRunResponse(messages=[ChatMessage(role=Role.ASSISTANT, text=merged)])
+
+    def __repr__(self) -> str:
+        return f"ChunkedExtractor({self._executor!r}, max_chars={self.max_chars})"
+
+
+def chunked_extractor(agent: Any, max_chars: int = 16_000, overlap: int = 1_000,
+                      max_concurrency: int = 8) -> ChunkedExtractor:
+    """Make an extractor agent map-reduce over large documents."""
+    return ChunkedExtractor(agent, max_chars=max_chars, overlap=overlap, max_concurrency=max_concurrency)
@@ -1,66 +1,235 @@
 """
 Part 6: Conditional Routing in Workflows
+
+Optionally, a local pre-classifier (see fast_classifier.py) runs first:
+- Confident predictions go straight to the matching processor, with no
+  classifier round trip
+- Everything else falls back to the workflow, whose LLM classifier decides
+- A sample of fast-path documents is shadow-checked against the LLM
+  classifier in the background, to track how often the two disagree
+
+Both paths return the processor's response. The router keeps its stats
+and shadow checks across documents, so build it once and reuse it (a
+FastPathRouters instance holds one per client, pre-classifier and options
+for as long as it is kept); await router.drain() before reading final
+stats or shutting down.
 """
+import asyncio
+import random
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+import logging
+
 from agent_framework import WorkflowBuilder
 
+logger = logging.getLogger(__name__)
+
+
+class RoutingAgents(NamedTuple):
+    classifier: object
+    invoice_processor: object
+    contract_processor: object
+    general_processor: object
+
+
+def create_routing_agents(client) -> RoutingAgents:
+    """Create the classifier and the type-specific processors."""
 
-def create_conditional_workflow(client):
-    """Create a workflow with conditional routing based on classification."""
-    
     # Create type-specific processors
     invoice_processor = client.create_agent(
         name="InvoiceProcessor",
         instructions="Process invoices: validate amounts, check vendor, verify terms."
     )
-    
+
     contract_processor = client.create_agent(
-        name="ContractProcessor", 
+        name="ContractProcessor",
         instructions="Process contracts: extract terms, identify obligations, flag risks."
     )
-    
+
     general_processor = client.create_agent(
         name="GeneralProcessor",
         instructions="Process general documents: summarize content, extract key points."
     )
-    
+
     classifier = client.create_agent(
         name="Classifier",
         instructions="Classify document as: invoice, contract, or other. Return only the type."
     )
-    
+
+    return RoutingAgents(classifier, invoice_processor, contract_processor, general_processor)
+
+
+def document_type(classification_result: str) -> str:
+    """Normalize classifier output to invoice, contract or other."""
+    result_lower = str(classification_result).lower().strip()
+
+    if "invoice" in result_lower:
+        return "invoice"
+    elif "contract" in result_lower:
+        return "contract"
+    else:
+        return "other"
+
+
+def processor_for(agents: RoutingAgents, doc_type: str):
+    if doc_type == "invoice":
+        return agents.invoice_processor
+    elif doc_type == "contract":
+        return agents.contract_processor
+    else:
+        return agents.general_processor
+
+
+def build_conditional_workflow(agents: RoutingAgents, builder=None):
+    """Wire classifier -> (invoice | contract | general) over existing agents (builder: see workflow_profiler)."""
+
     # Router function based on classifier output
     def route_by_type(classification_result: str):
-        result_lower = classification_result.lower().strip()
-        
-        if "invoice" in result_lower:
-            return invoice_processor
-        elif "contract" in result_lower:
-            return contract_processor
-        else:
-            return general_processor
-    
+        return processor_for(agents, document_type(classification_result))
+
     # Build workflow with conditional routing
-    builder = WorkflowBuilder()
-    
-    builder.add_executor(classifier)
-    builder.add_executor(invoice_processor)
-    builder.add_executor(contract_processor)
-    builder.add_executor(general_processor)
-    
+    builder = builder or WorkflowBuilder()
+
+    builder.add_executor(agents.classifier)
+    builder.add_executor(agents.invoice_processor)
+    builder.add_executor(agents.contract_processor)
+    builder.add_executor(agents.general_processor)
+
     # Add conditional edge - routes based on classification
     builder.add_conditional_edge(
-        source=classifier,
+        source=agents.classifier,
         router=route_by_type
     )
-    
-    builder.set_start_executor(classifier)
-    
+
+    builder.set_start_executor(agents.classifier)
+
     return builder.build()
 
 
+def processor_response(result) -> Any:
+    """The processor's response from a conditional workflow run (its last output)."""
+    outputs = result.get_outputs()
+    return outputs[-1] if outputs else None
+
+
+def create_conditional_workflow(client):
+    """Create a workflow with conditional routing based on classification."""
+    return build_conditional_workflow(create_routing_agents(client))
+
+
+@dataclass
+class RoutingStats:
+    documents: int = 0
+    fast_path: int = 0
+    fallback: int = 0
+    shadow_checked: int = 0
+    disagreements: int = 0
+
+    @property
+    def fast_path_rate(self) -> float:
+        return self.fast_path / self.documents if self.documents else 0.0
+
+    @property
+    def disagreement_rate(self) -> float:
+        return self.disagreements / self.shadow_checked if self.shadow_checked else 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            **asdict(self),
+            "fast_path_rate": round(self.fast_path_rate, 4),
+            "disagreement_rate": round(self.disagreement_rate, 4)
+        }
+
+
+class FastPathRouter:
+    """Routes confident local predictions directly; the rest go through the workflow."""
+
+    def __init__(self, agents: RoutingAgents, pre_classifier=None, threshold: float = 0.9,
+                 shadow_rate: float = 0.02):
+        self.agents = agents
+        self.pre_classifier = pre_classifier  # anything with predict(text) -> .label, .confidence
+        self.threshold = threshold
+        self.shadow_rate = shadow_rate
+        self.workflow = build_conditional_workflow(agents)
+        self.stats = RoutingStats()
+        self._shadow_tasks: set = set()
+
+    async def run(self, document: str):
+        """The processor's response, whichever path chose the processor."""
+        self.stats.documents += 1
+        prediction = self.pre_classifier.predict(document) if self.pre_classifier else None
+
+        if prediction is None or prediction.confidence < self.threshold:
+            self.stats.fallback += 1
+            return processor_response(await self.workflow.run(document))
+
+        self.stats.fast_path += 1
+        doc_type = document_type(prediction.label)
+        if self.shadow_rate and random.random() < self.shadow_rate:
+            task = asyncio.create_task(self._shadow_check(document, doc_type))
+            self._shadow_tasks.add(task)
+            task.add_done_callback(self._shadow_tasks.discard)
+        return await processor_for(self.agents, doc_type).run(document)
+
+    async def _shadow_check(self, document: str, predicted: str) -> None:
+        try:
+            response = await self.agents.classifier.run(document)
+        except Exception as e:
+            logger.warning(f"Shadow classification failed: {e}")
+            return
+        self.stats.shadow_checked += 1
+        llm_type = document_type(getattr(response, "text", response))
+        if llm_type != predicted:
+            self.stats.disagreements += 1
+            logger.info(f"Fast path said {predicted}, classifier said {llm_type}")
+
+    async def drain(self) -> None:
+        """Wait for outstanding shadow checks (before reading final stats)."""
+        if self._shadow_tasks:
+            await asyncio.gather(*list(self._shadow_tasks), return_exceptions=True)
+
+
+class FastPathRouters:
+    """
+    Owner of shared routers: one per client, pre-classifier and options.
+    Routers (and the clients they use) live as long as this object or until
+    close().
+    """
+
+    def __init__(self):
+        # The client and pre-classifier are held so their ids stay unique
+        self._routers: Dict[Tuple[int, int, tuple], Tuple[object, object, FastPathRouter]] = {}
+
+    def get(self, client, pre_classifier, **options) -> FastPathRouter:
+        """The router for this client, pre-classifier and options (built on first use)."""
+        key = (id(client), id(pre_classifier), tuple(sorted(options.items())))
+        entry = self._routers.get(key)
+        if entry is None:
+            entry = self._routers[key] = (
+                client, pre_classifier, FastPathRouter(create_routing_agents(client), pre_classifier, **options)
+            )
+        return entry[2]
+
+    async def close(self) -> None:
+        """Wait for every router's shadow checks, then drop the routers."""
+        routers = [entry[2] for entry in self._routers.values()]
+        self._routers.clear()
+        await asyncio.gather(*(router.drain() for router in routers))
+
+
 # Usage
-async def process_with_routing(document: str, client):
-    """Process document with conditional routing."""
+async def process_with_routing(document: str, client, pre_classifier=None,
+                               routers: Optional[FastPathRouters] = None):
+    """
+    Process document with conditional routing and return the processor's
+    response. With a pre-classifier, confident documents take the fast path;
+    pass routers to reuse the router (and its stats) across documents.
+    """
+    if pre_classifier is not None:
+        owner = routers or FastPathRouters()
+        response = await owner.get(client, pre_classifier).run(document)
+        if routers is None:
+            await owner.close()  # one-off router: finish its shadow check
+        return response
     workflow = create_conditional_workflow(client)
-    result = await workflow.run(document)
-    return result
+    return processor_response(await workflow.run(document))
@@ -2,88 +2,123 @@
 Part 6: Document Processing Workflow
 """
 import asyncio
+from typing import Dict, NamedTuple, Optional
 from agent_framework import WorkflowBuilder
-from agent_framework.azure import AzureOpenAIResponsesClient
-from azure.identity import AzureCliCredential
-import os
 
+from common.clients import get_responses_client
+from common.lazy import lazy_factory
+from chunked_extraction import chunked_extractor
 
-async def create_document_processing_workflow():
-    """Create a workflow for processing documents through multiple agents."""
-    
-    client = AzureOpenAIResponsesClient(
-        credential=AzureCliCredential(),
-        endpoint=os.getenv("AZURE_OPENAI_ENDPOINT")
-    )
-    
-    # Create specialized agents
-    classifier_agent = client.create_agent(
-        name="DocumentClassifier",
-        instructions="""
-            You are a document classification expert.
-            Analyze documents and classify them into categories:
-            - invoice: Bills, payment requests, receipts
-            - contract: Legal agreements, terms of service
-            - report: Analysis documents, summaries, metrics
-            - correspondence: Letters, emails, memos
-            - other: Anything that doesn't fit above categories
-            
-            Return ONLY the category name in lowercase.
-        """
-    )
+
+CLASSIFIER_INSTRUCTIONS = """
+    You are a document classification expert.
+    Analyze documents and classify them into categories:
+    - invoice: Bills, payment requests, receipts
+    - contract: Legal agreements, terms of service
+    - report: Analysis documents, summaries, metrics
+    - correspondence: Letters, emails, memos
+    - other: Anything that doesn't fit above categories
+    
+    Return ONLY the category name in lowercase.
+"""
+
+EXTRACTOR_INSTRUCTIONS = """
+    You are a data extraction specialist.
+    Based on the document type, extract key fields:
     
-    extractor_agent = client.create_agent(
-        name="DataExtractor",
-        instructions="""
-            You are a data extraction specialist.
-            Based on the document type, extract key fields:
-            
-            For invoices: vendor, amount, date, invoice_number
-            For contracts: parties, effective_date, terms, signatures
-            For reports: title, date, key_findings, recommendations
-            For correspondence: sender, recipient, date, subject, action_items
-            
-            Return data as structured JSON.
-        """
-    )
+    For invoices: vendor, amount, date, invoice_number
+    For contracts: parties, effective_date, terms, signatures
+    For reports: title, date, key_findings, recommendations
+    For correspondence: sender, recipient, date, subject, action_items
     
-    validator_agent = client.create_agent(
-        name="DataValidator",
-        instructions="""
-            You are a data validation expert.
-            Check extracted data for:
-            - Completeness: All required fields present
-            - Format: Dates, numbers, emails properly formatted
-            - Consistency: Values make logical sense
-            
-            Return validation result with any issues found.
-        """
+    Return data as structured JSON.
+"""
+
+VALIDATOR_INSTRUCTIONS = """
+    You are a data validation expert.
+    Check extracted data for:
+    - Completeness: All required fields present
+    - Format: Dates, numbers, emails properly formatted
+    - Consistency: Values make logical sense
+    
+    Return validation result with any issues found.
+"""
+
+
+class DocumentAgents(NamedTuple):
+    classifier: object
+    extractor: object
+    validator: object
+
+
+def create_document_agents(client=None, chunk_chars: int = 16_000) -> DocumentAgents:
+    """Create the specialized agents (the expensive part; reuse the result)."""
+    client = client or get_responses_client()
+    extractor = client.create_agent(name="DataExtractor", instructions=EXTRACTOR_INSTRUCTIONS)
+    return DocumentAgents(
+        classifier=client.create_agent(name="DocumentClassifier", instructions=CLASSIFIER_INSTRUCTIONS),
+        # Large documents are extracted chunk by chunk, concurrently, then merged
+        extractor=chunked_extractor(extractor, max_chars=chunk_chars),
+        validator=client.create_agent(name="DataValidator", instructions=VALIDATOR_INSTRUCTIONS)
     )
-    
-    # Build the workflow
-    builder = WorkflowBuilder()
+
+
+# Agents are built once per process and shared by every workflow graph
+get_document_agents = lazy_factory(create_document_agents)
+
+# Per-executor memo TTLs in seconds: classification of identical text is stable,
+# validation is the cheapest to redo
+DEFAULT_MEMO_TTLS = {"classifier": 7 * 86400, "extractor": 86400, "validator": 3600}
+
+
+def memoize_document_agents(agents: DocumentAgents, store, ttls: Optional[Dict[str, float]] = None) -> DocumentAgents:
+    """Opt the agents into memoization; repeat documents skip the model calls."""
+    from workflow_memo import memoize_agent
+
+    ttls = {**DEFAULT_MEMO_TTLS, **(ttls or {})}
+    instructions = {
+        "classifier": CLASSIFIER_INSTRUCTIONS,
+        "extractor": EXTRACTOR_INSTRUCTIONS,
+        "validator": VALIDATOR_INSTRUCTIONS
+    }
+    return DocumentAgents(**{
+        role: memoize_agent(agent, store, ttl=ttls[role], instructions=instructions[role])
+        for role, agent in agents._asdict().items()
+    })
+
+
+def build_document_workflow(agents: DocumentAgents, builder=None):
+    """
+    Wire the classifier -> extractor -> validator graph over existing agents.
+    Pass builder=WorkflowProfiler().builder() to profile the runs.
+    """
+    builder = builder or WorkflowBuilder()
     
     # Add executors (agents)
-    builder.add_executor(classifier_agent)
-    builder.add_executor(extractor_agent)
-    builder.add_executor(validator_agent)
+    builder.add_executor(agents.classifier)
+    builder.add_executor(agents.extractor)
+    builder.add_executor(agents.validator)
     
     # Define edges (execution flow)
-    builder.add_edge(classifier_agent, extractor_agent)
-    builder.add_edge(extractor_agent, validator_agent)
+    builder.add_edge(agents.classifier, agents.extractor)
+    builder.add_edge(agents.extractor, agents.validator)
     
     # Set entry point
-    builder.set_start_executor(classifier_agent)
+    builder.set_start_executor(agents.classifier)
     
     # Build the workflow
-    workflow = builder.build()
-    
-    return workflow
+    return builder.build()
+
+
+async def create_document_processing_workflow(client=None):
+    """Create a workflow for processing documents through multiple agents."""
+    agents = create_document_agents(client) if client is not None else get_document_agents()
+    return build_document_workflow(agents)
 
 
-async def process_document(document_text: str):
-    """Process a document through the workflow."""
-    workflow = await create_document_processing_workflow()
+async def process_document(document_text: str, workflow=None):
+    """Process a document through the workflow (pass one in to reuse it)."""
+    workflow = workflow or await create_document_processing_workflow()
     
     print("Processing document through workflow...")
     print("=" * 50)
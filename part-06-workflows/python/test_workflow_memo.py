@@ -0,0 +1,75 @@
+import asyncio
+
+from workflow_memo import InMemoryMemoStore, memoize_agent
+
+
+class MessageStore:
+    def __init__(self):
+        self.messages = []
+
+    async def list_messages(self):
+        return list(self.messages)
+
+
+class Thread:
+    def __init__(self):
+        self.message_store = MessageStore()
+
+
+class RecordingAgent:
+    """Model stand-in: counts calls and records each exchange on the thread."""
+
+    name = "Classifier"
+
+    def __init__(self):
+        self.calls = 0
+
+    def get_new_thread(self):
+        return Thread()
+
+    async def run(self, messages, thread=None):
+        self.calls += 1
+        if thread is not None:
+            thread.message_store.messages += [messages, f"reply {self.calls}"]
+        return f"class of {messages}"
+
+
+class Executor:
+    """Like AgentExecutor: one thread per executor, passed on every run."""
+
+    def __init__(self, agent):
+        self.agent = agent
+        self.thread = agent.get_new_thread()
+
+    async def handle(self, text):
+        return await self.agent.run(text, thread=self.thread)
+
+
+def test_executor_thread_is_left_out_of_the_key():
+    raw = RecordingAgent()
+    executor = Executor(memoize_agent(raw, InMemoryMemoStore(), instructions="classify"))
+
+    async def documents():
+        return [await executor.handle(text) for text in ["invoice", "receipt", "invoice", "receipt"]]
+
+    assert asyncio.run(documents()) == ["class of invoice", "class of receipt"] * 2
+    assert raw.calls == 2
+    assert executor.agent.memo_stats.hits == 2
+    assert executor.agent.memo_stats.bypassed == 0
+
+
+def test_caller_thread_with_history_bypasses_the_memo():
+    raw = RecordingAgent()
+    agent = memoize_agent(raw, InMemoryMemoStore(), instructions="classify")
+    conversation = Thread()
+    conversation.message_store.messages = ["classify the next document as a receipt"]
+
+    async def calls():
+        await agent.run("invoice", thread=Thread())  # fresh thread: memoized
+        await agent.run("invoice", thread=Thread())
+        await agent.run("invoice", thread=conversation)
+
+    asyncio.run(calls())
+    assert raw.calls == 2
+    assert agent.memo_stats.hits == 1
+    assert agent.memo_stats.bypassed == 1
@@ -0,0 +1,285 @@
+"""
+Part 6: Stage Checkpointing and Resume for Workflows
+
+If DataValidator fails after DocumentClassifier and DataExtractor have
+succeeded, a plain rerun repeats every earlier model call. checkpoint_agent()
+wraps an executor so that inside a checkpoint_run(run_id) block:
+
+- Each completed stage's output is saved to a pluggable store
+  (FileCheckpointStore or RedisCheckpointStore), keyed by run ID, executor,
+  input hash and a per-run counter for repeated calls
+- Rerunning the same run ID returns saved outputs for completed stages
+  without a model call. The graph replays them instantly and picks up at the
+  first stage without a checkpoint.
+- A saved output is only reused for the same input (content hash), so an
+  edited document under an old ID is processed from scratch
+- run_stream() is checkpointed too: a completed stream's updates are saved
+  and replayed on resume
+
+Outside a checkpoint_run block the wrapper is a pass-through.
+
+Usage:
+    store = FileCheckpointStore(".checkpoints")
+    agents = DocumentAgents(*(checkpoint_agent(a, store) for a in agents))
+    workflow = build_document_workflow(agents)
+
+    with checkpoint_run("doc-42"):
+        result = await workflow.run(text)   # a new block with the same ID resumes
+    await store.clear("doc-42")              # once the result is stored elsewhere
+"""
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Tuple
+import logging
+
+from agent_proxy import AgentProxy
+from workflow_memo import content_fingerprint, decode_response, encode_response
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================================
+# Stores
+# ============================================================
+
+class CheckpointStore(ABC):
+    """Stage records are small JSON dicts: {"input": <hash>, "response": <encoded>}."""
+
+    @abstractmethod
+    async def load(self, run_id: str, stage: str) -> Optional[dict]:
+        pass
+
+    @abstractmethod
+    async def save(self, run_id: str, stage: str, record: dict) -> None:
+        pass
+
+    @abstractmethod
+    async def clear(self, run_id: str) -> None:
+        pass
+
+
+class FileCheckpointStore(CheckpointStore):
+    """One directory per run, one JSON file per completed stage (atomic writes)."""
+
+    def __init__(self, directory: str = ".checkpoints"):
+        self.directory = Path(directory)
+
+    def _run_dir(self, run_id: str) -> Path:
+        # Run IDs can be file paths; hash them into a flat, safe directory name
+        return self.directory / hashlib.sha256(run_id.encode("utf-8")).hexdigest()[:32]
+
+    def _read(self, path: Path) -> Optional[dict]:
+        try:
+            return json.loads(path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return None
+        except json.JSONDecodeError:
+            logger.warning(f"Ignoring unreadable checkpoint {path}")
+            return None
+
+    def _write(self, path: Path, record: dict) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(record), encoding="utf-8")
+        os.replace(tmp, path)
+
+    async def load(self, run_id: str, stage: str) -> Optional[dict]:
+        return await asyncio.to_thread(self._read, self._run_dir(run_id) / f"{stage}.json")
+
+    async def save(self, run_id: str, stage: str, record: dict) -> None:
+        await asyncio.to_thread(self._write, self._run_dir(run_id) / f"{stage}.json", {"run_id": run_id, **record})
+
+    async def clear(self, run_id: str) -> None:
+        await asyncio.to_thread(shutil.rmtree, self._run_dir(run_id), True)
+
+
+class RedisCheckpointStore(CheckpointStore):
+    """One hash per run (field = stage key), expiring after ttl seconds."""
+
+    def __init__(self, redis_url: str = "redis://localhost:6379", namespace: str = "workflow:checkpoint",
+                 ttl: int = 7 * 86400):
+        import redis.asyncio as aioredis
+        self.redis = aioredis.from_url(redis_url)
+        self.namespace = namespace
+        self.ttl = ttl
+
+    def _key(self, run_id: str) -> str:
+        return f"{self.namespace}:{run_id}"
+
+    async def load(self, run_id: str, stage: str) -> Optional[dict]:
+        raw = await self.redis.hget(self._key(run_id), stage)
+        return json.loads(raw) if raw is not None else None
+
+    async def save(self, run_id: str, stage: str, record: dict) -> None:
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hset(self._key(run_id), stage, json.dumps(record))
+            pipe.expire(self._key(run_id), self.ttl)
+            await pipe.execute()
+
+    async def clear(self, run_id: str) -> None:
+        await self.redis.delete(self._key(run_id))
+
+
+# ============================================================
+# Run scope and checkpointed agent
+# ============================================================
+
+class _RunScope:
+    """One checkpoint_run block: the run ID and how often each stage key has been seen."""
+
+    def __init__(self, run_id: str):
+        self.run_id = run_id
+        self._seen: Dict[str, int] = {}
+
+    def stage_key(self, executor: str, kind: str, input_hash: str) -> str:
+        """
+        Store key for one executor call: name, call kind, input hash and a
+        counter for repeats of that call. An executor that runs twice in a
+        run, or two executors sharing a name, get separate checkpoints.
+        """
+        base = f"{executor}.{kind}.{input_hash[:16]}"
+        index = self._seen.get(base, 0)
+        self._seen[base] = index + 1
+        return f"{base}.{index}"
+
+
+_current_run: ContextVar[Optional[_RunScope]] = ContextVar("workflow_checkpoint_run", default=None)
+
+
+@contextmanager
+def checkpoint_run(run_id: str) -> Iterator[str]:
+    """
+    Checkpoint every wrapped executor that runs inside this block (including
+    in tasks it starts). Use one block per attempt: a retry in a new block
+    resumes from the stages the earlier attempt completed.
+    """
+    token = _current_run.set(_RunScope(run_id))
+    try:
+        yield run_id
+    finally:
+        _current_run.reset(token)
+
+
+class CheckpointedAgent(AgentProxy):
+    """Agent proxy that saves run() and run_stream() outputs per run ID and replays them on resume."""
+
+    def __init__(self, agent: Any, store: CheckpointStore, name: Optional[str] = None):
+        super().__init__(agent, name)
+        self._store = store
+        self.resumed = 0  # stages skipped thanks to a checkpoint
+
+    async def _load(self, run_id: str, stage: str, input_hash: str) -> Optional[Any]:
+        """The saved output for this stage, or None when there is no usable checkpoint."""
+        try:
+            record = await self._store.load(run_id, stage)
+        except Exception as e:
+            logger.warning(f"Checkpoint read failed for {run_id}/{stage}: {e}")
+            return None
+        if record is None or record.get("input") != input_hash:
+            return None
+        try:
+            response = decode_response(record["response"])
+        except ValueError as e:
+            logger.warning(f"Ignoring checkpoint {run_id}/{stage}: {e}")
+            return None
+        self.resumed += 1
+        logger.info(f"Resuming {run_id}: {self._executor} already completed")
+        return response
+
+    async def _save(self, run_id: str, stage: str, input_hash: str, response: Any) -> None:
+        encoded = encode_response(response)
+        if encoded is None:
+            logger.warning(f"{self._executor} output can't be serialized; stage not checkpointed")
+            return
+        try:
+            await self._store.save(run_id, stage, {"input": input_hash, "response": encoded})
+        except Exception as e:
+            logger.warning(f"Checkpoint write failed for {run_id}/{stage}: {e}")
+
+    def _stage(self, messages: Any, kind: str) -> Tuple[Optional[str], str, str]:
+        scope = _current_run.get()
+        if scope is None:
+            return None, "", ""
+        input_hash = hashlib.sha256(content_fingerprint(messages).encode("utf-8")).hexdigest()
+        return scope.run_id, scope.stage_key(self._executor, kind, input_hash), input_hash
+
+    async def run(self, messages: Any = None, *args, **kwargs) -> Any:
+        run_id, stage, input_hash = self._stage(messages, "run")
+        if run_id is None:
+            return await self._agent.run(messages, *args, **kwargs)
+
+        response = await self._load(run_id, stage, input_hash)
+        if response is not None:
+            return response
+        response = await self._agent.run(messages, *args, **kwargs)
+        await self._save(run_id, stage, input_hash, response)
+        return response
+
+    async def run_stream(self, messages: Any = None, *args, **kwargs) -> AsyncIterator[Any]:
+        """Stream updates; on resume the updates saved from the completed stream are replayed."""
+        run_id, stage, input_hash = self._stage(messages, "stream")
+        if run_id is not None:
+            updates = await self._load(run_id, stage, input_hash)
+            if updates is not None:
+                for update in updates:
+                    yield update
+                return
+
+        updates = []
+        async for update in self._agent.run_stream(messages, *args, **kwargs):
+            updates.append(update)
+            yield update
+        # Only complete streams are saved (a consumer that stops early never gets here)
+        if run_id is not None:
+            await self._save(run_id, stage, input_hash, updates)
+
+
+def checkpoint_agent(agent: Any, store: CheckpointStore) -> CheckpointedAgent:
+    """Opt an executor into checkpointing (wrap before adding it to the builder)."""
+    return CheckpointedAgent(agent, store)
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    class FlakyAgent:
+        def __init__(self, name, fail_times=0):
+            self.name = name
+            self.calls = 0
+            self.fail_times = fail_times
+
+        async def run(self, messages, thread=None):
+            self.calls += 1
+            await asyncio.sleep(0.1)  # model call
+            if self.calls <= self.fail_times:
+                raise RuntimeError(f"{self.name} failed")
+            return f"{self.name}({content_fingerprint(messages)[:20]})"
+
+    async def pipeline(stages, text):
+        for stage in stages:
+            text = await stage.run(text)
+        return text
+
+    async def demo():
+        store = FileCheckpointStore(tempfile.mkdtemp())
+        raw = [FlakyAgent("DocumentClassifier"), FlakyAgent("DataExtractor"), FlakyAgent("DataValidator", fail_times=1)]
+        stages = [checkpoint_agent(agent, store) for agent in raw]
+
+        with checkpoint_run("doc-42"):
+            try:
+                await pipeline(stages, "INVOICE #INV-2025-001")
+            except RuntimeError as e:
+                print(f"First run: {e}")
+        with checkpoint_run("doc-42"):
+            print(f"Second run: {await pipeline(stages, 'INVOICE #INV-2025-001')}")
+        print("Model calls per stage:", {a.name: a.calls for a in raw})
+        await store.clear("doc-42")
+
+    asyncio.run(demo())
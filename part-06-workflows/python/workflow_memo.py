@@ -0,0 +1,388 @@
+"""
+Part 6: Per-Executor Memoization for Workflows
+
+Re-uploaded and retried documents produce the same classifier, extractor
+and validator calls every time. memoize_agent() wraps an agent before it is
+added to a WorkflowBuilder. A repeat input then returns the stored response
+without a model call.
+
+- Key = executor name + instructions hash + content hash of the input
+  messages, so editing an agent's instructions invalidates its entries
+- Each executor has its own TTL
+- Concurrent identical inputs share a single model call
+- Pluggable bounded store: InMemoryMemoStore (LRU) or RedisMemoStore
+
+Only memoize executors whose output depends on their input alone. Inside
+a workflow the AgentExecutor passes its own thread (from get_new_thread())
+on every call; that thread is left out of the key. Any other thread or
+session that already holds messages skips the memo (the key can't see that
+history); other keyword options are part of the key. A cached response is
+returned as-is and is not replayed into the thread. run_stream() is
+memoized too: a hit replays the stored updates.
+
+Usage:
+    store = InMemoryMemoStore(max_entries=10_000)
+    classifier = memoize_agent(classifier, store, ttl=86400, instructions=CLASSIFIER_INSTRUCTIONS)
+    builder.add_executor(classifier)   # use the wrapper everywhere, including edges
+"""
+import asyncio
+import hashlib
+import importlib
+import json
+import time
+import weakref
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from typing import Any, AsyncIterator, Dict, Optional, Sequence
+import logging
+
+from agent_proxy import AgentProxy
+
+logger = logging.getLogger(__name__)
+
+# Modules whose classes may be rebuilt (from_dict) from stored JSON. Type
+# names come from a shared store, so they are never imported unchecked.
+ALLOWED_RESPONSE_MODULES = ("agent_framework",)
+
+
+# ============================================================
+# Stores
+# ============================================================
+
+class MemoStore(ABC):
+    @abstractmethod
+    async def get(self, key: str) -> Optional[Any]:
+        pass
+
+    @abstractmethod
+    async def set(self, key: str, value: Any, ttl: Optional[float]) -> None:
+        pass
+
+
+class InMemoryMemoStore(MemoStore):
+    """Bounded LRU with per-entry expiry (values are kept as objects)."""
+
+    def __init__(self, max_entries: int = 10_000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple[Any, Optional[float]]]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: Any, ttl: Optional[float]) -> None:
+        self._entries[key] = (value, time.monotonic() + ttl if ttl else None)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+class RedisMemoStore(MemoStore):
+    """
+    Shared store across workers. Responses are stored as JSON through the
+    framework's to_dict()/from_dict() serialization; responses that can't
+    be serialized that way are simply not shared.
+    """
+
+    def __init__(self, redis_url: str = "redis://localhost:6379", namespace: str = "workflow:memo",
+                 max_ttl: float = 7 * 86400, allowed_modules: Sequence[str] = ALLOWED_RESPONSE_MODULES):
+        import redis.asyncio as aioredis
+        self.redis = aioredis.from_url(redis_url)
+        self.namespace = namespace
+        self.max_ttl = max_ttl  # Redis bounds memory through expiry (plus its maxmemory policy)
+        self.allowed_modules = tuple(allowed_modules)
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    async def get(self, key: str) -> Optional[Any]:
+        try:
+            raw = await self.redis.get(self._key(key))
+        except Exception as e:
+            logger.warning(f"Memo store read failed: {e}")
+            return None
+        if raw is None:
+            return None
+        try:
+            return decode_response(raw, self.allowed_modules)
+        except ValueError as e:
+            logger.warning(f"Ignoring memo entry: {e}")
+            return None
+
+    async def set(self, key: str, value: Any, ttl: Optional[float]) -> None:
+        encoded = encode_response(value)
+        if encoded is None:
+            return
+        try:
+            await self.redis.set(self._key(key), encoded, ex=max(1, int(min(ttl or self.max_ttl, self.max_ttl))))
+        except Exception as e:
+            logger.warning(f"Memo store write failed: {e}")
+
+
+def _to_payload(value: Any) -> Optional[dict]:
+    if isinstance(value, (str, int, float, dict)) or value is None:
+        return {"type": None, "data": value}
+    if isinstance(value, (list, tuple)):  # e.g. the updates of a streamed run
+        items = [_to_payload(item) for item in value]
+        return None if any(item is None for item in items) else {"type": "list", "data": items}
+    to_dict = getattr(value, "to_dict", None)
+    if callable(to_dict):
+        cls = type(value)
+        return {"type": f"{cls.__module__}:{cls.__qualname__}", "data": to_dict()}
+    return None
+
+
+def encode_response(value: Any) -> Optional[str]:
+    """JSON for plain values, framework objects with to_dict() and lists of them; None otherwise."""
+    payload = _to_payload(value)
+    if payload is not None:
+        try:
+            return json.dumps(payload, default=str)
+        except (TypeError, ValueError):
+            pass
+    logger.debug(f"Not sharing unserializable {type(value).__name__} in the memo store")
+    return None
+
+
+def _from_payload(payload: dict, allowed_modules: Sequence[str]) -> Any:
+    kind = payload["type"]
+    if kind is None:
+        return payload["data"]
+    if kind == "list":
+        return [_from_payload(item, allowed_modules) for item in payload["data"]]
+    module_name, qualname = kind.split(":")
+    if not any(module_name == allowed or module_name.startswith(f"{allowed}.") for allowed in allowed_modules):
+        raise ValueError(f"stored type {kind} is not from an allowed module")
+    target: Any = importlib.import_module(module_name)
+    for part in qualname.split("."):
+        target = getattr(target, part)
+    return target.from_dict(payload["data"])
+
+
+def decode_response(raw, allowed_modules: Sequence[str] = ALLOWED_RESPONSE_MODULES) -> Optional[Any]:
+    """Inverse of encode_response; raises ValueError for types outside allowed_modules."""
+    return _from_payload(json.loads(raw), allowed_modules)
+
+
+# ============================================================
+# Memoized agent
+# ============================================================
+
+def content_fingerprint(messages: Any) -> str:
+    """Stable text form of the input messages (str, message objects, or lists)."""
+    if messages is None:
+        return ""
+    if isinstance(messages, str):
+        return messages
+    if isinstance(messages, (list, tuple)):
+        return "\x1e".join(content_fingerprint(m) for m in messages)
+    text = getattr(messages, "text", None)
+    if isinstance(text, str):
+        role = getattr(messages, "role", "")
+        return f"{getattr(role, 'value', role)}:{text}"
+    to_dict = getattr(messages, "to_dict", None)
+    if callable(to_dict):
+        return json.dumps(to_dict(), sort_keys=True, default=str)
+    return repr(messages)
+
+
+def _sha(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+# Conversation state passed with a call; never part of the key
+_STATE_OPTIONS = ("thread", "session")
+
+
+async def has_history(state: Any) -> bool:
+    """True if a thread/session already holds messages the agent would see."""
+    if state is None:
+        return False
+    if getattr(state, "service_thread_id", None):
+        return True  # history lives on the service; assume it isn't empty
+    store = getattr(state, "message_store", None)
+    if store is not None and callable(getattr(store, "list_messages", None)):
+        return bool(await store.list_messages())
+    return bool(getattr(state, "messages", None))
+
+
+@dataclass
+class MemoStats:
+    hits: int = 0
+    misses: int = 0
+    coalesced: int = 0
+    bypassed: int = 0  # calls on a thread with history, never memoized
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses + self.coalesced
+        return (self.hits + self.coalesced) / total if total else 0.0
+
+    def to_dict(self) -> dict:
+        return {**asdict(self), "hit_rate": round(self.hit_rate, 4)}
+
+
+class _LeaderCancelled(Exception):
+    """The call a waiter was sharing was cancelled; the waiter should retry."""
+
+
+class MemoizedAgent(AgentProxy):
+    """Agent proxy whose run() and run_stream() are memoized; everything else is delegated."""
+
+    def __init__(self, agent: Any, store: MemoStore, ttl: Optional[float] = None,
+                 instructions: Optional[str] = None, name: Optional[str] = None):
+        super().__init__(agent, name)
+        self._store = store
+        self._ttl = ttl
+        if instructions is None:
+            instructions = getattr(agent, "instructions", None) or getattr(
+                getattr(agent, "chat_options", None), "instructions", None) or ""
+        self._instructions_hash = _sha(instructions)[:16]
+        self._inflight: Dict[str, asyncio.Future] = {}
+        # Threads handed out to the executor that wraps this agent
+        self._own_threads: "weakref.WeakSet[Any]" = weakref.WeakSet()
+        self.memo_stats = MemoStats()
+
+    def get_new_thread(self, *args, **kwargs) -> Any:
+        thread = self._agent.get_new_thread(*args, **kwargs)
+        try:
+            self._own_threads.add(thread)
+        except TypeError:
+            pass  # can't be tracked; treated like a caller's thread
+        return thread
+
+    async def _carries_history(self, state: Any) -> bool:
+        try:
+            if state in self._own_threads:
+                return False
+        except TypeError:
+            pass
+        return await has_history(state)
+
+    def memo_key(self, messages: Any, **options: Any) -> str:
+        extra = json.dumps(options, sort_keys=True, default=repr) if options else ""
+        return _sha(f"{self._executor}|{self._instructions_hash}|{extra}|{content_fingerprint(messages)}")
+
+    async def _key_for(self, messages: Any, args: tuple, kwargs: dict, kind: str = "") -> Optional[str]:
+        """Memo key for a call, or None when it can't be memoized (a caller's thread has history)."""
+        options = {k: v for k, v in kwargs.items() if k not in _STATE_OPTIONS}
+        if args or any([await self._carries_history(kwargs.get(k)) for k in _STATE_OPTIONS]):
+            self.memo_stats.bypassed += 1
+            return None
+        if kind:
+            options["__call__"] = kind
+        return self.memo_key(messages, **options)
+
+    async def run(self, messages: Any = None, *args, **kwargs) -> Any:
+        key = await self._key_for(messages, args, kwargs)
+        if key is None:
+            return await self._agent.run(messages, *args, **kwargs)
+
+        while True:
+            cached = await self._store.get(key)
+            if cached is not None:
+                self.memo_stats.hits += 1
+                return cached
+
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                break
+            self.memo_stats.coalesced += 1
+            try:
+                return await asyncio.shield(inflight)
+            except _LeaderCancelled:
+                continue  # the first waiter back here takes over the call
+
+        self.memo_stats.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            response = await self._agent.run(messages, *args, **kwargs)
+        except asyncio.CancelledError:
+            # Only this caller was cancelled; waiters retry rather than fail
+            future.set_exception(_LeaderCancelled())
+            future.exception()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved when nobody else is waiting
+            raise
+        finally:
+            self._inflight.pop(key, None)
+        future.set_result(response)
+        await self._store.set(key, response, self._ttl)
+        return response
+
+    async def run_stream(self, messages: Any = None, *args, **kwargs) -> AsyncIterator[Any]:
+        """Stream updates; a repeat input replays the updates stored from the first stream."""
+        key = await self._key_for(messages, args, kwargs, kind="stream")
+        if key is not None:
+            cached = await self._store.get(key)
+            if cached is not None:
+                self.memo_stats.hits += 1
+                for update in cached:
+                    yield update
+                return
+            self.memo_stats.misses += 1
+
+        updates = []
+        async for update in self._agent.run_stream(messages, *args, **kwargs):
+            updates.append(update)
+            yield update
+        # Only complete streams are stored (a consumer that stops early never gets here)
+        if key is not None:
+            await self._store.set(key, updates, self._ttl)
+
+    def __repr__(self) -> str:
+        return f"MemoizedAgent({self._executor!r}, ttl={self._ttl})"
+
+
+def memoize_agent(agent: Any, store: MemoStore, ttl: Optional[float] = None,
+                  instructions: Optional[str] = None) -> MemoizedAgent:
+    """Opt an executor into memoization (wrap before adding it to the builder)."""
+    return MemoizedAgent(agent, store, ttl=ttl, instructions=instructions)
+
+
+def memo_stats(*agents: Any) -> Dict[str, dict]:
+    """Per-executor hit rates for the memoized agents given."""
+    return {a._executor: a.memo_stats.to_dict() for a in agents if isinstance(a, MemoizedAgent)}
+
+
+if __name__ == "__main__":
+    class SlowAgent:
+        def __init__(self, name):
+            self.name = name
+            self.calls = 0
+
+        async def run(self, messages, thread=None):
+            self.calls += 1
+            await asyncio.sleep(0.2)  # model call
+            return f"{self.name}: processed {len(content_fingerprint(messages))} chars"
+
+    async def demo():
+        store = InMemoryMemoStore()
+        raw = SlowAgent("DocumentClassifier")
+        classifier = memoize_agent(raw, store, ttl=3600, instructions="classify")
+        documents = [f"Invoice #{i % 5}" for i in range(50)]  # 5 distinct documents
+
+        start = time.perf_counter()
+        await asyncio.gather(*(classifier.run(d) for d in documents))
+        print(f"50 runs, 5 distinct inputs: {time.perf_counter() - start:.2f}s, model calls: {raw.calls}")
+        start = time.perf_counter()
+        await asyncio.gather(*(classifier.run(d) for d in documents))
+        print(f"Repeat batch: {(time.perf_counter() - start) * 1000:.1f} ms, model calls: {raw.calls}")
+        print(memo_stats(classifier))
+
+        edited = memoize_agent(raw, store, ttl=3600, instructions="classify (v2)")
+        await edited.run(documents[0])
+        print(f"After an instructions change: model calls: {raw.calls}")
+
+    asyncio.run(demo())
@@ -0,0 +1,456 @@
+"""
+Part 6: Workflow Execution Profiler and Parallel Scheduler
+
+Shows where a workflow run spends its wall time:
+- Per executor: queue time (input ready -> started), run time and output size
+- The critical path of each run: the chain of executors that determined the
+  total latency, i.e. the only place where speedups shorten the run
+- A timeline in Chrome trace format (open in chrome://tracing or Perfetto)
+
+Profile any WorkflowBuilder graph by passing a profiling builder to the
+graph's build function:
+
+    profiler = WorkflowProfiler()
+    workflow = build_document_workflow(agents, builder=profiler.builder())
+    await workflow.run(text)
+    print(profiler.last.summary())
+    profiler.last.save_trace("run.trace.json")
+
+Scheduler mode: profiler.builder(scheduler="parallel") builds a DAG runner
+instead of a framework workflow. Each executor starts as soon as all of its
+predecessors have finished, so executors with no mutual dependency run
+concurrently. It supports plain edges only (fan-out and fan-in). Graphs with
+conditional edges keep the framework scheduler.
+"""
+import asyncio
+import itertools
+import json
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Iterator, List, Optional, Set, Tuple
+import logging
+
+from agent_proxy import AgentProxy
+
+logger = logging.getLogger(__name__)
+
+
+def _text(response: Any) -> str:
+    text = getattr(response, "text", None)
+    return text if isinstance(text, str) else str(response)
+
+
+@dataclass
+class Span:
+    executor: str
+    ready: float
+    start: float
+    end: float = 0.0
+    output_chars: int = 0
+    error: Optional[str] = None
+
+    @property
+    def queue_time(self) -> float:
+        return self.start - self.ready
+
+    @property
+    def run_time(self) -> float:
+        return self.end - self.start
+
+
+@dataclass
+class RunProfile:
+    run_id: str
+    started: float
+    edges: Set[Tuple[str, str]]  # the graph's plain edges plus the conditional edges this run took
+    spans: List[Span] = field(default_factory=list)
+    finished: float = 0.0
+
+    @property
+    def wall_time(self) -> float:
+        return (self.finished or time.perf_counter()) - self.started
+
+    def _ready_time(self, executor: str, now: float) -> float:
+        """When this executor's input became available: its latest finished predecessor, or the run start."""
+        predecessors = {src for src, dst in self.edges if dst == executor}
+        ends = [s.end for s in self.spans if s.executor in predecessors and s.end and s.end <= now]
+        return max(ends, default=self.started)
+
+    def critical_path(self) -> List[Span]:
+        """Walk back from the last span to finish through the predecessor that released it."""
+        finished = [s for s in self.spans if s.end]
+        if not finished:
+            return []
+        path = [max(finished, key=lambda s: s.end)]
+        while True:
+            current = path[-1]
+            predecessors = {src for src, dst in self.edges if dst == current.executor}
+            candidates = [s for s in finished if s.executor in predecessors and s.end <= current.start + 1e-6]
+            if not candidates:
+                break
+            path.append(max(candidates, key=lambda s: s.end))
+        return list(reversed(path))
+
+    def summary(self) -> str:
+        lines = [f"Run {self.run_id}: {self.wall_time * 1000:.0f} ms wall"]
+        for span in sorted(self.spans, key=lambda s: s.start):
+            status = f" ERROR {span.error}" if span.error else ""
+            lines.append(
+                f"  {span.executor:<22} queue {span.queue_time * 1000:7.1f} ms  "
+                f"run {span.run_time * 1000:8.1f} ms  output {span.output_chars:>7} chars{status}"
+            )
+        path = self.critical_path()
+        on_path = sum(s.run_time + s.queue_time for s in path)
+        lines.append(f"  Critical path ({on_path * 1000:.0f} ms): " + " -> ".join(s.executor for s in path))
+        return "\n".join(lines)
+
+    def to_chrome_trace(self) -> dict:
+        lanes: Dict[str, int] = {}
+        events = []
+        critical = {id(s) for s in self.critical_path()}
+        for span in self.spans:
+            tid = lanes.setdefault(span.executor, len(lanes) + 1)
+            common = {"pid": 1, "tid": tid}
+            if span.queue_time > 0:
+                events.append({"name": f"{span.executor} (queued)", "cat": "queue", "ph": "X",
+                               "ts": (span.ready - self.started) * 1e6, "dur": span.queue_time * 1e6, **common})
+            events.append({
+                "name": span.executor, "cat": "critical" if id(span) in critical else "executor", "ph": "X",
+                "ts": (span.start - self.started) * 1e6, "dur": max(span.run_time, 0) * 1e6,
+                "args": {"output_chars": span.output_chars, "error": span.error}, **common
+            })
+        events += [{"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": executor}}
+                   for executor, tid in lanes.items()]
+        return {"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"run_id": self.run_id}}
+
+    def save_trace(self, path) -> Path:
+        path = Path(path)
+        path.write_text(json.dumps(self.to_chrome_trace()), encoding="utf-8")
+        return path
+
+
+_current_profile: ContextVar[Optional[RunProfile]] = ContextVar("workflow_profile", default=None)
+
+
+class ProfiledAgent(AgentProxy):
+    """Agent proxy that records a span per run() or run_stream() inside a profiled run; the rest is delegated."""
+
+    def _start_span(self, profile: RunProfile) -> Span:
+        start = time.perf_counter()
+        span = Span(self._executor, ready=profile._ready_time(self._executor, start), start=start)
+        profile.spans.append(span)
+        return span
+
+    async def run(self, messages: Any = None, *args, **kwargs) -> Any:
+        profile = _current_profile.get()
+        if profile is None:
+            return await self._agent.run(messages, *args, **kwargs)
+        span = self._start_span(profile)
+        try:
+            response = await self._agent.run(messages, *args, **kwargs)
+        except BaseException as e:
+            span.error = type(e).__name__
+            raise
+        finally:
+            span.end = time.perf_counter()
+        span.output_chars = len(_text(response))
+        return response
+
+    async def run_stream(self, messages: Any = None, *args, **kwargs) -> AsyncIterator[Any]:
+        """The span covers the whole stream, from the call to the last update."""
+        profile = _current_profile.get()
+        if profile is None:
+            async for update in self._agent.run_stream(messages, *args, **kwargs):
+                yield update
+            return
+        span = self._start_span(profile)
+        try:
+            async for update in self._agent.run_stream(messages, *args, **kwargs):
+                span.output_chars += len(_text(update))
+                yield update
+        except GeneratorExit:  # the consumer stopped reading; not an executor error
+            raise
+        except BaseException as e:
+            span.error = type(e).__name__
+            raise
+        finally:
+            span.end = time.perf_counter()
+
+
+class WorkflowProfiler:
+    """Collects a RunProfile per workflow run (the most recent `keep` runs)."""
+
+    def __init__(self, keep: int = 100):
+        self.profiles: Deque[RunProfile] = deque(maxlen=keep)
+        self.edges: Set[Tuple[str, str]] = set()  # plain edges of the profiled graphs
+        self._run_ids = itertools.count(1)
+
+    @property
+    def last(self) -> Optional[RunProfile]:
+        return self.profiles[-1] if self.profiles else None
+
+    def _start_run(self, run_id: Optional[str]) -> RunProfile:
+        return RunProfile(run_id or f"run-{next(self._run_ids)}", time.perf_counter(), set(self.edges))
+
+    def _finish_run(self, profile: RunProfile) -> None:
+        profile.finished = time.perf_counter()
+        self.profiles.append(profile)
+
+    @contextmanager
+    def run(self, run_id: Optional[str] = None) -> Iterator[RunProfile]:
+        profile = self._start_run(run_id)
+        token = _current_profile.set(profile)
+        try:
+            yield profile
+        finally:
+            _current_profile.reset(token)
+            self._finish_run(profile)
+
+    def builder(self, inner: Any = None, scheduler: str = "framework") -> "ProfiledBuilder":
+        if scheduler not in ("framework", "parallel"):
+            raise ValueError(f"Unknown scheduler {scheduler!r}")
+        if inner is None and scheduler == "framework":
+            from agent_framework import WorkflowBuilder
+            inner = WorkflowBuilder()
+        return ProfiledBuilder(self, inner, scheduler)
+
+    def critical_path_counts(self) -> Dict[str, int]:
+        """How often each executor was on the critical path, across kept runs."""
+        counts: Dict[str, int] = defaultdict(int)
+        for profile in self.profiles:
+            for span in profile.critical_path():
+                counts[span.executor] += 1
+        return dict(counts)
+
+
+class ProfiledBuilder:
+    """WorkflowBuilder stand-in that wraps executors in ProfiledAgent and records the graph."""
+
+    def __init__(self, profiler: WorkflowProfiler, inner: Any, scheduler: str):
+        self._profiler = profiler
+        self._inner = inner
+        self._scheduler = scheduler
+        self._wrapped: Dict[int, ProfiledAgent] = {}
+        self._executors: List[ProfiledAgent] = []
+        self._edges: List[Tuple[ProfiledAgent, ProfiledAgent]] = []
+        self._start: Optional[ProfiledAgent] = None
+        self._conditional = False
+
+    def _wrap(self, agent: Any) -> Any:
+        if agent is None or isinstance(agent, ProfiledAgent):
+            return agent
+        wrapped = self._wrapped.get(id(agent))
+        if wrapped is None:
+            wrapped = self._wrapped[id(agent)] = ProfiledAgent(agent)
+            self._executors.append(wrapped)
+        return wrapped
+
+    def add_executor(self, agent: Any) -> "ProfiledBuilder":
+        wrapped = self._wrap(agent)
+        if self._inner is not None:
+            self._inner.add_executor(wrapped)
+        return self
+
+    def add_edge(self, source: Any, target: Any, *args, **kwargs) -> "ProfiledBuilder":
+        source, target = self._wrap(source), self._wrap(target)
+        self._edges.append((source, target))
+        self._profiler.edges.add((source._executor, target._executor))
+        if self._inner is not None:
+            self._inner.add_edge(source, target, *args, **kwargs)
+        return self
+
+    def add_conditional_edge(self, source: Any, router: Callable[[Any], Any], **kwargs) -> "ProfiledBuilder":
+        if self._scheduler == "parallel":
+            raise ValueError("The parallel scheduler supports plain edges only")
+        self._conditional = True
+        source = self._wrap(source)
+
+        def profiled_router(result: Any) -> Any:
+            target = self._wrap(router(result))
+            profile = _current_profile.get()
+            if target is not None and profile is not None:
+                profile.edges.add((source._executor, target._executor))  # taken in this run only
+            return target
+
+        self._inner.add_conditional_edge(source=source, router=profiled_router, **kwargs)
+        return self
+
+    def set_start_executor(self, agent: Any) -> "ProfiledBuilder":
+        self._start = self._wrap(agent)
+        if self._inner is not None:
+            self._inner.set_start_executor(self._start)
+        return self
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._inner, name)
+
+    def build(self) -> Any:
+        if self._scheduler == "parallel":
+            return ParallelWorkflow(self._profiler, self._executors, self._edges, self._start)
+        return ProfiledWorkflow(self._profiler, self._inner.build())
+
+
+class ProfiledWorkflow:
+    """Built framework workflow whose run() or run_stream() is recorded as one RunProfile."""
+
+    def __init__(self, profiler: WorkflowProfiler, workflow: Any):
+        self._profiler = profiler
+        self._workflow = workflow
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._workflow, name)
+
+    async def run(self, *args, run_id: Optional[str] = None, **kwargs) -> Any:
+        with self._profiler.run(run_id):
+            return await self._workflow.run(*args, **kwargs)
+
+    async def run_stream(self, *args, run_id: Optional[str] = None, **kwargs) -> AsyncIterator[Any]:
+        """
+        The profile is current only while the workflow advances, never across
+        a yield: the consumer's code between events doesn't see it, and an
+        early aclose() (possibly from another context) has nothing to reset.
+        """
+        profile = self._profiler._start_run(run_id)
+        stream = aiter(self._workflow.run_stream(*args, **kwargs))
+        try:
+            while True:
+                token = _current_profile.set(profile)
+                try:
+                    event = await anext(stream)
+                except StopAsyncIteration:
+                    break
+                finally:
+                    _current_profile.reset(token)
+                yield event
+        finally:
+            aclose = getattr(stream, "aclose", None)
+            if aclose is not None:
+                token = _current_profile.set(profile)
+                try:
+                    await aclose()
+                finally:
+                    _current_profile.reset(token)
+            self._profiler._finish_run(profile)
+
+
+@dataclass
+class ParallelRunResult:
+    outputs: Dict[str, Any]  # sink executor name -> response
+    profile: RunProfile
+
+    def get_outputs(self) -> List[Any]:
+        return list(self.outputs.values())
+
+
+class ParallelWorkflow:
+    """DAG runner: every executor starts once all of its predecessors have finished."""
+
+    def __init__(self, profiler: WorkflowProfiler, executors: List[ProfiledAgent],
+                 edges: List[Tuple[ProfiledAgent, ProfiledAgent]], start: Optional[ProfiledAgent]):
+        self._profiler = profiler
+        self._executors = executors
+        self._predecessors: Dict[ProfiledAgent, List[ProfiledAgent]] = {e: [] for e in executors}
+        self._successors: Dict[ProfiledAgent, List[ProfiledAgent]] = {e: [] for e in executors}
+        for source, target in edges:
+            self._predecessors[target].append(source)
+            self._successors[source].append(target)
+        self._sources = [e for e in executors if not self._predecessors[e]]
+        if start is not None and self._sources != [start]:
+            raise ValueError(f"Start executor {start._executor} must be the only executor without inputs")
+        self._check_acyclic()
+
+    def _check_acyclic(self) -> None:
+        remaining = {e: len(p) for e, p in self._predecessors.items()}
+        ready = list(self._sources)
+        seen = 0
+        while ready:
+            node = ready.pop()
+            seen += 1
+            for successor in self._successors[node]:
+                remaining[successor] -= 1
+                if remaining[successor] == 0:
+                    ready.append(successor)
+        if seen != len(self._executors):
+            raise ValueError("The parallel scheduler needs an acyclic graph")
+
+    async def run(self, message: Any, run_id: Optional[str] = None) -> ParallelRunResult:
+        with self._profiler.run(run_id) as profile:
+            done: Dict[ProfiledAgent, asyncio.Future] = {
+                e: asyncio.get_running_loop().create_future() for e in self._executors
+            }
+
+            async def execute(executor: ProfiledAgent) -> None:
+                predecessors = self._predecessors[executor]
+                try:
+                    results = [await done[p] for p in predecessors]
+                    if not predecessors:
+                        payload = message
+                    elif len(results) == 1:
+                        payload = _text(results[0])
+                    else:
+                        # Fan-in: one message with every input, in edge order
+                        payload = "\n\n".join(f"[{p._executor}]\n{_text(r)}" for p, r in zip(predecessors, results))
+                    done[executor].set_result(await executor.run(payload))
+                except asyncio.CancelledError:
+                    done[executor].cancel()
+                    raise
+                except BaseException as e:
+                    done[executor].set_exception(e)
+                    raise
+
+            tasks = [asyncio.create_task(execute(e)) for e in self._executors]
+            try:
+                await asyncio.gather(*tasks)
+            finally:
+                for task in tasks:
+                    task.cancel()
+                # Let the cancelled executors finish before reading their results
+                await asyncio.gather(*tasks, return_exceptions=True)
+                for future in done.values():
+                    if future.done() and not future.cancelled():
+                        future.exception()  # failures already surfaced through gather
+
+            sinks = [e for e in self._executors if not self._successors[e]]
+            return ParallelRunResult({e._executor: done[e].result() for e in sinks}, profile)
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    class SlowAgent:
+        def __init__(self, name, seconds):
+            self.name = name
+            self.seconds = seconds
+
+        async def run(self, messages, thread=None):
+            await asyncio.sleep(self.seconds)  # model call
+            return f"{self.name} output for {len(str(messages))} chars"
+
+    async def demo():
+        classifier = SlowAgent("DocumentClassifier", 0.1)
+        extractor = SlowAgent("DataExtractor", 0.4)
+        summarizer = SlowAgent("Summarizer", 0.2)
+        validator = SlowAgent("DataValidator", 0.1)
+
+        profiler = WorkflowProfiler()
+        builder = profiler.builder(scheduler="parallel")
+        for agent in (classifier, extractor, summarizer, validator):
+            builder.add_executor(agent)
+        builder.add_edge(classifier, extractor)
+        builder.add_edge(classifier, summarizer)   # extractor and summarizer are independent
+        builder.add_edge(extractor, validator)
+        builder.add_edge(summarizer, validator)
+        builder.set_start_executor(classifier)
+        workflow = builder.build()
+
+        result = await workflow.run("INVOICE #INV-2025-001 ...")
+        print(result.profile.summary())
+        print(f"Sequential would take {sum(s.run_time for s in result.profile.spans) * 1000:.0f} ms")
+        trace = result.profile.save_trace(Path(tempfile.mkdtemp()) / "run.trace.json")
+        print(f"Chrome trace: {trace}")
+
+    asyncio.run(demo())
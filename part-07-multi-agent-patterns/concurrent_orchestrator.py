@@ -1,22 +1,35 @@
 """
 Part 7: Concurrent Orchestration Pattern
+
+Two ways to run the analysis team:
+- create_analysis_team(): the framework's ConcurrentOrchestrator, which waits
+  for every analyst before aggregating
+- stream_analysis(): incremental aggregation. Results are labelled by agent
+  name and folded into the report as they complete, and each completion
+  yields a partial report. An optional quorum and deadline let the report
+  return before the slowest analyst, noting who timed out or failed.
 """
 import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, List, Optional
 from agent_framework.orchestration import ConcurrentOrchestrator
-from agent_framework.azure import AzureOpenAIResponsesClient
-from azure.identity import AzureCliCredential
-import os
 
+from common.clients import get_responses_client
+
+
+# Report sections by analyst name (also the section order)
+SECTIONS = {
+    "MarketAnalyst": "Market Analysis",
+    "TechAnalyst": "Technical Analysis",
+    "FinancialAnalyst": "Financial Analysis"
+}
+
+
+def create_analysts(client=None) -> list:
+    """Create the parallel analysis agents."""
+    client = client or get_responses_client()
 
-async def create_analysis_team():
-    """Create a team of parallel analysis agents."""
-    
-    client = AzureOpenAIResponsesClient(
-        credential=AzureCliCredential(),
-        endpoint=os.getenv("AZURE_OPENAI_ENDPOINT")
-    )
-    
-    # Create parallel analysis agents
     market_analyst = client.create_agent(
         name="MarketAnalyst",
         instructions="""
@@ -27,18 +40,18 @@ async def create_analysis_team():
             Format as a structured market analysis section.
         """
     )
-    
+
     tech_analyst = client.create_agent(
         name="TechAnalyst",
         instructions="""
             Analyze technical aspects:
             - Technology stack and architecture
-            - Innovation and R&D capabilities  
+            - Innovation and R&D capabilities
             - Technical risks and opportunities
             Format as a structured technical analysis section.
         """
     )
-    
+
     financial_analyst = client.create_agent(
         name="FinancialAnalyst",
         instructions="""
@@ -49,38 +62,162 @@ async def create_analysis_team():
             Format as a structured financial analysis section.
         """
     )
-    
-    # Aggregator function to combine results
+
+    return [market_analyst, tech_analyst, financial_analyst]
+
+
+def render_report(results: Dict[str, str], missing: Optional[Dict[str, str]] = None) -> str:
+    """Build the report from results keyed by analyst name; missing maps name -> reason."""
+    missing = missing or {}
+    combined = "# Comprehensive Analysis Report\n\n"
+    names = list(SECTIONS) + [name for name in {**results, **missing} if name not in SECTIONS]
+
+    for name in names:
+        section = SECTIONS.get(name, name)
+        if name in results:
+            combined += f"## {section}\n{results[name]}\n\n"
+        elif name in missing:
+            combined += f"## {section}\n_Not available: {missing[name]}._\n\n"
+
+    covered = [SECTIONS.get(name, name).split()[0].lower() for name in names if name in results]
+    combined += "## Summary\nAnalysis compiled from " + (", ".join(covered) or "no") + " perspectives."
+    if missing:
+        combined += "\nIncomplete: " + ", ".join(f"{name} ({reason})" for name, reason in missing.items()) + "."
+    return combined
+
+
+def _author(result, fallback: str) -> str:
+    """Analyst name on a framework result, if it carries one."""
+    name = getattr(result, "author_name", None)
+    messages = getattr(result, "messages", None)
+    if not name and messages:
+        name = getattr(messages[-1], "author_name", None)
+    return name or fallback
+
+
+async def create_analysis_team():
+    """Create a team of parallel analysis agents."""
+    analysts = create_analysts()
+
+    # Aggregator function to combine results (labelled by author where available)
     def aggregate_analysis(results: list) -> str:
-        combined = "# Comprehensive Analysis Report\n\n"
-        sections = ["## Market Analysis", "## Technical Analysis", "## Financial Analysis"]
-        
-        for i, (section, result) in enumerate(zip(sections, results)):
-            combined += f"{section}\n{result}\n\n"
-        
-        combined += "## Summary\nAnalysis compiled from market, technical, and financial perspectives."
-        return combined
-    
+        fallback_names = [analyst.name for analyst in analysts]
+        return render_report({
+            _author(result, fallback_names[i]): str(getattr(result, "text", result))
+            for i, result in enumerate(results)
+        })
+
     orchestrator = ConcurrentOrchestrator(
-        agents=[market_analyst, tech_analyst, financial_analyst],
+        agents=analysts,
         aggregator=aggregate_analysis
     )
-    
+
     return orchestrator
 
 
+@dataclass
+class ReportUpdate:
+    report: str                     # the report so far
+    completed: List[str]            # analysts with a result, in completion order
+    missing: Dict[str, str] = field(default_factory=dict)  # name -> "pending" / "timed out" / "failed: ..."
+    quorum_met: bool = False
+    final: bool = False
+    elapsed: float = 0.0
+
+
+async def stream_analysis(
+    task: str,
+    analysts: Optional[list] = None,
+    quorum: Optional[int] = None,
+    deadline: Optional[float] = None,
+    grace: Optional[float] = None
+) -> AsyncIterator[ReportUpdate]:
+    """
+    Yield a partial report each time an analyst finishes, then a final one.
+
+    The final report is emitted when every analyst has finished, or earlier,
+    at whichever of these comes first:
+    - `quorum` analysts have succeeded
+    - `deadline` seconds have passed, with whoever has finished
+    - with a quorum, failures make it unreachable
+    `grace` (needs a quorum and a deadline) waits up to that many extra
+    seconds past the deadline while the quorum is still short.
+    Unfinished analysts are cancelled and listed with the reason: timed
+    out, quorum met or quorum unreachable.
+    """
+    if grace is not None and (quorum is None or deadline is None):
+        raise ValueError("grace extends the deadline for a quorum; it needs both")
+    analysts = analysts if analysts is not None else create_analysts()
+    started = time.perf_counter()
+    pending = {asyncio.create_task(analyst.run(task)): analyst.name for analyst in analysts}
+    results: Dict[str, str] = {}
+    failed: Dict[str, str] = {}
+    need = min(quorum, len(analysts)) if quorum else len(analysts)
+
+    def update(final: bool, pending_reason: str = "pending") -> ReportUpdate:
+        missing = {**failed, **{name: pending_reason for name in pending.values()}}
+        return ReportUpdate(render_report(results, missing), list(results), missing,
+                            len(results) >= need, final, time.perf_counter() - started)
+
+    stop_reason = "timed out"
+    try:
+        while pending:
+            if quorum is not None:
+                if len(results) + len(pending) < need:
+                    stop_reason = "cancelled, quorum unreachable"
+                    break
+                if len(results) >= need:
+                    stop_reason = "cancelled, quorum met"
+                    break
+            cutoff = None
+            if deadline is not None:
+                elapsed = time.perf_counter() - started
+                cutoff = deadline if elapsed < deadline else deadline + (grace or 0)
+                if elapsed >= cutoff:
+                    break
+
+            timeout = cutoff - elapsed if cutoff is not None else None
+            done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            for finished in done:
+                name = pending.pop(finished)
+                try:
+                    response = finished.result()
+                    results[name] = str(getattr(response, "text", response))
+                except Exception as e:
+                    failed[name] = f"failed: {type(e).__name__}"
+            if done and pending:
+                yield update(final=False)
+
+        yield update(final=True, pending_reason=stop_reason)
+    finally:
+        for straggler in pending:
+            straggler.cancel()
+        # Wait for the cancellations so no analyst outlives the stream
+        await asyncio.gather(*pending, return_exceptions=True)
+
+
+async def analyze(task: str, quorum: Optional[int] = None, deadline: Optional[float] = None,
+                  analysts: Optional[list] = None, grace: Optional[float] = None) -> str:
+    """The final report of stream_analysis (ignoring partial updates)."""
+    update = None
+    async for update in stream_analysis(task, analysts, quorum=quorum, deadline=deadline, grace=grace):
+        pass
+    return update.report
+
+
 async def main():
-    orchestrator = await create_analysis_team()
-    
     print("Starting parallel analysis (3 agents working simultaneously)...")
     print("=" * 50)
-    
-    # All agents work in parallel
-    result = await orchestrator.run(
-        "Analyze Microsoft for potential investment opportunity"
-    )
-    
-    print(f"\nCombined Report:\n{result}")
+
+    # Results stream in as each analyst finishes; the report returns once
+    # 2 of 3 are done or after 60 seconds, whichever comes first
+    async for update in stream_analysis(
+        "Analyze Microsoft for potential investment opportunity", quorum=2, deadline=60
+    ):
+        if update.final:
+            print(f"\nCombined Report ({update.elapsed:.1f}s):\n{update.report}")
+        else:
+            print(f"[{update.elapsed:.1f}s] Received: {', '.join(update.completed)}")
 
 
 if __name__ == "__main__":
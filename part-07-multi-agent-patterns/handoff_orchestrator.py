@@ -3,18 +3,14 @@ Part 7: Handoff Orchestration Pattern
 """
 import asyncio
 from agent_framework.orchestration import HandoffOrchestrator
-from agent_framework.azure import AzureOpenAIResponsesClient
-from azure.identity import AzureCliCredential
-import os
+
+from common.clients import get_responses_client
 
 
 async def create_support_system():
     """Create a tiered support system with handoffs."""
     
-    client = AzureOpenAIResponsesClient(
-        credential=AzureCliCredential(),
-        endpoint=os.getenv("AZURE_OPENAI_ENDPOINT")
-    )
+    client = get_responses_client()
     
     # Tiered support agents
     tier1 = client.create_agent(
@@ -3,18 +3,14 @@ Part 7: Sequential Orchestration Pattern
 """
 import asyncio
 from agent_framework.orchestration import SequentialOrchestrator
-from agent_framework.azure import AzureOpenAIResponsesClient
-from azure.identity import AzureCliCredential
-import os
+
+from common.clients import get_responses_client
 
 
 async def create_content_pipeline():
     """Create a sequential content creation pipeline."""
     
-    client = AzureOpenAIResponsesClient(
-        credential=AzureCliCredential(),
-        endpoint=os.getenv("AZURE_OPENAI_ENDPOINT")
-    )
+    client = get_responses_client()
     
     # Create specialized agents
     researcher = client.create_agent(
@@ -7,6 +7,8 @@ from dataclasses import dataclass
 from typing import Optional, Callable
 import logging
 
+from common.idempotency import idempotency_scope
+
 logger = logging.getLogger(__name__)
 
 
@@ -91,37 +93,40 @@ class ResilientAgent:
         
         last_error = None
         
-        for attempt in range(self.max_retries + 1):
-            try:
-                # Apply timeout
-                result = await asyncio.wait_for(
-                    self.agent.run(message, thread),
-                    timeout=self.timeout
-                )
+        # Retries replay tool calls; one scope keeps their idempotency keys stable
+        with idempotency_scope() as scope:
+            for attempt in range(self.max_retries + 1):
+                scope.new_attempt()
+                try:
+                    # Apply timeout
+                    result = await asyncio.wait_for(
+                        self.agent.run(message, thread),
+                        timeout=self.timeout
+                    )
                 
-                self._record_success()
-                return result.text
+                    self._record_success()
+                    return result.text
                 
-            except asyncio.TimeoutError:
-                last_error = "Request timed out"
-                logger.warning(f"Attempt {attempt + 1}: Timeout")
+                except asyncio.TimeoutError:
+                    last_error = "Request timed out"
+                    logger.warning(f"Attempt {attempt + 1}: Timeout")
                 
-            except Exception as e:
-                last_error = str(e)
-                logger.warning(f"Attempt {attempt + 1}: {last_error}")
+                except Exception as e:
+                    last_error = str(e)
+                    logger.warning(f"Attempt {attempt + 1}: {last_error}")
             
-            # Record failure
-            self._record_failure()
+                # Record failure
+                self._record_failure()
             
-            # Exponential backoff
-            if attempt < self.max_retries:
-                delay = min(self.base_delay * (2 ** attempt), self.max_delay)
-                logger.info(f"Retrying in {delay:.1f}s...")
+                # Exponential backoff
+                if attempt < self.max_retries:
+                    delay = min(self.base_delay * (2 ** attempt), self.max_delay)
+                    logger.info(f"Retrying in {delay:.1f}s...")
                 
-                if on_retry:
-                    on_retry(attempt + 1, delay)
+                    if on_retry:
+                        on_retry(attempt + 1, delay)
                 
-                await asyncio.sleep(delay)
+                    await asyncio.sleep(delay)
         
         logger.error(f"All retries exhausted. Last error: {last_error}")
         return self.fallback_response
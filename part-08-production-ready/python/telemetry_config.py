@@ -1,20 +1,25 @@
 """
 Part 8: OpenTelemetry Configuration
 """
+import functools
 import os
 import logging
-from opentelemetry import trace
-from opentelemetry.sdk.trace import TracerProvider
-from opentelemetry.sdk.trace.export import BatchSpanProcessor
-from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
-from opentelemetry.sdk.resources import Resource
-from opentelemetry.instrumentation.aiohttp_client import AioHttpClientInstrumentor
+
+# The OpenTelemetry SDK, OTLP/gRPC exporter and instrumentation are imported
+# inside configure_telemetry(): they are only needed once, at service start,
+# and importing them eagerly adds noticeably to every worker's cold start.
 
 logger = logging.getLogger(__name__)
 
 
 def configure_telemetry(service_name: str = "agent-service"):
     """Configure OpenTelemetry for the agent service."""
+    from opentelemetry import trace
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.instrumentation.aiohttp_client import AioHttpClientInstrumentor
     
     # Create resource with service metadata
     resource = Resource.create({
@@ -49,7 +54,9 @@ def configure_telemetry(service_name: str = "agent-service"):
 def traced(operation_name: str):
     """Decorator to trace agent operations."""
     def decorator(func):
+        @functools.wraps(func)
         async def wrapper(*args, **kwargs):
+            from opentelemetry import trace  # cached in sys.modules after first call
             tracer = trace.get_tracer(__name__)
             with tracer.start_as_current_span(operation_name) as span:
                 span.set_attribute("agent.operation", operation_name)
@@ -7,8 +7,8 @@ from dataclasses import dataclass
 from typing import List
 
 from agent_framework.mcp import MCPClient, MCPServerConfig
-from agent_framework.azure import AzureOpenAIResponsesClient
-from azure.identity import AzureCliCredential
+
+from common.clients import get_responses_client
 
 
 @dataclass
@@ -63,10 +63,7 @@ async def create_mcp_enabled_agent():
     mcp_client = await connect_to_mcp_server()
     
     # Create agent with MCP tools
-    agent = AzureOpenAIResponsesClient(
-        credential=AzureCliCredential(),
-        endpoint=os.getenv("AZURE_OPENAI_ENDPOINT")
-    ).create_agent(
+    agent = get_responses_client().create_agent(
         name="MCPEnabledAgent",
         instructions="""
             You are a helpful assistant with access to external tools via MCP.
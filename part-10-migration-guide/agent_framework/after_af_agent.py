@@ -1,29 +1,33 @@
 """
 Part 10: Migration to Agent Framework - AFTER
 """
-from agent_framework.azure import AzureOpenAIResponsesClient
-from azure.identity import AzureCliCredential
 import asyncio
-import os
 
-# Create client and agent
-agent = AzureOpenAIResponsesClient(
-    credential=AzureCliCredential(),  # Use Azure AD instead of API keys
-    endpoint=os.getenv("AZURE_OPENAI_ENDPOINT")
-).create_agent(
-    name="MyAgent",
-    instructions="You are a helpful assistant that summarizes text."
-)
+from common.clients import get_responses_client
+from common.lazy import lazy_factory
+
+
+@lazy_factory
+def get_agent():
+    """Create the agent on first use rather than at import time."""
+    # The shared client defers SDK imports and uses the shared cached
+    # credential (Azure AD instead of API keys)
+    return get_responses_client().create_agent(
+        name="MyAgent",
+        instructions="You are a helpful assistant that summarizes text."
+    )
 
 
 async def af_simple_example():
     """Simple AF invocation."""
+    agent = get_agent()
     result = await agent.run("Summarize: Microsoft released Agent Framework...")
     print(result.text)
 
 
 async def af_chat_example():
     """AF with thread (replaces ChatHistory)."""
+    agent = get_agent()
     thread = agent.get_new_thread()
     
     result1 = await agent.run("Hello!", thread)